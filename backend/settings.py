@@ -111,6 +111,36 @@ else:
         }
     }
 
+# ==============================
+# ✅ Cache
+# ==============================
+# Locks and debounce keys (meters.locks, meters.scheduling, meters.triggers)
+# must be visible to every process: gunicorn workers, run_periodic_tasks and
+# Celery workers. Deployments therefore need a shared cache: Redis when
+# REDIS_URL is set, else the database cache table (created by
+# `python manage.py createcachetable`). Only a local SQLite setup without
+# DATABASE_URL (development, tests) uses the per-process local-memory cache.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+elif os.environ.get('DATABASE_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # ==============================
 # ✅ CORS & CSRF Config
 # ==============================
@@ -159,6 +189,69 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# ==============================
+# ✅ Celery & Token Allocation
+# ==============================
+# Without a broker (local dev, tests, single-container deploys) tasks run inline
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', '')
+CELERY_TASK_ALWAYS_EAGER = not CELERY_BROKER_URL
+# Chords (the sharded auto-recharge sweep) need a result backend; the broker's Redis works
+CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', CELERY_BROKER_URL) or None
+# Re-deliver tasks whose worker died mid-run instead of losing them
+CELERY_TASK_ACKS_LATE = True
+CELERY_TASK_REJECT_ON_WORKER_LOST = True
+
+CELERY_BEAT_SCHEDULE = {
+    'release-expired-token-reservations': {
+        'task': 'meters.tasks.release_expired_reservations_task',
+        'schedule': 60.0,
+    },
+    'requeue-stale-purchases': {
+        'task': 'meters.tasks.requeue_stale_purchases_task',
+        'schedule': 300.0,
+    },
+    'verify-pending-manual-recharges': {
+        'task': 'meters.tasks.verify_pending_recharges_task',
+        'schedule': 5.0,
+    },
+    'autorecharge-scheduler-tick': {
+        'task': 'meters.tasks.autorecharge_scheduler_tick_task',
+        'schedule': 60.0,
+    },
+    'compact-meter-ledger': {
+        'task': 'meters.tasks.compact_meter_ledger_task',
+        'schedule': 86400.0,
+    },
+    'forecast-token-demand': {
+        'task': 'meters.tasks.forecast_token_demand_task',
+        'schedule': 86400.0,
+    },
+}
+
+# Number of parallel shards (by user id) the scheduled auto-recharge sweep is split into
+AUTORECHARGE_SWEEP_SHARDS = int(os.environ.get('AUTORECHARGE_SWEEP_SHARDS', '4'))
+
+# How often the scheduler re-checks a user inside their auto-recharge window (or at all, without one)
+AUTORECHARGE_SCHEDULE_INTERVAL_SECONDS = int(os.environ.get('AUTORECHARGE_SCHEDULE_INTERVAL_SECONDS', '3600'))
+
+# A meter crossing below its threshold is recharged once this many seconds later (debounced)
+AUTORECHARGE_DEBOUNCE_SECONDS = int(os.environ.get('AUTORECHARGE_DEBOUNCE_SECONDS', '60'))
+
+# Pending manual recharges whose token is still unknown after this many seconds are failed
+MANUAL_RECHARGE_VERIFY_TIMEOUT = int(os.environ.get('MANUAL_RECHARGE_VERIFY_TIMEOUT', '30'))
+
+# Payment confirmation for purchases (see meters.payments)
+PAYMENT_PROVIDER = os.environ.get('PAYMENT_PROVIDER', 'meters.payments.LocalPaymentProvider')
+LOCAL_PAYMENT_DELAY = float(os.environ.get('LOCAL_PAYMENT_DELAY', '0'))
+
+# Denomination-based token allocation backend (see meters.allocation_backends)
+TOKEN_ALLOCATION_BACKEND = os.environ.get('TOKEN_ALLOCATION_BACKEND', 'meters.allocation_backends.DatabaseBackend')
+TOKEN_ALLOCATION_REDIS_URL = os.environ.get('TOKEN_ALLOCATION_REDIS_URL', os.environ.get('REDIS_URL', 'redis://localhost:6379/0'))
+
+# Tokens each worker pre-claims per denomination (0 disables the reservation buffer)
+TOKEN_RESERVATION_BATCH_SIZE = int(os.environ.get('TOKEN_RESERVATION_BATCH_SIZE', '10'))
+TOKEN_RESERVATION_LEASE_SECONDS = int(os.environ.get('TOKEN_RESERVATION_LEASE_SECONDS', '300'))
+
 # ==============================
 # ✅ Static & Media Files
 # ==============================
@@ -4,11 +4,13 @@ import django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 django.setup()
 
-from meters.models import TokenPool
+from meters.counters import pool_availability
 
-total = TokenPool.objects.count()
-available = TokenPool.objects.filter(is_allocated=False).count()
-allocated = TokenPool.objects.filter(is_allocated=True).count()
+# read the maintained counters instead of counting the whole pool
+stats = pool_availability()
+available = stats['total_available']
+allocated = stats['total_allocated']
+total = available + allocated
 
 print(f"Total tokens in pool: {total}")
 print(f"Available tokens: {available}")
@@ -20,3 +22,6 @@ elif available == 0:
     print("\n⚠️ All tokens have been allocated! Need to add more tokens.")
 else:
     print(f"\n✅ {available} tokens ready for purchase!")
+
+for bucket in stats['buckets']:
+    print(f"   amount={bucket['amount'] or '-'} units={bucket['units'] or '-'}: {bucket['available']} available")
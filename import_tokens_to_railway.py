@@ -58,10 +58,11 @@ def main():
         print()
         
         # Show statistics
-        from meters.models import TokenPool
-        total = TokenPool.objects.count()
-        available = TokenPool.objects.filter(is_allocated=False).count()
-        allocated = TokenPool.objects.filter(is_allocated=True).count()
+        from meters.counters import pool_availability
+        stats = pool_availability()
+        available = stats['total_available']
+        allocated = stats['total_allocated']
+        total = available + allocated
         
         print("📊 Token Pool Statistics:")
         print(f"   Total tokens: {total}")
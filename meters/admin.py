@@ -1,6 +1,9 @@
 from django.contrib import admin
+from django.db import transaction
+from .counters import record_change
 from .models import Meter, Token
-from .models import AutoRechargeConfig, AutoRechargeEvent, ManualRecharge, TokenPurchase, TokenPool
+from .models import AutoRechargeConfig, AutoRechargeEvent, ManualRecharge, TokenPurchase, TokenPool, TokenImportManifest, TokenPoolCounter
+from .models import MeterLedger, MeterBalanceSnapshot, AutoRechargeSweepCheckpoint, AutoRechargeJob, TokenDemandForecast
 
 # Inline Token display under Meter
 class TokenInline(admin.TabularInline):  # or StackedInline for vertical layout
@@ -22,6 +25,18 @@ class MeterAdmin(admin.ModelAdmin):
     readonly_fields = ("created_at", "updated_at")
     inlines = [TokenInline]
 
+    def save_model(self, request, obj, form, change):
+        # record balance edits as ledger adjustments instead of overwriting the total
+        if change and "current_balance" in form.changed_data:
+            from .ledger import adjust
+            delta = obj.current_balance - form.initial["current_balance"]
+            obj.current_balance = form.initial["current_balance"]
+            super().save_model(request, obj, form, change)
+            adjust(obj.pk, delta, reference=f"admin: {request.user}")
+            obj.refresh_from_db(fields=["current_balance"])
+            return
+        super().save_model(request, obj, form, change)
+
     fieldsets = (
         ("Meter Information", {
             "fields": ("user", "meter_number", "nickname", "address")
@@ -82,6 +97,76 @@ class TokenPurchaseAdmin(admin.ModelAdmin):
 
 @admin.register(TokenPool)
 class TokenPoolAdmin(admin.ModelAdmin):
-    list_display = ("id", "token_code", "is_allocated", "allocated_to", "allocated_transaction_id", "units", "amount", "created_at")
+    list_display = ("id", "token_code", "is_allocated", "allocated_to", "allocated_transaction_id", "units", "amount", "reserved_until", "created_at")
     search_fields = ("token_code", "allocated_transaction_id", "allocated_to__email")
     list_filter = ("is_allocated", "created_at")
+
+    # keep the availability counters in step with edits made here
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            previous = TokenPool.objects.select_for_update().filter(pk=obj.pk).first() if change else None
+            super().save_model(request, obj, form, change)
+            record_change(previous, obj)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            record_change(obj, None)
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            for obj in queryset:
+                record_change(obj, None)
+            super().delete_queryset(request, queryset)
+
+
+@admin.register(TokenImportManifest)
+class TokenImportManifestAdmin(admin.ModelAdmin):
+    list_display = ("source", "row_count", "byte_size", "content_hash", "imported_at")
+    search_fields = ("source", "content_hash")
+    readonly_fields = ("imported_at",)
+
+
+@admin.register(TokenPoolCounter)
+class TokenPoolCounterAdmin(admin.ModelAdmin):
+    list_display = ("bucket", "slot", "amount", "units", "available", "allocated", "updated_at")
+    search_fields = ("bucket",)
+    readonly_fields = ("updated_at",)
+
+
+@admin.register(TokenDemandForecast)
+class TokenDemandForecastAdmin(admin.ModelAdmin):
+    list_display = ("bucket", "available", "daily_level", "projected_next_7_days", "depletion_date", "computed_at")
+    search_fields = ("bucket",)
+    readonly_fields = ("computed_at",)
+
+
+@admin.register(MeterLedger)
+class MeterLedgerAdmin(admin.ModelAdmin):
+    list_display = ("id", "meter", "entry_type", "units", "reference", "created_at")
+    search_fields = ("meter__meter_number", "reference")
+    list_filter = ("entry_type", "created_at")
+    readonly_fields = ("meter", "entry_type", "units", "reference", "created_at")
+
+
+@admin.register(MeterBalanceSnapshot)
+class MeterBalanceSnapshotAdmin(admin.ModelAdmin):
+    list_display = ("meter", "balance", "last_entry_id", "updated_at")
+    search_fields = ("meter__meter_number",)
+    readonly_fields = ("meter", "balance", "last_entry_id", "updated_at")
+
+
+@admin.register(AutoRechargeSweepCheckpoint)
+class AutoRechargeSweepCheckpointAdmin(admin.ModelAdmin):
+    list_display = ("run_id", "shard", "shards", "status", "last_meter_id", "triggered", "executed", "failed", "updated_at")
+    search_fields = ("run_id",)
+    list_filter = ("status",)
+    readonly_fields = ("started_at", "updated_at")
+
+
+@admin.register(AutoRechargeJob)
+class AutoRechargeJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "status", "meters_processed", "meters_total", "executed", "failed", "created_at", "finished_at")
+    search_fields = ("user__email",)
+    list_filter = ("status", "created_at")
+    readonly_fields = ("created_at", "started_at", "finished_at", "updated_at")
@@ -0,0 +1,260 @@
+"""Pluggable backends for denomination-based TokenPool allocation.
+
+settings.TOKEN_ALLOCATION_BACKEND selects the backend used by
+allocator.claim_token:
+
+- DatabaseBackend (default): claims straight from TokenPool with
+  UPDATE ... FOR UPDATE SKIP LOCKED on PostgreSQL, compare-and-swap elsewhere.
+- RedisListBackend: pops pre-loaded token ids from one Redis list per
+  denomination, so claims from any number of workers/nodes never contend on
+  TokenPool rows; the popped row is then allocated by primary key.
+  `import_tokens` pushes new tokens, `sync_token_queue` rebuilds the lists.
+  A popped entry waits in a processing list until its allocation commits, and
+  `recover` returns entries whose allocation never committed.
+- InMemoryBackend: a process-local pool for tests; never touches the database.
+"""
+import threading
+from collections import defaultdict, deque
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .allocator import allocate_pk, claim_from_database
+from .counters import bucket_key
+from .models import TokenPool
+
+DEFAULT_BACKEND = 'meters.allocation_backends.DatabaseBackend'
+
+
+def _matches(bucket_amount, bucket_units, amount, units):
+    return (amount is None or bucket_amount == amount) and (units is None or bucket_units == units)
+
+
+def _as_decimal(value):
+    return None if value is None else Decimal(value).quantize(Decimal('0.01'))
+
+
+class BaseAllocationBackend:
+    # whether the per-worker reservation buffer (meters.reservations) applies
+    supports_reservations = False
+
+    def claim(self, amount=None, units=None, allow_any=False, user_id=None, transaction_id=None):
+        """Allocate one token, preferring the denomination; see allocator.claim_from_database."""
+        raise NotImplementedError
+
+    def tokens_imported(self, codes):
+        """Called by the importer with the token codes it just inserted."""
+
+    def rebuild(self):
+        """Resynchronise any backend-side state from TokenPool; returns the number of tokens loaded."""
+        return 0
+
+    def recover(self):
+        """Return claimed-but-uncommitted tokens to the backend; returns how many were returned."""
+        return 0
+
+
+class DatabaseBackend(BaseAllocationBackend):
+    supports_reservations = True
+
+    def claim(self, amount=None, units=None, allow_any=False, user_id=None, transaction_id=None):
+        return claim_from_database(amount=amount, units=units, allow_any=allow_any, user_id=user_id, transaction_id=transaction_id)
+
+
+class RedisListBackend(BaseAllocationBackend):
+    """One Redis list of "<id>:<token_code>" entries per (amount, units) bucket."""
+
+    LOAD_CHUNK_SIZE = 5000
+
+    def __init__(self, client=None, url=None, prefix='tokenpool'):
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(url or getattr(settings, 'TOKEN_ALLOCATION_REDIS_URL', 'redis://localhost:6379/0'))
+        self.client = client
+        self.prefix = prefix
+
+    def _list_key(self, bucket):
+        return f'{self.prefix}:free:{bucket}'
+
+    def _processing_key(self, bucket):
+        return f'{self.prefix}:processing:{bucket}'
+
+    @property
+    def _buckets_key(self):
+        return f'{self.prefix}:buckets'
+
+    def _buckets(self):
+        """Return {bucket_key: (amount, units)} for every bucket that has ever held tokens."""
+        buckets = {}
+        for raw in self.client.smembers(self._buckets_key):
+            key = raw.decode() if isinstance(raw, bytes) else raw
+            amount, units = key.split('|')
+            buckets[key] = (None if amount == '*' else Decimal(amount), None if units == '*' else Decimal(units))
+        return buckets
+
+    def _requeue(self, bucket, raw):
+        pipe = self.client.pipeline(transaction=True)
+        pipe.lrem(self._processing_key(bucket), 1, raw)
+        pipe.rpush(self._list_key(bucket), raw)
+        pipe.execute()
+
+    def _pop(self, bucket, amount, units, user_id, transaction_id):
+        processing = self._processing_key(bucket)
+        while True:
+            raw = self.client.lmove(self._list_key(bucket), processing, 'LEFT', 'RIGHT')
+            if raw is None:
+                return None
+            pk, code = (raw.decode() if isinstance(raw, bytes) else raw).split(':', 1)
+            try:
+                allocated_at = allocate_pk(int(pk), user_id=user_id, transaction_id=transaction_id, amount=amount, units=units)
+            except Exception:
+                # keep the id claimable if the database write failed
+                self._requeue(bucket, raw)
+                raise
+            if allocated_at:
+                # acknowledge once the allocation is durable; if the surrounding transaction
+                # rolls back or the worker dies first, recover() puts the entry back
+                transaction.on_commit(lambda: self.client.lrem(processing, 1, raw))
+                return TokenPool(
+                    pk=int(pk),
+                    token_code=code,
+                    amount=amount,
+                    units=units,
+                    is_allocated=True,
+                    allocated_at=allocated_at,
+                    allocated_to_id=user_id,
+                    allocated_transaction_id=transaction_id,
+                )
+            # stale entry (claimed by code or reserved elsewhere): drop it and keep popping
+            self.client.lrem(processing, 1, raw)
+
+    def claim(self, amount=None, units=None, allow_any=False, user_id=None, transaction_id=None):
+        amount, units = _as_decimal(amount), _as_decimal(units)
+        buckets = self._buckets()
+        preferred = [k for k, (a, u) in buckets.items() if _matches(a, u, amount, units)]
+        others = [k for k in buckets if k not in preferred] if allow_any else []
+        for key in preferred + others:
+            token = self._pop(key, *buckets[key], user_id=user_id, transaction_id=transaction_id)
+            if token is not None:
+                return token
+        return None
+
+    def _push_rows(self, rows):
+        pipe = self.client.pipeline(transaction=False)
+        pushed = 0
+        for pk, code, amount, units in rows:
+            bucket = bucket_key(amount, units)
+            pipe.sadd(self._buckets_key, bucket)
+            pipe.rpush(self._list_key(bucket), f'{pk}:{code}')
+            pushed += 1
+            if pushed % self.LOAD_CHUNK_SIZE == 0:
+                pipe.execute()
+        pipe.execute()
+        return pushed
+
+    def tokens_imported(self, codes):
+        rows = TokenPool.objects.filter(token_code__in=list(codes), is_allocated=False, reserved_until__isnull=True)
+        return self._push_rows(rows.order_by('pk').values_list('pk', 'token_code', 'amount', 'units'))
+
+    def recover(self):
+        """Move processing entries whose token is still unallocated back to the free lists.
+
+        An entry whose claim is still in flight may be returned too; that is
+        harmless, as allocate_pk only succeeds for unallocated rows and the
+        copy is dropped as stale when it is popped again.
+        """
+        returned = 0
+        for key in self._buckets():
+            entries = self.client.lrange(self._processing_key(key), 0, -1)
+            if not entries:
+                continue
+            pks = {raw: int((raw.decode() if isinstance(raw, bytes) else raw).split(':', 1)[0]) for raw in entries}
+            free = set(TokenPool.objects.filter(pk__in=set(pks.values()), is_allocated=False).values_list('pk', flat=True))
+            for raw, pk in pks.items():
+                if pk in free:
+                    self._requeue(key, raw)
+                    returned += 1
+                else:
+                    self.client.lrem(self._processing_key(key), 1, raw)
+        return returned
+
+    def rebuild(self):
+        for key in self._buckets():
+            self.client.delete(self._list_key(key), self._processing_key(key))
+        self.client.delete(self._buckets_key)
+        rows = (
+            TokenPool.objects.filter(is_allocated=False, reserved_until__isnull=True)
+            .order_by('pk')
+            .values_list('pk', 'token_code', 'amount', 'units')
+            .iterator(chunk_size=self.LOAD_CHUNK_SIZE)
+        )
+        return self._push_rows(rows)
+
+
+class InMemoryBackend(BaseAllocationBackend):
+    """Process-local token pool for tests; claims are served without any database access."""
+
+    def __init__(self):
+        self._queues = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    def add(self, token_code, amount=None, units=None):
+        with self._lock:
+            self._queues[(_as_decimal(amount), _as_decimal(units))].append(token_code)
+
+    def tokens_imported(self, codes):
+        for code, amount, units in TokenPool.objects.filter(token_code__in=list(codes)).values_list('token_code', 'amount', 'units'):
+            self.add(code, amount, units)
+
+    def claim(self, amount=None, units=None, allow_any=False, user_id=None, transaction_id=None):
+        amount, units = _as_decimal(amount), _as_decimal(units)
+        with self._lock:
+            keys = [k for k in self._queues if _matches(*k, amount, units)]
+            if allow_any:
+                keys += [k for k in self._queues if k not in keys]
+            for key in keys:
+                if self._queues[key]:
+                    code = self._queues[key].popleft()
+                    return TokenPool(
+                        token_code=code,
+                        amount=key[0],
+                        units=key[1],
+                        is_allocated=True,
+                        allocated_at=timezone.now(),
+                        allocated_to_id=user_id,
+                        allocated_transaction_id=transaction_id,
+                    )
+        return None
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_allocation_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            path = getattr(settings, 'TOKEN_ALLOCATION_BACKEND', DEFAULT_BACKEND)
+            _backend = import_string(path)()
+        return _backend
+
+
+def set_allocation_backend(backend):
+    """Install a specific backend instance (e.g. RedisListBackend(client=fakeredis.FakeRedis()))."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def _reset_backend(setting, **kwargs):
+    if setting == 'TOKEN_ALLOCATION_BACKEND':
+        set_allocation_backend(None)
+
+
+setting_changed.connect(_reset_backend)
@@ -0,0 +1,265 @@
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import BigIntegerField, Case, CharField, Q, Value, When
+from django.utils import timezone
+
+from .counters import adjust_counter, record_allocation
+from .models import TokenPool
+
+# How many times the portable fallback retries when another writer claims the
+# candidate row between our SELECT and UPDATE.
+CLAIM_RETRIES = 5
+
+
+def _pool_filter(token_code=None, amount=None, units=None, include_leased=False):
+    """Build the WHERE clause (as a Q) selecting claimable (unallocated, unreserved) pool tokens.
+
+    include_leased also matches rows leased to a worker's reservation buffer.
+    """
+    q = Q(is_allocated=False)
+    if not include_leased:
+        q &= Q(reserved_until__isnull=True)
+    if token_code is not None:
+        q &= Q(token_code=token_code)
+    if amount is not None:
+        q &= Q(amount=amount)
+    if units is not None:
+        q &= Q(units=units)
+    return q
+
+
+def _claim_postgresql(q, allocated_at, user_id, transaction_id, include_leased=False):
+    """Claim one token in a single UPDATE ... RETURNING round trip.
+
+    The inner SELECT uses FOR UPDATE SKIP LOCKED so concurrent claimers never
+    wait on each other; it is served by the partial indexes on unallocated
+    tokens declared on TokenPool.Meta.
+    """
+    table = TokenPool._meta.db_table
+    # FOR UPDATE is only valid (and only compiles) inside a transaction block
+    with transaction.atomic():
+        inner = TokenPool.objects.filter(q).order_by('pk').values('pk')[:1].select_for_update(skip_locked=True)
+        inner_sql, inner_params = inner.query.sql_with_params()
+        unleased = '' if include_leased else 'AND reserved_until IS NULL '
+        sql = (
+            f'UPDATE {table} SET is_allocated = TRUE, allocated_at = %s, '
+            f'allocated_to_id = %s, allocated_transaction_id = %s, reserved_by = NULL, reserved_until = NULL '
+            f'WHERE id = ({inner_sql}) AND is_allocated = FALSE {unleased}'
+            f'RETURNING id, token_code, units, amount'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [allocated_at, user_id, transaction_id, *inner_params])
+            return cursor.fetchone()
+
+
+def _claim_fallback(q, allocated_at, user_id, transaction_id, include_leased=False):
+    """Compare-and-swap claim for backends without SKIP LOCKED (e.g. SQLite).
+
+    Picks the lowest candidate id and flips it with a conditional UPDATE; if a
+    concurrent writer won the row the UPDATE touches nothing and we retry.
+    """
+    for _ in range(CLAIM_RETRIES):
+        candidate = TokenPool.objects.filter(q).order_by('pk').values_list('pk', 'token_code', 'units', 'amount').first()
+        if candidate is None:
+            return None
+        guard = {} if include_leased else {'reserved_until__isnull': True}
+        updated = TokenPool.objects.filter(pk=candidate[0], is_allocated=False, **guard).update(
+            is_allocated=True,
+            allocated_at=allocated_at,
+            allocated_to_id=user_id,
+            allocated_transaction_id=transaction_id,
+            reserved_by=None,
+            reserved_until=None,
+        )
+        if updated:
+            return candidate
+    return None
+
+
+def _claim_one(q, allocated_at, user_id, transaction_id, include_leased=False):
+    if connection.vendor == 'postgresql':
+        return _claim_postgresql(q, allocated_at, user_id, transaction_id, include_leased)
+    return _claim_fallback(q, allocated_at, user_id, transaction_id, include_leased)
+
+
+def claim_from_database(token_code=None, amount=None, units=None, allow_any=False, user_id=None, transaction_id=None):
+    """Atomically mark one unallocated TokenPool row as allocated and return it.
+
+    - token_code: claim exactly this token (manual recharge / apply flows)
+    - amount / units: prefer a token of this denomination
+    - allow_any: when no token of the denomination is left, claim any token
+
+    A token_code claim also takes a row leased to a reservation buffer (the
+    user typed that exact code); the lease is cleared and the holder's later
+    allocate_reserved simply misses it. The claim and the matching pool
+    counter update (meters.counters) commit together. Returns an in-memory TokenPool instance reflecting the allocated
+    row, or None when nothing could be claimed.
+    """
+    allocated_at = timezone.now()
+    with transaction.atomic():
+        by_code = token_code is not None
+        row = _claim_one(_pool_filter(token_code, amount, units, include_leased=by_code), allocated_at, user_id, transaction_id, by_code)
+        if row is None and allow_any and token_code is None and (amount is not None or units is not None):
+            row = _claim_one(_pool_filter(), allocated_at, user_id, transaction_id)
+        if row is None:
+            return None
+        record_allocation(row[3], row[2])
+
+    pk, code, units_val, amount_val = row
+    return TokenPool(
+        pk=pk,
+        token_code=code,
+        units=units_val,
+        amount=amount_val,
+        is_allocated=True,
+        allocated_at=allocated_at,
+        allocated_to_id=user_id,
+        allocated_transaction_id=transaction_id,
+    )
+
+
+def claim_token(token_code=None, amount=None, units=None, allow_any=False, user_id=None, transaction_id=None):
+    """Claim a pool token for a purchase, recharge or auto-recharge.
+
+    Specific token codes are always claimed straight from the database;
+    denomination claims go through the configured allocation backend
+    (settings.TOKEN_ALLOCATION_BACKEND, see meters.allocation_backends).
+    Arguments and return value are as for claim_from_database.
+    """
+    if token_code is not None:
+        return claim_from_database(token_code=token_code, user_id=user_id, transaction_id=transaction_id)
+    from .allocation_backends import get_allocation_backend
+
+    return get_allocation_backend().claim(
+        amount=amount, units=units, allow_any=allow_any, user_id=user_id, transaction_id=transaction_id,
+    )
+
+
+def allocate_pk(pk, user_id=None, transaction_id=None, amount=None, units=None, include_leased=False):
+    """Allocate a specific claimable row by primary key; returns the allocation time or None if it was taken.
+
+    include_leased takes the row even if a reservation buffer holds its lease (a claim by token code).
+    """
+    now = timezone.now()
+    guard = {} if include_leased else {'reserved_until__isnull': True}
+    with transaction.atomic():
+        updated = TokenPool.objects.filter(pk=pk, is_allocated=False, **guard).update(
+            is_allocated=True,
+            allocated_at=now,
+            allocated_to_id=user_id,
+            allocated_transaction_id=transaction_id,
+            reserved_by=None,
+            reserved_until=None,
+        )
+        if not updated:
+            return None
+        record_allocation(amount, units)
+    return now
+
+
+def _reserve_postgresql(q, count, worker_id, reserved_until):
+    table = TokenPool._meta.db_table
+    with transaction.atomic():
+        inner = TokenPool.objects.filter(q).order_by('pk').values('pk')[:count].select_for_update(skip_locked=True)
+        inner_sql, inner_params = inner.query.sql_with_params()
+        sql = (
+            f'UPDATE {table} SET reserved_by = %s, reserved_until = %s '
+            f'WHERE id IN ({inner_sql}) AND is_allocated = FALSE AND reserved_until IS NULL '
+            f'RETURNING id, token_code, units, amount'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [worker_id, reserved_until, *inner_params])
+            return sorted(cursor.fetchall())
+
+
+def _reserve_fallback(q, count, worker_id, reserved_until):
+    # conditional UPDATE over the candidates, then read back the rows we actually won
+    ids = list(TokenPool.objects.filter(q).order_by('pk').values_list('pk', flat=True)[:count])
+    if not ids:
+        return []
+    TokenPool.objects.filter(pk__in=ids, is_allocated=False, reserved_until__isnull=True).update(
+        reserved_by=worker_id,
+        reserved_until=reserved_until,
+    )
+    return list(
+        TokenPool.objects.filter(pk__in=ids, reserved_by=worker_id, reserved_until=reserved_until)
+        .order_by('pk')
+        .values_list('pk', 'token_code', 'units', 'amount')
+    )
+
+
+def reserve_tokens(count, worker_id, reserved_until, amount=None, units=None):
+    """Lease up to `count` tokens of a denomination to `worker_id` in one statement.
+
+    Reserved rows stay unallocated but are invisible to claim_token until they
+    are allocated with allocate_reserved or their lease is released.
+    Returns a list of (id, token_code, units, amount) tuples.
+    """
+    q = _pool_filter(amount=amount, units=units)
+    if connection.vendor == 'postgresql':
+        return _reserve_postgresql(q, count, worker_id, reserved_until)
+    return _reserve_fallback(q, count, worker_id, reserved_until)
+
+
+def allocate_reserved(pk, worker_id, user_id=None, transaction_id=None, amount=None, units=None, now=None):
+    """Allocate a token this worker holds a live lease on; a primary-key update nobody else contends for.
+
+    amount/units identify the token's counter bucket. Returns the allocation
+    timestamp, or None if the lease was lost (expired and reaped, or never held).
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        updated = TokenPool.objects.filter(pk=pk, is_allocated=False, reserved_by=worker_id, reserved_until__gt=now).update(
+            is_allocated=True,
+            allocated_at=now,
+            allocated_to_id=user_id,
+            allocated_transaction_id=transaction_id,
+            reserved_by=None,
+            reserved_until=None,
+        )
+        if not updated:
+            return None
+        record_allocation(amount, units)
+    return now
+
+
+def allocate_reserved_many(assignments, worker_id, now=None):
+    """Allocate many leased tokens at once: {pk: (user_id, transaction_id)} -> set of allocated pks.
+
+    One locking SELECT and one CASE-based UPDATE for the whole batch instead of
+    an UPDATE per token; tokens whose lease was lost are left out.
+    """
+    if not assignments:
+        return set()
+    now = now or timezone.now()
+    with transaction.atomic():
+        owned = list(
+            TokenPool.objects.select_for_update()
+            .filter(pk__in=list(assignments), is_allocated=False, reserved_by=worker_id, reserved_until__gt=now)
+            .values_list('pk', 'amount', 'units')
+        )
+        pks = [pk for pk, _, _ in owned]
+        if not pks:
+            return set()
+        TokenPool.objects.filter(pk__in=pks).update(
+            is_allocated=True,
+            allocated_at=now,
+            allocated_to_id=Case(*[When(pk=pk, then=Value(assignments[pk][0])) for pk in pks], output_field=BigIntegerField()),
+            allocated_transaction_id=Case(*[When(pk=pk, then=Value(assignments[pk][1])) for pk in pks], output_field=CharField()),
+            reserved_by=None,
+            reserved_until=None,
+        )
+        for (amount, units), n in Counter((amount, units) for _, amount, units in owned).items():
+            adjust_counter(amount, units, available=-n, allocated=n)
+    return set(pks)
+
+
+def release_reservations(worker_id=None, expired_before=None):
+    """Return leased tokens to the pool: every lease of worker_id and/or every lease expired by expired_before."""
+    qs = TokenPool.objects.filter(is_allocated=False, reserved_until__isnull=False)
+    if worker_id is not None:
+        qs = qs.filter(reserved_by=worker_id)
+    if expired_before is not None:
+        qs = qs.filter(reserved_until__lte=expired_before)
+    return qs.update(reserved_by=None, reserved_until=None)
@@ -0,0 +1,255 @@
+"""Micro-benchmarks for the allocation and recharge hot paths.
+
+Used by the `bench_meters` command. Seeds a deterministic TokenPool, users and
+meters (everything tagged with the BENCH prefix so it can be removed again),
+then drives purchase_electricity, recharge_token, apply_token and
+run_autorecharge_for_user from N worker threads through the real URL/view
+stack and reports latency percentiles, throughput and queries per operation.
+
+It writes to whatever database DATABASES['default'] points at; run it against
+a throwaway SQLite file or a local PostgreSQL, not production.
+"""
+import random
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import close_old_connections, connection, connections
+from django.test.utils import CaptureQueriesContext
+
+from .importers import import_token_rows
+
+OPERATIONS = ('purchase', 'recharge', 'apply', 'autorecharge')
+DENOMINATIONS = [Decimal('1.00'), Decimal('5.00'), Decimal('10.00'), Decimal('20.00'), Decimal('50.00')]
+UNITS_PER_DOLLAR = Decimal('4.2')
+USER_PREFIX = 'bench-'
+METER_PREFIX = 'BENCH-'
+
+
+def token_prefix(seed):
+    # Token.token_code is 20 chars and recharge_token strips non-alphanumerics
+    return f'BENCH{seed % 100:02d}'
+
+
+def _pool_rows(size, seed):
+    rng = random.Random(seed)
+    prefix = token_prefix(seed)
+    for i in range(size):
+        amount = rng.choice(DENOMINATIONS)
+        yield f'{prefix}{i:010d}', amount, (amount * UNITS_PER_DOLLAR).quantize(Decimal('0.01'))
+
+
+def seed(pool_size=10000, users=20, seed=1, batch_size=5000):
+    """Create (or top up) the benchmark pool, users, meters and auto-recharge configs.
+
+    Returns {'pool': import stats, 'users': [...user ids]}.
+    """
+    from usersAuth.models import User
+
+    from .models import AutoRechargeConfig, Meter
+
+    pool_stats = import_token_rows(_pool_rows(pool_size, seed), batch_size=batch_size)
+
+    existing = set(User.objects.filter(username__startswith=USER_PREFIX).values_list('username', flat=True))
+    new_users = []
+    for i in range(users):
+        username = f'{USER_PREFIX}{i}'
+        if username not in existing:
+            user = User(username=username, email=f'{username}@bench.invalid')
+            user.set_unusable_password()
+            new_users.append(user)
+    User.objects.bulk_create(new_users)
+    bench_users = list(User.objects.filter(username__startswith=USER_PREFIX).order_by('pk')[:users])
+
+    with_meter = set(Meter.objects.filter(user__in=bench_users).values_list('user_id', flat=True))
+    Meter.objects.bulk_create([
+        Meter(user=u, meter_number=f'{METER_PREFIX}{u.pk:08d}', address='Benchmark')
+        for u in bench_users if u.pk not in with_meter
+    ])
+    with_cfg = set(AutoRechargeConfig.objects.filter(user__in=bench_users).values_list('user_id', flat=True))
+    AutoRechargeConfig.objects.bulk_create([
+        AutoRechargeConfig(user=u, enabled=True, default_threshold=Decimal('10.00'), default_amount=Decimal('21.00'))
+        for u in bench_users if u.pk not in with_cfg
+    ])
+    return {'pool': pool_stats, 'users': [u.pk for u in bench_users]}
+
+
+def cleanup(seed=1):
+    """Delete everything seed() created plus the rows the benchmark wrote."""
+    from usersAuth.models import User
+
+    from .allocation_backends import get_allocation_backend
+    from .counters import rebuild_counters
+    from .models import ManualRecharge, TokenPool, TokenPurchase
+
+    users = User.objects.filter(username__startswith=USER_PREFIX)
+    TokenPurchase.objects.filter(user__in=users).delete()
+    ManualRecharge.objects.filter(user__in=users).delete()
+    deleted, _ = users.delete()
+    pool_deleted, _ = TokenPool.objects.filter(token_code__startswith=token_prefix(seed)).delete()
+    rebuild_counters()
+    get_allocation_backend().rebuild()
+    return {'users_and_related': deleted, 'pool': pool_deleted}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class _Workload:
+    """Hands out per-operation arguments to worker threads."""
+
+    def __init__(self, operation, users, meters, codes):
+        self.operation = operation
+        self.users = users
+        self.meters = meters
+        self.codes = codes
+        self._lock = threading.Lock()
+        self._next = 0
+
+    def next_args(self):
+        with self._lock:
+            i = self._next
+            self._next += 1
+        user = self.users[i % len(self.users)]
+        code = self.codes[i] if self.codes else None
+        return user, self.meters[user.pk], code
+
+
+def _run_one(client, op, user, meter_id, code):
+    """Execute one operation; returns True on success."""
+    from .utils import run_autorecharge_for_user
+
+    if op == 'autorecharge':
+        summary = run_autorecharge_for_user(user, force=True)
+        return summary['executed'] > 0
+    client.force_authenticate(user=user)
+    if op == 'purchase':
+        resp = client.post(f'/api/meters/{meter_id}/purchase_electricity/', {'amount': '10.00'}, format='json')
+    elif op == 'recharge':
+        resp = client.post(f'/api/meters/{meter_id}/recharge_token/', {'token': code}, format='json')
+    else:
+        resp = client.post(f'/api/meters/{meter_id}/apply_token/', {'token': code}, format='json')
+    return resp.status_code < 400
+
+
+def _client():
+    from django.conf import settings
+    from rest_framework.test import APIClient
+
+    # requests go through the normal middleware stack, so use a host ALLOWED_HOSTS accepts
+    host = next((h for h in settings.ALLOWED_HOSTS if h and h != '*' and not h.startswith('.')), 'testserver')
+    return APIClient(SERVER_NAME=host)
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def _worker(workload, count, results, own_connection):
+    client = _client()
+    latencies, queries, errors = [], 0, 0
+    try:
+        for _ in range(count):
+            user, meter_id, code = workload.next_args()
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                try:
+                    ok = _run_one(client, workload.operation, user, meter_id, code)
+                except Exception:
+                    ok = False
+                latencies.append(time.perf_counter() - started)
+            queries += len(ctx.captured_queries)
+            errors += 0 if ok else 1
+    finally:
+        if own_connection:
+            connections.close_all()
+    results.append((latencies, queries, errors))
+
+
+def run_operation(operation, users, meters, operations=200, workers=4, codes=None):
+    """Run `operations` calls of one operation spread over `workers` threads; returns a stats dict.
+
+    With workers=1 everything runs on the calling thread (and its connection).
+    """
+    workload = _Workload(operation, users, meters, codes)
+    results = []
+    per_worker = [operations // workers + (1 if i < operations % workers else 0) for i in range(workers)]
+    started = time.perf_counter()
+    if workers == 1:
+        _worker(workload, operations, results, own_connection=False)
+    else:
+        threads = [threading.Thread(target=_worker, args=(workload, n, results, True)) for n in per_worker if n]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(l for r in results for l in r[0])
+    done = len(latencies)
+    return {
+        'operations': done,
+        'errors': sum(r[2] for r in results),
+        'p50_ms': _ms(percentile(latencies, 50)),
+        'p95_ms': _ms(percentile(latencies, 95)),
+        'p99_ms': _ms(percentile(latencies, 99)),
+        'max_ms': _ms(latencies[-1] if latencies else None),
+        'throughput_per_s': round(done / elapsed, 2) if elapsed else None,
+        'queries_per_op': round(sum(r[1] for r in results) / done, 2) if done else None,
+    }
+
+
+def run_benchmarks(pool_size=10000, users=20, workers=4, operations=200, ops=OPERATIONS, seed_value=1, skip_seed=False):
+    """Seed (unless skip_seed) and benchmark each operation in `ops`; returns the JSON-able report."""
+    from django.conf import settings
+    from usersAuth.models import User
+
+    from .models import Meter, TokenPool
+
+    report = {
+        'database': connection.vendor,
+        'pool_size': pool_size,
+        'users': users,
+        'workers': workers,
+        'operations_per_type': operations,
+        'seed': seed_value,
+        'celery_eager': bool(getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False)),
+        'results': {},
+    }
+    if not skip_seed:
+        started = time.perf_counter()
+        seeded = seed(pool_size=pool_size, users=users, seed=seed_value)
+        report['seed_seconds'] = round(time.perf_counter() - started, 3)
+        report['seed_rows_per_s'] = round(seeded['pool']['rows'] / report['seed_seconds'], 1) if report['seed_seconds'] else None
+
+    bench_users = list(User.objects.filter(username__startswith=USER_PREFIX).order_by('pk')[:users])
+    if not bench_users:
+        raise ValueError('No benchmark users found; run without skip_seed first')
+    meters = defaultdict(lambda: None)
+    meters.update(Meter.objects.filter(user__in=bench_users).values_list('user_id', 'pk'))
+
+    # recharge/apply need distinct unclaimed codes; take them from the top of the pool so
+    # they don't collide with purchases, which claim the lowest ids first
+    code_ops = [op for op in ops if op in ('recharge', 'apply')]
+    free_codes = list(
+        TokenPool.objects.filter(token_code__startswith=token_prefix(seed_value), is_allocated=False, reserved_until__isnull=True)
+        .order_by('-pk')
+        .values_list('token_code', flat=True)[:operations * len(code_ops)]
+    )
+
+    for op in ops:
+        codes = None
+        if op in code_ops:
+            codes, free_codes = free_codes[:operations], free_codes[operations:]
+            if len(codes) < operations:
+                report['results'][op] = {'skipped': f'only {len(codes)} free pool tokens left'}
+                continue
+        close_old_connections()
+        report['results'][op] = run_operation(op, bench_users, meters, operations=operations, workers=workers, codes=codes)
+    return report
@@ -0,0 +1,77 @@
+"""Bulk meter configuration for fleet accounts.
+
+`configure_meters` applies auto-recharge thresholds/amounts, enable flags and
+nicknames to many of a user's meters with at most two UPDATE statements: one
+for the values shared by the whole selection and one Case/When UPDATE for
+per-meter values, instead of loading and save()-ing every meter.
+"""
+from django.db import transaction as db_transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Meter
+
+CONFIG_FIELDS = ('nickname', 'auto_recharge_enabled', 'auto_recharge_threshold', 'auto_recharge_amount')
+MAX_BULK_METERS = 1000
+
+
+def select_meters(user, ids=None, meter_number_prefix=None, auto_recharge_enabled=None):
+    qs = Meter.objects.filter(user=user)
+    if ids is not None:
+        qs = qs.filter(pk__in=ids)
+    if meter_number_prefix:
+        qs = qs.filter(meter_number__startswith=meter_number_prefix)
+    if auto_recharge_enabled is not None:
+        qs = qs.filter(auto_recharge_enabled=auto_recharge_enabled)
+    return qs
+
+
+def _value(field, value):
+    return Value(value, output_field=Meter._meta.get_field(field))
+
+
+def configure_meters(user, values=None, per_meter=None, **filters):
+    """Update the user's meters; returns {meter_id: meter values after the update}.
+
+    `values` ({field: value}) is applied to every meter select_meters(user,
+    **filters) matches; `per_meter` ({meter_id: {field: value}}) then sets
+    individual values and wins over `values`. Meters in per_meter that the
+    user doesn't own are ignored and absent from the result.
+    """
+    values = values or {}
+    per_meter = per_meter or {}
+    now = timezone.now()
+    with db_transaction.atomic():
+        selected = set(select_meters(user, **filters).values_list('pk', flat=True)) if values else set()
+        owned = set(Meter.objects.filter(user=user, pk__in=per_meter).values_list('pk', flat=True))
+        if selected:
+            # .update() skips auto_now
+            Meter.objects.filter(pk__in=selected).update(**values, updated_at=now)
+        per_meter = {pk: v for pk, v in per_meter.items() if pk in owned and v}
+        if per_meter:
+            cases = {}
+            for field in CONFIG_FIELDS:
+                whens = [When(pk=pk, then=_value(field, v[field])) for pk, v in per_meter.items() if field in v]
+                if whens:
+                    cases[field] = Case(*whens, default=F(field), output_field=Meter._meta.get_field(field))
+            Meter.objects.filter(pk__in=per_meter).update(**cases, updated_at=now)
+        touched = selected | owned
+        return {
+            row['id']: row
+            for row in Meter.objects.filter(pk__in=touched).values('id', 'meter_number', *CONFIG_FIELDS, 'updated_at')
+        }
+
+
+def fill_missing_defaults(user, threshold=None, amount=None):
+    """Copy the config defaults onto the user's meters that have no value of their own; one UPDATE."""
+    updates, missing = {}, Q()
+    if threshold is not None:
+        updates['auto_recharge_threshold'] = Coalesce('auto_recharge_threshold', _value('auto_recharge_threshold', threshold))
+        missing |= Q(auto_recharge_threshold__isnull=True)
+    if amount is not None:
+        updates['auto_recharge_amount'] = Coalesce('auto_recharge_amount', _value('auto_recharge_amount', amount))
+        missing |= Q(auto_recharge_amount__isnull=True)
+    if not updates:
+        return 0
+    return Meter.objects.filter(missing, user=user).update(**updates, updated_at=timezone.now())
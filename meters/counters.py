@@ -0,0 +1,144 @@
+"""Per-denomination TokenPool availability counters.
+
+The counters are adjusted in the same transaction as the pool change they
+describe (imports add to `available`, allocations move one from `available`
+to `allocated`), so reading availability never has to count TokenPool rows.
+`rebuild_counters` recomputes them from the pool if they ever drift (e.g.
+after manual edits in the admin).
+"""
+import random
+from collections import Counter
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import TokenPool, TokenPoolCounter
+
+COUNTER_SLOTS = 8
+
+
+def _fmt(value):
+    return '*' if value is None else str(Decimal(value).quantize(Decimal('0.01')))
+
+
+def bucket_key(amount, units):
+    return f'{_fmt(amount)}|{_fmt(units)}'
+
+
+def adjust_counter(amount, units, available=0, allocated=0):
+    """Atomically add the given deltas to one (random) slot of a bucket."""
+    if not available and not allocated:
+        return
+    key = bucket_key(amount, units)
+    slot = random.randrange(COUNTER_SLOTS)
+    changes = {'available': F('available') + available, 'allocated': F('allocated') + allocated}
+    if TokenPoolCounter.objects.filter(bucket=key, slot=slot).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            TokenPoolCounter.objects.create(bucket=key, slot=slot, amount=amount, units=units, available=available, allocated=allocated)
+    except IntegrityError:
+        # another writer created the slot first
+        TokenPoolCounter.objects.filter(bucket=key, slot=slot).update(**changes)
+
+
+def record_allocation(amount, units):
+    adjust_counter(amount, units, available=-1, allocated=1)
+
+
+def record_import(rows):
+    """Add newly inserted pool rows, given as an iterable of (amount, units), to the counters."""
+    for (amount, units), n in Counter(rows).items():
+        adjust_counter(amount, units, available=n)
+
+
+def record_change(previous, current):
+    """Move one pool row's contribution from `previous` to `current` (TokenPool instances or None).
+
+    For saves that bypass the importer and allocator, e.g. the admin.
+    """
+    if previous is not None:
+        adjust_counter(previous.amount, previous.units, **{'allocated' if previous.is_allocated else 'available': -1})
+    if current is not None:
+        adjust_counter(current.amount, current.units, **{'allocated' if current.is_allocated else 'available': 1})
+
+
+def rebuild_counters():
+    """Recompute every bucket from TokenPool with one grouped aggregate; returns the bucket count."""
+    rows = (
+        TokenPool.objects.values('amount', 'units')
+        .annotate(
+            available=Count('id', filter=Q(is_allocated=False)),
+            allocated=Count('id', filter=Q(is_allocated=True)),
+        )
+        .order_by()
+    )
+    counters = [
+        TokenPoolCounter(
+            bucket=bucket_key(r['amount'], r['units']),
+            slot=0,
+            amount=r['amount'],
+            units=r['units'],
+            available=r['available'],
+            allocated=r['allocated'],
+        )
+        for r in rows
+    ]
+    with transaction.atomic():
+        TokenPoolCounter.objects.all().delete()
+        TokenPoolCounter.objects.bulk_create(counters)
+    return len(counters)
+
+
+def pool_availability():
+    """Return per-bucket and total available/allocated counts."""
+    buckets = (
+        TokenPoolCounter.objects.values('bucket', 'amount', 'units')
+        .annotate(available=Sum('available'), allocated=Sum('allocated'))
+        .order_by('amount', 'units')
+    )
+    buckets = [
+        {'amount': b['amount'], 'units': b['units'], 'available': b['available'] or 0, 'allocated': b['allocated'] or 0}
+        for b in buckets
+    ]
+    return {
+        'total_available': sum(b['available'] for b in buckets),
+        'total_allocated': sum(b['allocated'] for b in buckets),
+        'buckets': buckets,
+    }
+
+
+def available_tokens(amount=None, units=None):
+    qs = TokenPoolCounter.objects.all()
+    if amount is not None:
+        qs = qs.filter(amount=amount)
+    if units is not None:
+        qs = qs.filter(units=units)
+    return qs.aggregate(n=Sum('available'))['n'] or 0
+
+
+def _pool_has_tokens(amount=None, units=None):
+    qs = TokenPool.objects.filter(is_allocated=False)
+    if amount is not None:
+        qs = qs.filter(amount=amount)
+    if units is not None:
+        qs = qs.filter(units=units)
+    # free rows are served by the partial indexes; leased rows still count, their lease ends
+    return qs.filter(reserved_until__isnull=True).exists() or qs.filter(reserved_until__isnull=False).exists()
+
+
+def has_available_tokens(amount=None, units=None, allow_any=False):
+    """Admission check mirroring allocator.claim_token's denomination/fallback policy.
+
+    The counters answer the common case. They are derived data, so an empty
+    reading is confirmed against TokenPool before a caller turns anyone away;
+    the claim itself stays the final word.
+    """
+    if available_tokens(amount=amount, units=units) > 0:
+        return True
+    if allow_any and available_tokens() > 0:
+        return True
+    if _pool_has_tokens(amount=amount, units=units):
+        return True
+    return allow_any and (amount is not None or units is not None) and _pool_has_tokens()
@@ -0,0 +1,153 @@
+"""Token demand forecasting per denomination bucket.
+
+`aggregate_daily_demand` rolls TokenPurchase rows up into TokenDemandDaily
+with one grouped query, re-aggregating only from the last stored day onwards.
+`forecast_demand` loads the recent daily series into a buckets x days NumPy
+matrix. It fits a weekday-seasonal model with an exponentially smoothed
+level per bucket, then walks the projection forward against each bucket's
+available pool tokens to find the day it runs out. The results replace the
+TokenDemandForecast rows, which staff read to schedule pool refills.
+
+Synthetic AUTO- codes (auto-recharges while the pool was empty) never came
+from the pool and are left out.
+"""
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Max
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .counters import bucket_key, pool_availability
+from .models import TokenDemandDaily, TokenDemandForecast, TokenPurchase
+
+SYNTHETIC_PREFIX = 'AUTO-'
+HISTORY_DAYS = 56
+HORIZON_DAYS = 365
+SMOOTHING = 0.3
+
+
+def aggregate_daily_demand(full=False):
+    """Refresh TokenDemandDaily from TokenPurchase; returns the number of daily rows written.
+
+    Incremental runs start at the last stored day (it may have been partial);
+    full=True rebuilds the whole history.
+    """
+    latest = None if full else TokenDemandDaily.objects.aggregate(day=Max('day'))['day']
+    purchases = TokenPurchase.objects.exclude(token_code__startswith=SYNTHETIC_PREFIX)
+    stale = TokenDemandDaily.objects.all()
+    if latest is not None:
+        purchases = purchases.filter(purchased_at__gte=timezone.make_aware(datetime.combine(latest, time.min)))
+        stale = stale.filter(day__gte=latest)
+    rows = (
+        purchases.annotate(day=TruncDate('purchased_at'))
+        .values('day', 'amount', 'units')
+        .annotate(purchases=Count('id'))
+        .order_by()
+    )
+    daily = {}
+    for r in rows:
+        key = (bucket_key(r['amount'], r['units']), r['day'])
+        if key in daily:
+            # amounts/units that differ only in formatting share a bucket
+            daily[key].purchases += r['purchases']
+        else:
+            daily[key] = TokenDemandDaily(bucket=key[0], day=r['day'], amount=r['amount'], units=r['units'], purchases=r['purchases'])
+    with transaction.atomic():
+        stale.delete()
+        TokenDemandDaily.objects.bulk_create(daily.values())
+    return len(daily)
+
+
+def fit_weekly(series, weekdays, alpha=SMOOTHING):
+    """Fit level * weekday-multiplier per row of a (buckets, days) matrix.
+
+    weekdays gives each column's weekday (0 = Monday). Returns (level, profile)
+    with shapes (buckets,) and (buckets, 7); profiles average to ~1 and are
+    flat for rows without demand.
+    """
+    buckets = series.shape[0]
+    mean = series.mean(axis=1, keepdims=True)
+    by_weekday = np.ones((buckets, 7))
+    for w in range(7):
+        cols = weekdays == w
+        if cols.any():
+            by_weekday[:, w] = series[:, cols].mean(axis=1)
+    profile = np.divide(by_weekday, mean, out=np.ones((buckets, 7)), where=mean > 0)
+
+    seasonal = profile[:, weekdays]
+    deseasonalized = np.divide(series, seasonal, out=np.zeros_like(series, dtype=float), where=seasonal > 0)
+    # the profile averages to 1, so the plain mean is an unbiased starting level;
+    # weekdays that never see demand carry no information about it
+    level = mean[:, 0]
+    for day in range(series.shape[1]):
+        level = np.where(seasonal[:, day] > 0, alpha * deseasonalized[:, day] + (1 - alpha) * level, level)
+    return level, profile
+
+
+def depletion_offsets(level, profile, available, start_weekday, horizon=HORIZON_DAYS):
+    """Days from the start until cumulative projected demand reaches `available`; -1 beyond the horizon."""
+    weekdays = (start_weekday + np.arange(horizon)) % 7
+    projected = level[:, None] * profile[:, weekdays]
+    depleted = projected.cumsum(axis=1) >= available[:, None]
+    reached = depleted.any(axis=1) & (level > 0)
+    return np.where(reached, depleted.argmax(axis=1), -1), projected
+
+
+def forecast_demand(history_days=HISTORY_DAYS, horizon=HORIZON_DAYS, today=None):
+    """Fit the model over the last history_days complete days and replace TokenDemandForecast; returns the rows."""
+    today = today or timezone.localdate()
+    start = today - timedelta(days=history_days)
+    days = [start + timedelta(days=i) for i in range(history_days)]
+
+    pool = {bucket_key(b['amount'], b['units']): b for b in pool_availability()['buckets']}
+    history = list(
+        TokenDemandDaily.objects.filter(day__gte=start, day__lt=today).values_list('bucket', 'day', 'amount', 'units', 'purchases')
+    )
+    meta = {bucket: (b['amount'], b['units']) for bucket, b in pool.items()}
+    meta.update({bucket: (amount, units) for bucket, _, amount, units, _ in history})
+    buckets = sorted(meta)
+    row = {bucket: i for i, bucket in enumerate(buckets)}
+
+    series = np.zeros((len(buckets), history_days))
+    for bucket, day, _, _, purchases in history:
+        series[row[bucket], (day - start).days] = purchases
+    weekdays = np.array([d.weekday() for d in days], dtype=int)
+    available = np.array([pool[b]['available'] if b in pool else 0 for b in buckets], dtype=float)
+
+    level, profile = fit_weekly(series, weekdays)
+    offsets, projected = depletion_offsets(level, profile, available, today.weekday(), horizon)
+    seen = series > 0
+    first_seen = np.where(seen.any(axis=1), seen.argmax(axis=1), history_days)
+
+    now = timezone.now()
+    forecasts = [
+        TokenDemandForecast(
+            bucket=bucket,
+            amount=meta[bucket][0],
+            units=meta[bucket][1],
+            available=int(available[i]),
+            daily_level=round(float(level[i]), 4),
+            weekday_profile=[round(float(p), 4) for p in profile[i]],
+            projected_next_7_days=round(float(projected[i, :7].sum()), 2),
+            depletion_date=today + timedelta(days=int(offsets[i])) if offsets[i] >= 0 else None,
+            history_days=int(history_days - first_seen[i]),
+            computed_at=now,
+        )
+        for i, bucket in enumerate(buckets)
+    ]
+    with transaction.atomic():
+        TokenDemandForecast.objects.all().delete()
+        TokenDemandForecast.objects.bulk_create(forecasts)
+    return forecasts
+
+
+def run_forecast(full=False):
+    aggregated = aggregate_daily_demand(full=full)
+    forecasts = forecast_demand()
+    return {
+        'daily_rows': aggregated,
+        'buckets': len(forecasts),
+        'depleting': sum(1 for f in forecasts if f.depletion_date is not None),
+    }
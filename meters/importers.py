@@ -0,0 +1,395 @@
+"""Streaming TokenPool importer.
+
+Token files from the utility can hold millions of rows, so they are parsed
+incrementally (JSON array, NDJSON or CSV) and written in batches instead of
+one get_or_create per token. On PostgreSQL each batch is COPY'd into a
+temporary staging table and merged with a single INSERT ... ON CONFLICT.
+
+sync_token_file additionally records a TokenImportManifest per source so
+unchanged files are skipped and grown files only import their new tail.
+"""
+import csv
+import hashlib
+import io
+import json
+import os
+import time
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection, transaction
+
+from .allocation_backends import get_allocation_backend
+from .counters import adjust_counter, rebuild_counters, record_import
+from .models import TokenImportManifest, TokenPool
+
+DEFAULT_BATCH_SIZE = 5000
+READ_CHUNK_SIZE = 1 << 16
+
+FORMATS = ('json', 'ndjson', 'csv')
+
+
+def iter_json_array(fp, chunk_size=READ_CHUNK_SIZE):
+    """Yield the elements of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+    started = False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    while True:
+        # skip whitespace and element separators
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            fill()
+
+        if pos >= len(buf):
+            if started:
+                raise ValueError('Unterminated JSON array')
+            return
+
+        if not started:
+            if buf[pos] != '[':
+                raise ValueError('Expected a JSON array')
+            started = True
+            pos += 1
+            continue
+
+        if buf[pos] == ']':
+            return
+
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            fill()
+            continue
+        # a value ending exactly at the buffer edge may be truncated (e.g. a number)
+        if end == len(buf) and not eof:
+            fill()
+            continue
+        pos = end
+        yield obj
+
+
+def iter_ndjson(fp):
+    for line in fp:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_csv(fp):
+    yield from csv.DictReader(fp)
+
+
+def detect_format(path, fp=None):
+    """Guess the file format from its extension, falling back to the first byte."""
+    ext = os.path.splitext(str(path))[1].lower().lstrip('.')
+    if ext in ('ndjson', 'jsonl'):
+        return 'ndjson'
+    if ext == 'csv':
+        return 'csv'
+    if fp is not None:
+        head = fp.read(READ_CHUNK_SIZE).lstrip()
+        fp.seek(0)
+        if head.startswith('['):
+            return 'json'
+        if head.startswith('{'):
+            return 'ndjson'
+        return 'csv'
+    return 'json'
+
+
+def iter_entries(fp, fmt):
+    if fmt == 'json':
+        return iter_json_array(fp)
+    if fmt == 'ndjson':
+        return iter_ndjson(fp)
+    if fmt == 'csv':
+        return iter_csv(fp)
+    raise ValueError(f'Unsupported token file format: {fmt}')
+
+
+def _to_decimal(value):
+    if value is None or value == '':
+        return None
+    try:
+        return Decimal(str(value)).quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def normalize_entry(entry):
+    """Map a raw file entry to (token_code, amount, units); token_code is None for junk rows."""
+    if not isinstance(entry, dict):
+        return None, None, None
+    code = entry.get('token') or entry.get('token_code')
+    if not code:
+        return None, None, None
+    # Prefer explicit amount (monetary) and units (kWh) keys
+    amount = entry.get('amount') if entry.get('amount') not in (None, '') else entry.get('price')
+    units = entry.get('units') or entry.get('kwh')
+    return str(code).strip(), _to_decimal(amount), _to_decimal(units)
+
+
+def iter_token_rows(entries):
+    for entry in entries:
+        row = normalize_entry(entry)
+        if row[0]:
+            yield row
+
+
+def _batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _dedupe(batch):
+    # the last occurrence of a token code within a batch wins
+    return list({code: (code, amount, units) for code, amount, units in batch}.values())
+
+
+def _write_batch_orm(batch):
+    """Insert new tokens and refresh metadata on existing ones: five queries per batch at most.
+
+    ignore_conflicts hides which rows a concurrent import got in first, so the
+    new rows carry a per-batch marker in reserved_by (no lease: reserved_until
+    stays NULL) and the rows actually inserted are re-selected by it before
+    counters and backends are told about them.
+    """
+    batch = _dedupe(batch)
+    codes = [code for code, _, _ in batch]
+    existing = {
+        code: (pk, amount, units, is_allocated)
+        for pk, code, amount, units, is_allocated in TokenPool.objects.filter(token_code__in=codes).values_list(
+            'pk', 'token_code', 'amount', 'units', 'is_allocated'
+        )
+    }
+
+    marker = f'import:{uuid.uuid4().hex}'
+    new_rows = []
+    changed = []
+    moves = []
+    for code, amount, units in batch:
+        current = existing.get(code)
+        if current is None:
+            new_rows.append(TokenPool(token_code=code, amount=amount, units=units, reserved_by=marker))
+            continue
+        pk, cur_amount, cur_units, is_allocated = current
+        # only overwrite metadata the file actually provides
+        new_amount = amount if amount is not None else cur_amount
+        new_units = units if units is not None else cur_units
+        if (new_amount, new_units) != (cur_amount, cur_units):
+            changed.append(TokenPool(pk=pk, amount=new_amount, units=new_units))
+            moves.append(((cur_amount, cur_units), (new_amount, new_units), is_allocated))
+
+    with transaction.atomic():
+        created = []
+        if new_rows:
+            TokenPool.objects.bulk_create(new_rows, ignore_conflicts=True)
+            inserted = TokenPool.objects.filter(token_code__in=[t.token_code for t in new_rows], reserved_by=marker)
+            created = list(inserted.values_list('token_code', 'amount', 'units'))
+            inserted.update(reserved_by=None)
+        if changed:
+            TokenPool.objects.bulk_update(changed, ['amount', 'units'])
+        # keep the per-denomination counters in step with the pool
+        record_import((amount, units) for _, amount, units in created)
+        for old_bucket, new_bucket, is_allocated in moves:
+            field = 'allocated' if is_allocated else 'available'
+            adjust_counter(*old_bucket, **{field: -1})
+            adjust_counter(*new_bucket, **{field: 1})
+        if created:
+            # let queue-based allocation backends pick up the new tokens once they are visible
+            backend = get_allocation_backend()
+            codes = [code for code, _, _ in created]
+            transaction.on_commit(lambda: backend.tokens_imported(codes))
+    return len(created), len(changed)
+
+
+def _copy_escape(value):
+    if value is None:
+        return '\\N'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def _write_batch_copy(cursor, batch):
+    """COPY a batch into the staging table and merge it into TokenPool."""
+    table = TokenPool._meta.db_table
+    buf = io.StringIO()
+    for code, amount, units in batch:
+        buf.write(f'{_copy_escape(code)}\t{_copy_escape(amount)}\t{_copy_escape(units)}\n')
+    buf.seek(0)
+
+    cursor.execute('TRUNCATE tokenpool_import')
+    cursor.copy_expert('COPY tokenpool_import (token_code, amount, units) FROM STDIN', buf)
+    cursor.execute(
+        f'''
+        WITH merged AS (
+            INSERT INTO {table} AS t (token_code, amount, units, is_allocated, created_at)
+            SELECT DISTINCT ON (token_code) token_code, amount, units, FALSE, now()
+            FROM tokenpool_import
+            -- the last occurrence of a code in the batch wins, as in the ORM path
+            ORDER BY token_code, seq DESC
+            ON CONFLICT (token_code) DO UPDATE
+                SET amount = COALESCE(EXCLUDED.amount, t.amount),
+                    units = COALESCE(EXCLUDED.units, t.units)
+                WHERE (EXCLUDED.amount IS NOT NULL AND EXCLUDED.amount IS DISTINCT FROM t.amount)
+                   OR (EXCLUDED.units IS NOT NULL AND EXCLUDED.units IS DISTINCT FROM t.units)
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted) FROM merged
+        '''
+    )
+    created, updated = cursor.fetchone()
+    return created, updated
+
+
+def copy_supported():
+    """COPY needs PostgreSQL through psycopg2 (cursor.copy_expert)."""
+    if connection.vendor != 'postgresql':
+        return False
+    try:
+        import psycopg2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def import_token_rows(rows, batch_size=DEFAULT_BATCH_SIZE, use_copy=None, progress=None):
+    """Write normalized (token_code, amount, units) rows into TokenPool in batches.
+
+    progress, if given, is called after every batch with the running stats dict.
+    Returns {'rows', 'created', 'updated', 'seconds'}.
+    """
+    if use_copy is None:
+        use_copy = copy_supported()
+
+    stats = {'rows': 0, 'created': 0, 'updated': 0, 'seconds': 0.0}
+    started = time.monotonic()
+
+    def record(batch, created, updated):
+        stats['rows'] += len(batch)
+        stats['created'] += created
+        stats['updated'] += updated
+        stats['seconds'] = time.monotonic() - started
+        if progress:
+            progress(stats)
+
+    if use_copy:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE IF NOT EXISTS tokenpool_import '
+                '(seq bigserial, token_code varchar(64), amount numeric(10, 2), units numeric(10, 2)) ON COMMIT DROP'
+            )
+            for batch in _batched(rows, batch_size):
+                record(batch, *_write_batch_copy(cursor, batch))
+            # the merge doesn't report per-bucket changes, so recount in one grouped pass
+            rebuild_counters()
+        # likewise the queue-based allocation backends reload from the pool
+        get_allocation_backend().rebuild()
+    else:
+        for batch in _batched(rows, batch_size):
+            record(batch, *_write_batch_orm(batch))
+
+    stats['seconds'] = time.monotonic() - started
+    return stats
+
+
+def import_token_file(path, fmt=None, batch_size=DEFAULT_BATCH_SIZE, use_copy=None, progress=None):
+    with open(path, 'r', encoding='utf-8', newline='') as fp:
+        fmt = fmt or detect_format(path, fp)
+        return import_token_rows(iter_token_rows(iter_entries(fp, fmt)), batch_size=batch_size, use_copy=use_copy, progress=progress)
+
+
+def file_fingerprint(path, chunk_size=1 << 20):
+    """Return (sha256 hex digest, byte size) of a file, read in chunks."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(chunk_size), b''):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def _hashed(rows, digest, counter):
+    """Pass rows through while feeding their token codes into digest."""
+    for row in rows:
+        digest.update(row[0].encode('utf-8') + b'\n')
+        counter[0] += 1
+        yield row
+
+
+def sync_token_file(path, fmt=None, force=False, batch_size=DEFAULT_BATCH_SIZE, use_copy=None, progress=None):
+    """Import a token file, skipping work already recorded in its manifest.
+
+    - unchanged content hash: return immediately (mode 'unchanged')
+    - the first row_count token codes still match: import only the tail (mode 'delta')
+    - anything else (or force=True): full import (mode 'full')
+    """
+    source = os.path.abspath(str(path))
+    content_hash, byte_size = file_fingerprint(source)
+    manifest = TokenImportManifest.objects.filter(source=source).first()
+
+    if manifest and not force and manifest.content_hash == content_hash:
+        return {'rows': 0, 'created': 0, 'updated': 0, 'seconds': 0.0, 'mode': 'unchanged', 'skipped_rows': manifest.row_count}
+
+    with open(source, 'r', encoding='utf-8', newline='') as fp:
+        fmt = fmt or detect_format(source, fp)
+        rows = iter_token_rows(iter_entries(fp, fmt))
+        digest = hashlib.sha256()
+        counter = [0]
+        mode = 'full'
+
+        if manifest and not force and manifest.row_count:
+            # hash the previously imported prefix without writing anything
+            for _ in _hashed(rows, digest, counter):
+                if counter[0] >= manifest.row_count:
+                    break
+            if counter[0] == manifest.row_count and digest.hexdigest() == manifest.rows_hash:
+                mode = 'delta'
+
+        if mode == 'delta':
+            skipped = counter[0]
+            stats = import_token_rows(_hashed(rows, digest, counter), batch_size=batch_size, use_copy=use_copy, progress=progress)
+        else:
+            skipped = 0
+
+    if mode == 'full':
+        digest = hashlib.sha256()
+        counter = [0]
+        with open(source, 'r', encoding='utf-8', newline='') as fp:
+            rows = iter_token_rows(iter_entries(fp, fmt))
+            stats = import_token_rows(_hashed(rows, digest, counter), batch_size=batch_size, use_copy=use_copy, progress=progress)
+
+    TokenImportManifest.objects.update_or_create(
+        source=source,
+        defaults={
+            'content_hash': content_hash,
+            'byte_size': byte_size,
+            'row_count': counter[0],
+            'rows_hash': digest.hexdigest(),
+        },
+    )
+    stats['mode'] = mode
+    stats['skipped_rows'] = skipped
+    return stats
@@ -0,0 +1,82 @@
+"""Run-now auto-recharge jobs.
+
+`request_run_now` coalesces requests into one queued/running AutoRechargeJob
+per user (enforced by a partial unique constraint); `run_job` executes it
+under the per-user lock from meters.locks and records progress and the
+summary on the job row, which the jobs endpoint reports.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .locks import autorecharge_user_lock
+from .models import AutoRechargeJob
+
+INFLIGHT = ('queued', 'running')
+# an in-flight job not touched for this long is assumed lost (worker died) and replaced
+STALE_AFTER = timedelta(minutes=15)
+# small chunks so progress updates as the job goes
+JOB_CHUNK_SIZE = 50
+
+
+class LockBusy(Exception):
+    """Another auto-recharge run holds the user's lock."""
+
+
+def request_run_now(user):
+    """Return (job, created): the user's in-flight job, or a new queued one."""
+    now = timezone.now()
+    AutoRechargeJob.objects.filter(user=user, status__in=INFLIGHT, updated_at__lt=now - STALE_AFTER).update(
+        status='failed', error='Abandoned (no progress)', finished_at=now, updated_at=now,
+    )
+    job = AutoRechargeJob.objects.filter(user=user, status__in=INFLIGHT).first()
+    if job:
+        return job, False
+    try:
+        with db_transaction.atomic():
+            return AutoRechargeJob.objects.create(user=user), True
+    except IntegrityError:
+        # a concurrent request created it first
+        return AutoRechargeJob.objects.get(user=user, status__in=INFLIGHT), False
+
+
+def finish_job(job_id, status, error=''):
+    now = timezone.now()
+    AutoRechargeJob.objects.filter(pk=job_id).update(status=status, error=error, finished_at=now, updated_at=now)
+
+
+def run_job(job_id):
+    """Execute a queued job; raises LockBusy if another run for the user is in progress."""
+    from .sweep import eligible_meters, sweep
+
+    job = AutoRechargeJob.objects.filter(pk=job_id, status__in=INFLIGHT).first()
+    if job is None:
+        return None
+    with autorecharge_user_lock(job.user_id) as acquired:
+        if not acquired:
+            raise LockBusy(f'auto-recharge already running for user {job.user_id}')
+        total = eligible_meters(user_ids=[job.user_id], force=True).count()
+        now = timezone.now()
+        AutoRechargeJob.objects.filter(pk=job_id).update(status='running', started_at=now, meters_total=total, updated_at=now)
+
+        def on_chunk(meters, delta):
+            AutoRechargeJob.objects.filter(pk=job_id).update(
+                meters_processed=F('meters_processed') + len(meters),
+                triggered=F('triggered') + delta['triggered'],
+                executed=F('executed') + delta['executed'],
+                failed=F('failed') + delta['failed'],
+                # .update() skips auto_now; keep the job from looking abandoned (STALE_AFTER)
+                updated_at=timezone.now(),
+            )
+
+        try:
+            # forced, like the original run-now: attempt every meter even if disabled/above threshold
+            sweep(user_ids=[job.user_id], force=True, chunk_size=JOB_CHUNK_SIZE, on_chunk=on_chunk, lock_users=False)
+        except Exception as e:
+            finish_job(job_id, 'failed', str(e))
+            raise
+        finish_job(job_id, 'completed')
+    job.refresh_from_db()
+    return job
@@ -0,0 +1,150 @@
+"""Append-only meter balance ledger.
+
+Every balance change is a signed MeterLedger entry written together with an
+atomic `current_balance = current_balance + units` UPDATE, so concurrent
+top-ups never overwrite each other and Meter.current_balance stays an O(1)
+read. `compact_ledger` folds old entries into MeterBalanceSnapshot;
+`audit_balances` / `rebuild_balances` recompute balances from
+snapshot + remaining entries in bulk.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction as db_transaction
+from django.db.models import Case, DecimalField, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Meter, MeterBalanceSnapshot, MeterLedger
+
+PURCHASE = 'purchase'
+MANUAL_RECHARGE = 'manual_recharge'
+AUTO_RECHARGE = 'auto_recharge'
+ADJUSTMENT = 'adjustment'
+CONSUMPTION = 'consumption'
+
+COMPACT_CHUNK_SIZE = 5000
+
+
+def post_entries(entries, top_up=True, updates=None):
+    """Write unsaved MeterLedger entries and apply them to their meters' balances.
+
+    One bulk INSERT plus a single CASE-based UPDATE covering every meter. When
+    top_up is true, meters with a positive net change also get last_top_up set.
+    `updates` adds further {field: expression} assignments to that UPDATE.
+    Meters whose balance drops below their auto-recharge threshold get a
+    recharge queued once the transaction commits (see meters.triggers).
+    """
+    if not entries:
+        return entries
+    totals = defaultdict(Decimal)
+    for entry in entries:
+        totals[entry.meter_id] += Decimal(entry.units)
+    now = timezone.now()
+    balance_field = Meter._meta.get_field('current_balance')
+    fields = {
+        'current_balance': F('current_balance') + Case(
+            *[When(pk=meter_id, then=Value(units)) for meter_id, units in totals.items()],
+            output_field=balance_field,
+        ),
+    }
+    topped_up = [meter_id for meter_id, units in totals.items() if units > 0] if top_up else []
+    if topped_up:
+        fields['last_top_up'] = Case(When(pk__in=topped_up, then=Value(now)), default=F('last_top_up'))
+    fields.update(updates or {})
+    decreases = {meter_id: units for meter_id, units in totals.items() if units < 0}
+    with db_transaction.atomic():
+        MeterLedger.objects.bulk_create(entries)
+        Meter.objects.filter(pk__in=list(totals)).update(**fields)
+        if decreases:
+            from .triggers import queue_threshold_crossings
+            queue_threshold_crossings(decreases)
+    return entries
+
+
+def credit(meter_id, units, entry_type, reference=''):
+    """Add units to a meter (a top-up); returns the ledger entry."""
+    entry = MeterLedger(meter_id=meter_id, entry_type=entry_type, units=units, reference=reference[:128])
+    post_entries([entry])
+    return entry
+
+
+def debit(meter_id, units, entry_type=ADJUSTMENT, reference=''):
+    """Remove units from a meter (e.g. consumption); returns the ledger entry."""
+    entry = MeterLedger(meter_id=meter_id, entry_type=entry_type, units=-Decimal(units), reference=reference[:128])
+    post_entries([entry], top_up=False)
+    return entry
+
+
+def adjust(meter_id, units, reference=''):
+    """Signed correction that doesn't count as a top-up."""
+    entry = MeterLedger(meter_id=meter_id, entry_type=ADJUSTMENT, units=units, reference=reference[:128])
+    post_entries([entry], top_up=False)
+    return entry
+
+
+def _ledger_balance():
+    """Expression for a Meter's balance recomputed from snapshot + remaining entries."""
+    zero = Value(Decimal('0'), output_field=DecimalField(max_digits=10, decimal_places=2))
+    snapshot = MeterBalanceSnapshot.objects.filter(meter_id=OuterRef('pk')).values('balance')[:1]
+    entries = (
+        MeterLedger.objects.filter(meter_id=OuterRef('pk'))
+        .order_by()
+        .values('meter_id')
+        .annotate(total=Sum('units'))
+        .values('total')
+    )
+    return Coalesce(Subquery(snapshot), zero) + Coalesce(Subquery(entries), zero)
+
+
+def audit_balances(meter_ids=None):
+    """Return [(meter_id, stored_balance, ledger_balance)] for meters whose balance disagrees with the ledger."""
+    meters = Meter.objects.all() if meter_ids is None else Meter.objects.filter(pk__in=meter_ids)
+    rows = meters.annotate(ledger_balance=_ledger_balance()).exclude(current_balance=F('ledger_balance'))
+    return list(rows.order_by('pk').values_list('pk', 'current_balance', 'ledger_balance'))
+
+
+def rebuild_balances(meter_ids=None):
+    """Overwrite current_balance from the ledger with a single UPDATE; returns the rows updated."""
+    meters = Meter.objects.all() if meter_ids is None else Meter.objects.filter(pk__in=meter_ids)
+    return meters.update(current_balance=_ledger_balance())
+
+
+def compact_ledger(older_than=timedelta(days=30), chunk_size=COMPACT_CHUNK_SIZE):
+    """Fold entries older than `older_than` into per-meter snapshots and delete them.
+
+    Works in id-ordered chunks; each chunk deletes exactly the entries it
+    summed, in the same transaction, so entries committed concurrently are
+    never lost. Returns the number of entries folded.
+    """
+    cutoff = timezone.now() - older_than
+    folded = 0
+    while True:
+        with db_transaction.atomic():
+            rows = list(
+                MeterLedger.objects.filter(created_at__lt=cutoff)
+                .order_by('pk')
+                .values_list('pk', 'meter_id', 'units')[:chunk_size]
+            )
+            if not rows:
+                return folded
+            totals = defaultdict(Decimal)
+            last_ids = {}
+            for pk, meter_id, units in rows:
+                totals[meter_id] += units
+                last_ids[meter_id] = pk
+
+            snapshots = {s.meter_id: s for s in MeterBalanceSnapshot.objects.select_for_update().filter(meter_id__in=totals)}
+            for meter_id, units in totals.items():
+                snapshot = snapshots.get(meter_id)
+                if snapshot is None:
+                    snapshots[meter_id] = MeterBalanceSnapshot(meter_id=meter_id, balance=units, last_entry_id=last_ids[meter_id])
+                else:
+                    snapshot.balance += units
+                    snapshot.last_entry_id = last_ids[meter_id]
+                    snapshot.updated_at = timezone.now()
+            MeterBalanceSnapshot.objects.bulk_create([s for s in snapshots.values() if s.pk is None])
+            MeterBalanceSnapshot.objects.bulk_update([s for s in snapshots.values() if s.pk is not None], ['balance', 'last_entry_id', 'updated_at'])
+            MeterLedger.objects.filter(pk__in=[pk for pk, _, _ in rows]).delete()
+            folded += len(rows)
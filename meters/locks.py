@@ -0,0 +1,64 @@
+"""Per-user locks for auto-recharge runs.
+
+On PostgreSQL a session-level advisory lock (pg_try_advisory_lock) is used, so
+the lock dies with the connection if the worker crashes. Other databases fall
+back to a cache lock with a timeout, which only excludes other processes when
+CACHES points at a shared backend (see backend/settings.py).
+"""
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import connection
+
+# first half of the two-key advisory lock, namespacing auto-recharge locks
+ADVISORY_NAMESPACE = 0x4152  # 'AR'
+CACHE_LOCK_TIMEOUT = 600
+
+
+def _cache_key(user_id):
+    return f'meters:autorecharge-user-lock:{user_id}'
+
+
+@contextmanager
+def autorecharge_users_lock(user_ids):
+    """Try to take the lock of every user in user_ids without waiting; yields the set of user ids acquired.
+
+    On PostgreSQL the whole set is locked with one statement and released
+    with another, whatever its size.
+    """
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        yield set()
+        return
+
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT id FROM unnest(%s::bigint[]) AS id WHERE pg_try_advisory_lock(%s, id::int)',
+                [user_ids, ADVISORY_NAMESPACE],
+            )
+            acquired = {row[0] for row in cursor.fetchall()}
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'SELECT pg_advisory_unlock(%s, id::int) FROM unnest(%s::bigint[]) AS id',
+                        [ADVISORY_NAMESPACE, sorted(acquired)],
+                    )
+        return
+
+    acquired = {user_id for user_id in user_ids if cache.add(_cache_key(user_id), 1, timeout=CACHE_LOCK_TIMEOUT)}
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete_many([_cache_key(user_id) for user_id in acquired])
+
+
+@contextmanager
+def autorecharge_user_lock(user_id):
+    """Try to take the user's auto-recharge lock without waiting; yields whether it was acquired."""
+    with autorecharge_users_lock([user_id]) as acquired:
+        yield user_id in acquired
@@ -0,0 +1,53 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from meters.benchmarks import OPERATIONS, cleanup, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a benchmark TokenPool/users/meters and measure purchase, recharge, apply and auto-recharge '
+        'latency (p50/p95/p99), throughput and queries per operation. Writes to the configured database: '
+        'point DATABASE_URL at a throwaway SQLite file or local PostgreSQL.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pool-size', type=int, default=10000, help='TokenPool rows to seed (default: 10000)')
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent worker threads per operation')
+        parser.add_argument('--operations', type=int, default=200, help='Calls per operation type')
+        parser.add_argument('--ops', default=','.join(OPERATIONS), help=f'Comma-separated subset of {",".join(OPERATIONS)}')
+        parser.add_argument('--seed', type=int, default=1, help='Seed for the generated pool; same seed, same data')
+        parser.add_argument('--skip-seed', action='store_true', help='Reuse previously seeded data')
+        parser.add_argument('--cleanup', action='store_true', help='Delete all benchmark data afterwards')
+        parser.add_argument('--output', help='Also write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        ops = [op.strip() for op in options['ops'].split(',') if op.strip()]
+        unknown = set(ops) - set(OPERATIONS)
+        if unknown:
+            raise CommandError(f'Unknown operations: {", ".join(sorted(unknown))}')
+        if options['workers'] < 1 or options['operations'] < 1:
+            raise CommandError('--workers and --operations must be positive')
+
+        try:
+            report = run_benchmarks(
+                pool_size=options['pool_size'],
+                users=options['users'],
+                workers=options['workers'],
+                operations=options['operations'],
+                ops=ops,
+                seed_value=options['seed'],
+                skip_seed=options['skip_seed'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        finally:
+            if options['cleanup']:
+                self.stderr.write(f"Removed benchmark data: {cleanup(seed=options['seed'])}")
+
+        output = json.dumps(report, indent=2, default=str)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output)
+        self.stdout.write(output)
@@ -0,0 +1,16 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from meters.ledger import compact_ledger
+
+
+class Command(BaseCommand):
+    help = 'Fold old MeterLedger entries into per-meter balance snapshots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=30, help='Only fold entries older than this many days (default: 30)')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        folded = compact_ledger(older_than=timedelta(days=options['older_than_days']), chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Folded {folded} ledger entries into snapshots'))
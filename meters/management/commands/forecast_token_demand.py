@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from meters.forecasting import HISTORY_DAYS, aggregate_daily_demand, forecast_demand
+
+
+class Command(BaseCommand):
+    help = 'Aggregate daily token demand per denomination and forecast when each TokenPool bucket runs out'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Re-aggregate the whole purchase history instead of only recent days')
+        parser.add_argument('--history-days', type=int, default=HISTORY_DAYS, help='Days of history the model is fitted on')
+
+    def handle(self, *args, **options):
+        rows = aggregate_daily_demand(full=options['full'])
+        self.stdout.write(f'Wrote {rows} daily demand rows')
+        for f in forecast_demand(history_days=max(7, options['history_days'])):
+            depletes = f.depletion_date.isoformat() if f.depletion_date else 'beyond horizon'
+            self.stdout.write(f'  {f.bucket:>20}: {f.available} available, ~{f.projected_next_7_days:g}/week, depletes {depletes}')
+        self.stdout.write(self.style.SUCCESS('Forecast updated'))
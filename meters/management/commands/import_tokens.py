@@ -1,46 +1,45 @@
 from django.core.management.base import BaseCommand
 from django.conf import settings
-import os, json
-from meters.models import TokenPool
+import os
+from meters.importers import DEFAULT_BATCH_SIZE, FORMATS, sync_token_file
 
 class Command(BaseCommand):
-    help = 'Import tokens from Tokens.json into TokenPool'
+    help = 'Import tokens from Tokens.json (or an NDJSON/CSV token file) into TokenPool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', type=str, help='Path to the token file (defaults to Tokens.json in the project root)')
+        parser.add_argument('--format', choices=FORMATS, help='File format; detected from the extension/content when omitted')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows written per batch')
+        parser.add_argument('--no-copy', action='store_true', help='Disable the PostgreSQL COPY fast path')
+        parser.add_argument('--force', action='store_true', help='Re-import the whole file even if its manifest says it is unchanged')
 
     def handle(self, *args, **options):
-        tokens_path = os.path.join(settings.BASE_DIR, 'Tokens.json')
+        tokens_path = options.get('path') or os.path.join(settings.BASE_DIR, 'Tokens.json')
         if not os.path.exists(tokens_path):
-            self.stdout.write(self.style.ERROR(f'Tokens.json not found at {tokens_path}'))
+            self.stdout.write(self.style.ERROR(f'Token file not found at {tokens_path}'))
             return
 
-        with open(tokens_path, 'r', encoding='utf-8') as f:
-            tokens = json.load(f)
+        def progress(stats):
+            rate = stats['rows'] / stats['seconds'] if stats['seconds'] else 0
+            self.stdout.write(f"  {stats['rows']} rows processed ({rate:.0f} rows/sec)")
+
+        stats = sync_token_file(
+            tokens_path,
+            fmt=options.get('format'),
+            force=options['force'],
+            batch_size=max(1, options['batch_size']),
+            use_copy=False if options['no_copy'] else None,
+            progress=progress if options['verbosity'] >= 1 else None,
+        )
 
-        created = 0
-        for t in tokens:
-            code = t.get('token') or t.get('token_code')
-            if not code:
-                continue
-            # Prefer explicit amount (monetary) and units (kWh) keys
-            amount = t.get('amount') if t.get('amount') is not None else t.get('price')
-            units = t.get('units') or t.get('kwh')
-            obj, was_created = TokenPool.objects.get_or_create(token_code=str(code))
-            # Update existing records too with provided metadata
-            changed = False
-            if amount is not None:
-                try:
-                    obj.amount = float(amount)
-                    changed = True
-                except Exception:
-                    pass
-            if units is not None:
-                try:
-                    obj.units = float(units)
-                    changed = True
-                except Exception:
-                    pass
-            if changed:
-                obj.save(update_fields=[f for f in (['amount'] if amount is not None else []) + (['units'] if units is not None else [])])
-            if was_created:
-                created += 1
+        if stats['mode'] == 'unchanged':
+            self.stdout.write(self.style.SUCCESS(f"Token file unchanged since last import ({stats['skipped_rows']} rows); nothing to do"))
+            return
+        if stats['mode'] == 'delta':
+            self.stdout.write(f"Skipped {stats['skipped_rows']} previously imported rows")
 
-        self.stdout.write(self.style.SUCCESS(f'Imported {created} tokens into TokenPool'))
+        rate = stats['rows'] / stats['seconds'] if stats['seconds'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['created']} tokens into TokenPool "
+            f"({stats['updated']} updated, {stats['rows']} rows in {stats['seconds']:.2f}s, {rate:.0f} rows/sec)"
+        ))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+import os
+from meters.readings import DEFAULT_BATCH_SIZE, FORMATS, ingest_file
+
+
+class Command(BaseCommand):
+    help = 'Ingest meter readings (NDJSON or CSV of meter_number, read_at, units) and decrement meter balances'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Readings file')
+        parser.add_argument('--format', choices=FORMATS, help='File format; csv for .csv files, otherwise ndjson')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Readings applied per transaction')
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['path']):
+            raise CommandError(f"Readings file not found at {options['path']}")
+
+        def progress(stats):
+            rate = stats['rows'] / stats['seconds'] if stats['seconds'] else 0
+            self.stdout.write(f"  {stats['rows']} rows processed ({rate:.0f} rows/sec)")
+
+        stats = ingest_file(
+            options['path'],
+            fmt=options.get('format'),
+            batch_size=max(1, options['batch_size']),
+            progress=progress if options['verbosity'] >= 1 else None,
+        )
+        for error in stats['errors']:
+            self.stdout.write(self.style.WARNING(f"  row {error['row']}: {error['error']}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Applied {stats['applied']} readings ({stats['stale']} stale, {stats['rejected']} rejected) "
+            f"from {stats['rows']} rows in {stats['seconds']:.2f}s"
+        ))
@@ -0,0 +1,25 @@
+import json
+from django.core.management.base import BaseCommand
+from meters.planner import plan_autorecharge
+
+
+class Command(BaseCommand):
+    help = 'Dry-run the next auto-recharge sweep: tokens needed per denomination versus TokenPool availability'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help='Only plan for this user id (repeatable)')
+        parser.add_argument('--json', action='store_true', help='Print the plan as JSON')
+
+    def handle(self, *args, **options):
+        result = plan_autorecharge(options['user_ids'])
+        if options['json']:
+            self.stdout.write(json.dumps(result, indent=2))
+            return
+        self.stdout.write(f"{result['due']} of {result['meters']} meters due, {result['units_requested']} units requested")
+        for b in result['buckets']:
+            self.stdout.write(f"  {b['units']:>10} units: {b['meters']} meters, {b['available']} available, {b['shortfall']} short")
+        self.stdout.write(f"Pool tokens: {result['exact']} exact, {result['fallback']} other denomination, {result['synthetic']} synthetic")
+        for warning in result['warnings']:
+            self.stdout.write(self.style.WARNING(warning))
+        if not result['warnings']:
+            self.stdout.write(self.style.SUCCESS('TokenPool covers the next sweep'))
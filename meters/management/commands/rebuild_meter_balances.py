@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from meters.ledger import audit_balances, rebuild_balances
+
+
+class Command(BaseCommand):
+    help = 'Audit Meter.current_balance against the ledger and optionally rewrite it from snapshot + entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--audit', action='store_true', help='Only report meters whose balance disagrees with the ledger')
+
+    def handle(self, *args, **options):
+        mismatches = audit_balances()
+        for meter_id, stored, expected in mismatches:
+            self.stdout.write(f'meter {meter_id}: stored {stored}, ledger {expected}')
+        if options['audit']:
+            self.stdout.write(self.style.SUCCESS(f'{len(mismatches)} meters disagree with the ledger'))
+            return
+        updated = rebuild_balances(meter_ids=[m[0] for m in mismatches])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {updated} meter balances from the ledger'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from meters.counters import pool_availability, rebuild_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-denomination TokenPool availability counters from the pool'
+
+    def handle(self, *args, **options):
+        buckets = rebuild_counters()
+        stats = pool_availability()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {buckets} buckets: {stats['total_available']} available, {stats['total_allocated']} allocated"
+        ))
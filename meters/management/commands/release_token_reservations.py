@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from meters.reservations import release_expired_reservations
+from meters.allocator import release_reservations
+
+
+class Command(BaseCommand):
+    help = 'Return TokenPool rows with expired reservation leases to the pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Release every reservation, including live leases')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            released = release_reservations()
+        else:
+            released = release_expired_reservations()
+        self.stdout.write(self.style.SUCCESS(f'Released {released} reserved tokens'))
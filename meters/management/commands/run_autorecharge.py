@@ -1,20 +1,22 @@
 from django.core.management.base import BaseCommand
-from meters.utils import run_autorecharge_for_user
-from meters.models import AutoRechargeConfig
+from meters.sweep import DEFAULT_CHUNK_SIZE, run_sharded_sweep, sweep
 
 
 class Command(BaseCommand):
     help = 'Run auto-recharge checks and perform mock recharges where configured'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Meters processed per transaction')
+        parser.add_argument('--shards', type=int, default=1, help='Split the sweep into this many Celery shard tasks')
+        parser.add_argument('--run-id', help='Resume a sharded sweep; completed shards are not run again')
+
     def handle(self, *args, **options):
-        configs = AutoRechargeConfig.objects.filter(enabled=True)
-        total_triggered = 0
-        total_executed = 0
-        total_failed = 0
-        for cfg in configs:
-            user = cfg.user
-            result = run_autorecharge_for_user(user, stdout=self.stdout)
-            total_triggered += result.get('triggered', 0)
-            total_executed += result.get('executed', 0)
-            total_failed += result.get('failed', 0)
-        self.stdout.write(f'Done - triggered={total_triggered} executed={total_executed} failed={total_failed}')
+        if options['shards'] > 1 or options['run_id']:
+            run_id, result = run_sharded_sweep(max(options['shards'], 1), run_id=options['run_id'], chunk_size=options['chunk_size'])
+            if not result.ready():
+                self.stdout.write(f'Dispatched sweep {run_id} as {options["shards"]} shards')
+                return
+            result = result.get()
+        else:
+            result = sweep(chunk_size=options['chunk_size'], stdout=self.stdout, respect_window=True)
+        self.stdout.write(f"Done - triggered={result['triggered']} executed={result['executed']} failed={result['failed']}")
@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+
+class Command(BaseCommand):
+    help = (
+        'Run the CELERY_BEAT_SCHEDULE tasks in this process, for deployments without a broker '
+        '(CELERY_TASK_ALWAYS_EAGER) where no celery beat/worker is running'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run every scheduled task once and exit')
+
+    def handle(self, *args, **options):
+        schedule = settings.CELERY_BEAT_SCHEDULE
+        due = {name: 0.0 for name in schedule}
+        while True:
+            now = time.monotonic()
+            for name, entry in schedule.items():
+                if due[name] > now:
+                    continue
+                due[name] = now + float(entry['schedule'])
+                result = import_string(entry['task']).apply(args=entry.get('args', ()), kwargs=entry.get('kwargs', {}))
+                if result.failed():
+                    self.stderr.write(f'{name}: {result.result!r}')
+                elif options['verbosity'] > 1:
+                    self.stdout.write(f'{name}: {result.result}')
+            if options['once']:
+                return
+            time.sleep(max(0.5, min(due.values()) - time.monotonic()))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from meters.allocation_backends import get_allocation_backend
+
+
+class Command(BaseCommand):
+    help = 'Reload the configured allocation backend (e.g. the Redis token lists) from unallocated TokenPool rows'
+
+    def handle(self, *args, **options):
+        backend = get_allocation_backend()
+        loaded = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'{type(backend).__name__}: loaded {loaded} tokens'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from meters.verification import verify_pending_recharges
+
+
+class Command(BaseCommand):
+    help = 'Resolve pending manual recharges against TokenPool/Token in one batch and expire stale ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--timeout', type=int, default=None, help='Seconds before an unresolved recharge is failed (default: settings.MANUAL_RECHARGE_VERIFY_TIMEOUT)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        summary = verify_pending_recharges(timeout_seconds=options['timeout'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            'Checked {checked}: {success} success, {rejected} rejected, {failed} failed, {pending} still pending'.format(**summary)
+        ))
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meters', '0009_autorechargeconfig_autorechargeevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tokenpool',
+            index=models.Index(condition=models.Q(('is_allocated', False)), fields=['amount', 'id'], name='tokenpool_free_amount_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tokenpool',
+            index=models.Index(condition=models.Q(('is_allocated', False)), fields=['units', 'id'], name='tokenpool_free_units_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tokenpool',
+            index=models.Index(condition=models.Q(('is_allocated', False)), fields=['id'], name='tokenpool_free_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meters', '0010_tokenpool_free_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenImportManifest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=500, unique=True)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('byte_size', models.BigIntegerField(default=0)),
+                ('row_count', models.BigIntegerField(default=0)),
+                ('rows_hash', models.CharField(max_length=64)),
+                ('imported_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meters', '0011_tokenimportmanifest'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='tokenpool',
+            name='tokenpool_free_amount_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='tokenpool',
+            name='tokenpool_free_units_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='tokenpool',
+            name='tokenpool_free_idx',
+        ),
+        migrations.AddField(
+            model_name='tokenpool',
+            name='reserved_by',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='tokenpool',
+            name='reserved_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='tokenpool',
+            index=models.Index(condition=models.Q(('is_allocated', False), ('reserved_until__isnull', True)), fields=['amount', 'id'], name='tokenpool_free_amount_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tokenpool',
+            index=models.Index(condition=models.Q(('is_allocated', False), ('reserved_until__isnull', True)), fields=['units', 'id'], name='tokenpool_free_units_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tokenpool',
+            index=models.Index(condition=models.Q(('is_allocated', False), ('reserved_until__isnull', True)), fields=['id'], name='tokenpool_free_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tokenpool',
+            index=models.Index(condition=models.Q(('is_allocated', False), ('reserved_until__isnull', False)), fields=['reserved_until'], name='tokenpool_reserved_idx'),
+        ),
+    ]
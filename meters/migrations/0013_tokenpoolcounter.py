@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:25
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def bucket_key(amount, units):
+    # frozen copy of meters.counters.bucket_key
+    fmt = lambda v: '*' if v is None else str(Decimal(v).quantize(Decimal('0.01')))
+    return f'{fmt(amount)}|{fmt(units)}'
+
+
+def populate_counters(apps, schema_editor):
+    TokenPool = apps.get_model('meters', 'TokenPool')
+    TokenPoolCounter = apps.get_model('meters', 'TokenPoolCounter')
+    rows = (
+        TokenPool.objects.values('amount', 'units')
+        .annotate(available=Count('id', filter=Q(is_allocated=False)), allocated=Count('id', filter=Q(is_allocated=True)))
+        .order_by()
+    )
+    TokenPoolCounter.objects.bulk_create([
+        TokenPoolCounter(bucket=bucket_key(r['amount'], r['units']), slot=0, amount=r['amount'], units=r['units'], available=r['available'], allocated=r['allocated'])
+        for r in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meters', '0012_tokenpool_reservation_lease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenPoolCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.CharField(max_length=64)),
+                ('slot', models.PositiveSmallIntegerField(default=0)),
+                ('amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('units', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('available', models.BigIntegerField(default=0)),
+                ('allocated', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('bucket', 'slot'), name='tokenpoolcounter_bucket_slot_uniq')],
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meters', '0013_tokenpoolcounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='token',
+            name='token_code',
+            field=models.CharField(db_index=True, max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='manualrecharge',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['id'], name='manualrecharge_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def open_snapshots(apps, schema_editor):
+    # existing balances predate the ledger: carry them over as each meter's opening snapshot
+    Meter = apps.get_model('meters', 'Meter')
+    MeterBalanceSnapshot = apps.get_model('meters', 'MeterBalanceSnapshot')
+    MeterBalanceSnapshot.objects.bulk_create(
+        [MeterBalanceSnapshot(meter_id=pk, balance=balance or 0) for pk, balance in Meter.objects.values_list('pk', 'current_balance').iterator()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meters', '0014_manualrecharge_pending_verification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MeterBalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('last_entry_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('meter', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshot', to='meters.meter')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MeterLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_type', models.CharField(choices=[('purchase', 'Purchase'), ('manual_recharge', 'Manual Recharge'), ('auto_recharge', 'Auto Recharge'), ('adjustment', 'Adjustment')], max_length=20)),
+                ('units', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('reference', models.CharField(blank=True, max_length=128)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('meter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='meters.meter')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['meter', 'id'], name='meterledger_meter_idx'), models.Index(fields=['created_at'], name='meterledger_created_idx')],
+            },
+        ),
+        migrations.RunPython(open_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meters', '0015_meter_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AutoRechargeSweepCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_id', models.CharField(max_length=64)),
+                ('shard', models.PositiveIntegerField()),
+                ('shards', models.PositiveIntegerField()),
+                ('last_meter_id', models.BigIntegerField(default=0)),
+                ('triggered', models.PositiveIntegerField(default=0)),
+                ('executed', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed')], default='running', max_length=20)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('run_id', 'shard'), name='autorechargesweep_run_shard_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:42
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def schedule_enabled(apps, schema_editor):
+    # due immediately; the first scheduler tick moves each config to its real window
+    AutoRechargeConfig = apps.get_model('meters', 'AutoRechargeConfig')
+    AutoRechargeConfig.objects.filter(enabled=True).update(next_run_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meters', '0016_autorechargesweepcheckpoint'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='autorechargeconfig',
+            name='next_run_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='autorechargeconfig',
+            index=models.Index(condition=models.Q(('enabled', True)), fields=['next_run_at'], name='autorecharge_next_run_idx'),
+        ),
+        migrations.RunPython(schedule_enabled, migrations.RunPython.noop),
+    ]
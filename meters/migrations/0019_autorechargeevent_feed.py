@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_updated_at(apps, schema_editor):
+    AutoRechargeEvent = apps.get_model('meters', 'AutoRechargeEvent')
+    AutoRechargeEvent.objects.update(updated_at=models.F('triggered_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meters', '0018_autorechargejob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='autorechargeevent',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='autorechargeevent',
+            index=models.Index(fields=['user', '-triggered_at', '-id'], name='autorechargeevent_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='autorechargeevent',
+            index=models.Index(fields=['user', 'updated_at'], name='autorechargeevent_changed_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meters', '0019_autorechargeevent_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meter',
+            name='last_reading_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='meterledger',
+            name='entry_type',
+            field=models.CharField(choices=[('purchase', 'Purchase'), ('manual_recharge', 'Manual Recharge'), ('auto_recharge', 'Auto Recharge'), ('adjustment', 'Adjustment'), ('consumption', 'Consumption')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meters', '0020_meter_readings'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenDemandDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.CharField(max_length=64)),
+                ('day', models.DateField()),
+                ('amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('units', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('purchases', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TokenDemandForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.CharField(max_length=64, unique=True)),
+                ('amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('units', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('available', models.BigIntegerField(default=0)),
+                ('daily_level', models.FloatField(default=0)),
+                ('weekday_profile', models.JSONField(default=list)),
+                ('projected_next_7_days', models.FloatField(default=0)),
+                ('depletion_date', models.DateField(blank=True, null=True)),
+                ('history_days', models.PositiveIntegerField(default=0)),
+                ('computed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='tokenpurchase',
+            index=models.Index(fields=['purchased_at'], name='tokenpurchase_purchased_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tokendemanddaily',
+            index=models.Index(fields=['day'], name='tokendemanddaily_day_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='tokendemanddaily',
+            constraint=models.UniqueConstraint(fields=('bucket', 'day'), name='tokendemanddaily_bucket_day_uniq'),
+        ),
+    ]
@@ -13,15 +13,77 @@ class Meter(models.Model):
     current_balance = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     # timestamp of the last successful top-up (token recharge)
     last_top_up = models.DateTimeField(null=True, blank=True)
+    # read_at of the newest ingested meter reading (see meters.readings)
+    last_reading_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    
+
+    # written with F()/CASE updates by meters.ledger.post_entries (and readings), never from memory
+    LEDGER_FIELDS = ('current_balance', 'last_top_up', 'last_reading_at')
+
+    def save(self, *args, **kwargs):
+        # current_balance is maintained from MeterLedger (see meters.ledger); a balance
+        # given at creation is recorded as an opening adjustment so rebuilds agree
+        creating = self._state.adding
+        guarded = not creating and not args and kwargs.get('update_fields') is None
+        if guarded:
+            # a full save would write back balances loaded before later ledger entries committed
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields if not f.primary_key and f.name not in self.LEDGER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+        if guarded:
+            self.refresh_from_db(fields=self.LEDGER_FIELDS)
+        if creating and self.current_balance:
+            MeterLedger.objects.create(meter=self, entry_type='adjustment', units=self.current_balance, reference='opening balance')
+
     def __str__(self):
         return f"{self.meter_number} - {self.user.email}"
 
+
+class MeterLedger(models.Model):
+    """Append-only signed unit entries; Meter.current_balance is their running total.
+
+    Old entries are folded into MeterBalanceSnapshot by `compact_meter_ledger`,
+    so a meter's balance is always snapshot.balance + SUM(remaining entries).
+    """
+    ENTRY_TYPES = [
+        ('purchase', 'Purchase'),
+        ('manual_recharge', 'Manual Recharge'),
+        ('auto_recharge', 'Auto Recharge'),
+        ('adjustment', 'Adjustment'),
+        ('consumption', 'Consumption'),
+    ]
+
+    meter = models.ForeignKey(Meter, on_delete=models.CASCADE, related_name='ledger_entries')
+    entry_type = models.CharField(max_length=20, choices=ENTRY_TYPES)
+    units = models.DecimalField(max_digits=10, decimal_places=2)
+    reference = models.CharField(max_length=128, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['meter', 'id'], name='meterledger_meter_idx'),
+            models.Index(fields=['created_at'], name='meterledger_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.entry_type} {self.units} on meter {self.meter_id}"
+
+
+class MeterBalanceSnapshot(models.Model):
+    """Balance of every ledger entry folded away by compaction, up to last_entry_id."""
+    meter = models.OneToOneField(Meter, on_delete=models.CASCADE, related_name='balance_snapshot')
+    balance = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    last_entry_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Snapshot {self.balance} for meter {self.meter_id}"
+
 class Token(models.Model):
     meter = models.ForeignKey(Meter, on_delete=models.CASCADE, related_name='tokens')
-    token_code = models.CharField(max_length=20)
+    token_code = models.CharField(max_length=20, db_index=True)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     units = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -43,8 +105,22 @@ class TokenPool(models.Model):
     units = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     # optional monetary amount (price) that this token corresponds to (e.g., 10.00 for $10 tokens)
     amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # lease held by a worker's reservation buffer (meters.reservations); a
+    # reserved token is neither allocated nor claimable until the lease ends
+    reserved_by = models.CharField(max_length=100, null=True, blank=True)
+    reserved_until = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Partial indexes over claimable tokens only, so claim lookups stay
+        # small no matter how many allocated rows accumulate (see meters.allocator).
+        indexes = [
+            models.Index(fields=['amount', 'id'], name='tokenpool_free_amount_idx', condition=models.Q(is_allocated=False, reserved_until__isnull=True)),
+            models.Index(fields=['units', 'id'], name='tokenpool_free_units_idx', condition=models.Q(is_allocated=False, reserved_until__isnull=True)),
+            models.Index(fields=['id'], name='tokenpool_free_idx', condition=models.Q(is_allocated=False, reserved_until__isnull=True)),
+            models.Index(fields=['reserved_until'], name='tokenpool_reserved_idx', condition=models.Q(is_allocated=False, reserved_until__isnull=False)),
+        ]
+
     def __str__(self):
         return self.token_code
 
@@ -58,6 +134,10 @@ class TokenPurchase(models.Model):
     units = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     purchased_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # incremental demand aggregation (meters.forecasting) scans recent purchases
+        indexes = [models.Index(fields=['purchased_at'], name='tokenpurchase_purchased_idx')]
+
     def __str__(self):
         return f"{self.token_code} purchased for {self.meter}"
 
@@ -90,6 +170,12 @@ class ManualRecharge(models.Model):
                 self.masked_token = t
         super().save(*args, **kwargs)
 
+    class Meta:
+        indexes = [
+            # the verification worker only ever scans the (small) pending set
+            models.Index(fields=['id'], name='manualrecharge_pending_idx', condition=models.Q(status='pending')),
+        ]
+
     def __str__(self):
         return f"ManualRecharge {self.masked_token} for {self.meter} ({self.status})"
 
@@ -104,8 +190,40 @@ class AutoRechargeConfig(models.Model):
     time_window_start = models.TimeField(null=True, blank=True)
     time_window_end = models.TimeField(null=True, blank=True)
     apply_to_all = models.BooleanField(default=True)
+    # when the scheduler next considers this user (UTC); see meters.scheduling
+    next_run_at = models.DateTimeField(null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['next_run_at'], name='autorecharge_next_run_idx', condition=models.Q(enabled=True)),
+        ]
+
+    # next_run_at only needs recomputing when one of these changes (or the user's timezone, see User.save)
+    SCHEDULE_FIELDS = ('enabled', 'time_window_start', 'time_window_end')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_schedule = instance._schedule_state()
+        return instance
+
+    def _schedule_state(self):
+        # deferred fields read as None instead of triggering a query
+        return tuple(self.__dict__.get(name) for name in self.SCHEDULE_FIELDS)
+
+    def save(self, *args, **kwargs):
+        from .scheduling import initial_run_at
+        update_fields = kwargs.get('update_fields')
+        touches_schedule = update_fields is None or bool(set(update_fields) & set(self.SCHEDULE_FIELDS))
+        changed = self._state.adding or getattr(self, '_loaded_schedule', None) != self._schedule_state()
+        if touches_schedule and changed:
+            self.next_run_at = initial_run_at(self) if self.enabled else None
+            if update_fields is not None and 'next_run_at' not in update_fields:
+                kwargs['update_fields'] = [*update_fields, 'next_run_at']
+        super().save(*args, **kwargs)
+        self._loaded_schedule = self._schedule_state()
+
     def __str__(self):
         return f"AutoRechargeConfig for {self.user.email} (enabled={self.enabled})"
 
@@ -124,6 +242,161 @@ class AutoRechargeEvent(models.Model):
     message = models.TextField(blank=True)
     amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     executed_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # cursor-paginated feed, newest first
+            models.Index(fields=['user', '-triggered_at', '-id'], name='autorechargeevent_feed_idx'),
+            # since= polls and the feed ETag probe
+            models.Index(fields=['user', 'updated_at'], name='autorechargeevent_changed_idx'),
+        ]
+
+    def __str__(self):
+        return f"AutoRechargeEvent {self.status} for {self.user.email} @ {self.triggered_at.isoformat()}"
+
+
+class AutoRechargeJob(models.Model):
+    """One run-now request; at most one queued/running job exists per user."""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    user = models.ForeignKey('usersAuth.User', on_delete=models.CASCADE, related_name='auto_recharge_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    meters_total = models.PositiveIntegerField(default=0)
+    meters_processed = models.PositiveIntegerField(default=0)
+    triggered = models.PositiveIntegerField(default=0)
+    executed = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user'], name='autorechargejob_one_inflight_per_user',
+                condition=models.Q(status__in=['queued', 'running']),
+            ),
+        ]
+
+    def __str__(self):
+        return f"AutoRechargeJob {self.pk} for user {self.user_id} ({self.status})"
+
+
+class AutoRechargeSweepCheckpoint(models.Model):
+    """Progress of one shard of a sharded auto-recharge sweep (see meters.sweep).
+
+    last_meter_id and the counters are committed together with each processed
+    chunk, so a shard that crashes resumes after the last committed meter.
+    """
+    STATUS_CHOICES = [
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+    ]
+
+    run_id = models.CharField(max_length=64)
+    shard = models.PositiveIntegerField()
+    shards = models.PositiveIntegerField()
+    last_meter_id = models.BigIntegerField(default=0)
+    triggered = models.PositiveIntegerField(default=0)
+    executed = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running')
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['run_id', 'shard'], name='autorechargesweep_run_shard_uniq'),
+        ]
+
+    def summary(self):
+        return {'triggered': self.triggered, 'executed': self.executed, 'failed': self.failed}
+
+    def __str__(self):
+        return f"Sweep {self.run_id} shard {self.shard}/{self.shards} ({self.status})"
+
+class TokenImportManifest(models.Model):
+    """Fingerprint of the last token file imported from a given source path.
+
+    Lets `import_tokens` skip unchanged files on boot and import only the new
+    tail when a file has grown (see meters.importers.sync_token_file).
+    """
+    source = models.CharField(max_length=500, unique=True)
+    content_hash = models.CharField(max_length=64)
+    byte_size = models.BigIntegerField(default=0)
+    row_count = models.BigIntegerField(default=0)
+    # hash over the token codes in file order, used to verify an unchanged prefix
+    rows_hash = models.CharField(max_length=64)
+    imported_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.source} ({self.row_count} rows)"
+
+
+class TokenPoolCounter(models.Model):
+    """Maintained count of available/allocated TokenPool rows per (amount, units) bucket.
+
+    Each bucket is striped over a few slot rows so concurrent allocations
+    don't serialize on a single counter row; readers sum the slots.
+    See meters.counters.
+    """
+    bucket = models.CharField(max_length=64)
+    slot = models.PositiveSmallIntegerField(default=0)
+    amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    units = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    available = models.BigIntegerField(default=0)
+    allocated = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['bucket', 'slot'], name='tokenpoolcounter_bucket_slot_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.bucket}[{self.slot}]: {self.available} available"
+
+
+class TokenDemandDaily(models.Model):
+    """Pool tokens bought per denomination bucket per day, aggregated from TokenPurchase (see meters.forecasting)."""
+    bucket = models.CharField(max_length=64)
+    day = models.DateField()
+    amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    units = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    purchases = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['bucket', 'day'], name='tokendemanddaily_bucket_day_uniq'),
+        ]
+        indexes = [models.Index(fields=['day'], name='tokendemanddaily_day_idx')]
+
+    def __str__(self):
+        return f"{self.bucket} {self.day}: {self.purchases}"
+
+
+class TokenDemandForecast(models.Model):
+    """Latest demand projection and depletion date for one denomination bucket."""
+    bucket = models.CharField(max_length=64, unique=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    units = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    available = models.BigIntegerField(default=0)
+    # smoothed, de-seasonalized purchases per day and the Monday..Sunday multipliers
+    daily_level = models.FloatField(default=0)
+    weekday_profile = models.JSONField(default=list)
+    projected_next_7_days = models.FloatField(default=0)
+    # null when the pool outlasts the forecast horizon
+    depletion_date = models.DateField(null=True, blank=True)
+    history_days = models.PositiveIntegerField(default=0)
+    computed_at = models.DateTimeField()
 
     def __str__(self):
-        return f"AutoRechargeEvent {self.status} for {self.user.email} @ {self.triggered_at.isoformat()}"
\ No newline at end of file
+        return f"{self.bucket}: depletes {self.depletion_date or 'beyond horizon'}"
@@ -0,0 +1,38 @@
+"""Payment provider integration for electricity purchases.
+
+settings.PAYMENT_PROVIDER names the provider class. The bundled
+LocalPaymentProvider is a development stub that confirms every payment;
+a real gateway implements `confirm` the same way.
+"""
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+CONFIRMED = 'confirmed'
+PENDING = 'pending'
+DECLINED = 'declined'
+
+
+class PaymentPending(Exception):
+    """The provider has not settled the payment yet; the confirmation task retries later."""
+
+
+class BasePaymentProvider:
+    def confirm(self, transaction):
+        """Return (status, message) for a pending Transaction; status is CONFIRMED, PENDING or DECLINED."""
+        raise NotImplementedError
+
+
+class LocalPaymentProvider(BasePaymentProvider):
+    """Confirms every payment, optionally after settings.LOCAL_PAYMENT_DELAY seconds."""
+
+    def confirm(self, transaction):
+        delay = getattr(settings, 'LOCAL_PAYMENT_DELAY', 0)
+        if delay:
+            time.sleep(delay)
+        return CONFIRMED, f'Confirmed by local provider ({transaction.payment_method})'
+
+
+def get_payment_provider():
+    return import_string(getattr(settings, 'PAYMENT_PROVIDER', 'meters.payments.LocalPaymentProvider'))()
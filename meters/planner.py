@@ -0,0 +1,106 @@
+"""Dry-run auto-recharge planning.
+
+`plan_autorecharge` loads every auto-recharge meter's balance, effective
+threshold and recharge amount into NumPy arrays (one query), works out which
+meters the next sweep would recharge and how many tokens of each units
+denomination that needs, and matches the demand against the TokenPool
+counters the way the sweep claims tokens: exact denomination first, then any
+remaining token, then a synthetic AUTO- code. Nothing is written.
+"""
+import logging
+from decimal import Decimal
+
+import numpy as np
+
+from .counters import pool_availability
+from .sweep import eligible_meters
+
+logger = logging.getLogger('meters.autorecharge')
+
+
+def _cents(values):
+    """Decimals (or None) to int64 hundredths; None becomes -1."""
+    return np.fromiter((-1 if v is None else int(Decimal(v) * 100) for v in values), dtype=np.int64, count=len(values))
+
+
+def _units(cents):
+    return str((Decimal(int(cents)) / 100).quantize(Decimal('0.01')))
+
+
+def load_fleet(user_ids=None):
+    """Column arrays (balance, threshold, amount in cents; enabled) for every meter of users with a config."""
+    rows = list(
+        eligible_meters(user_ids=user_ids, force=True)
+        .values_list('current_balance', 'threshold', 'recharge_amount', 'user__auto_recharge_config__enabled')
+    )
+    balance, threshold, amount, enabled = zip(*rows) if rows else ((), (), (), ())
+    return {
+        'balance': _cents(balance),
+        'threshold': _cents(threshold),
+        'amount': _cents(amount),
+        'enabled': np.fromiter(enabled, dtype=bool, count=len(enabled)),
+    }
+
+
+def plan(fleet, availability):
+    """Recharge plan for fleet arrays (see load_fleet) against pool_availability() output."""
+    due = fleet['enabled'] & (fleet['balance'] < fleet['threshold'])
+    with_amount = fleet['amount'] > 0
+    demand_units, demand = np.unique(fleet['amount'][due & with_amount], return_counts=True)
+
+    # the sweep leases by units, so fold the amount/units buckets into per-units supply
+    supply = {}
+    for bucket in availability['buckets']:
+        if bucket['units'] is not None and bucket['available'] > 0:
+            key = int(Decimal(bucket['units']) * 100)
+            supply[key] = supply.get(key, 0) + bucket['available']
+    # a sentinel denomination above any real one keeps searchsorted in bounds
+    supply_units = np.array(sorted(supply) + [np.iinfo(np.int64).max], dtype=np.int64)
+    supply_counts = np.array([supply[u] for u in supply_units[:-1]] + [0], dtype=np.int64)
+
+    idx = np.searchsorted(supply_units, demand_units)
+    available = np.where(supply_units[idx] == demand_units, supply_counts[idx], 0)
+    exact = np.minimum(demand, available)
+    shortfall = demand - exact
+
+    leftover = int(availability['total_available']) - int(exact.sum())
+    fallback = min(int(shortfall.sum()), max(leftover, 0))
+    synthetic = int(shortfall.sum()) - fallback
+
+    buckets = [
+        {'units': _units(u), 'meters': int(n), 'available': int(a), 'exact': int(e), 'shortfall': int(s)}
+        for u, n, a, e, s in zip(demand_units, demand, available, exact, shortfall)
+    ]
+    warnings = [
+        f"{b['meters']} meters need {b['units']}-unit tokens but only {b['available']} are available"
+        for b in buckets if b['shortfall']
+    ]
+    if synthetic:
+        warnings.append(f'TokenPool runs dry: {synthetic} recharges would get synthetic AUTO- codes')
+    without_amount = int((due & ~with_amount).sum())
+    if without_amount:
+        warnings.append(f'{without_amount} due meters have no recharge amount configured and will fail')
+    return {
+        'meters': int(len(due)),
+        'due': int(due.sum()),
+        'without_amount': without_amount,
+        'units_requested': _units(fleet['amount'][due & with_amount].sum()),
+        'exact': int(exact.sum()),
+        'fallback': fallback,
+        'synthetic': synthetic,
+        'buckets': buckets,
+        'warnings': warnings,
+    }
+
+
+def plan_autorecharge(user_ids=None):
+    """Plan the next sweep for the whole fleet (or the given users) without recharging anything."""
+    return plan(load_fleet(user_ids), pool_availability())
+
+
+def warn_on_shortfall(user_ids=None):
+    """Log the plan's warnings ahead of a sweep; returns the plan."""
+    result = plan_autorecharge(user_ids)
+    for warning in result['warnings']:
+        logger.warning('Auto-recharge plan: %s', warning)
+    return result
@@ -0,0 +1,108 @@
+"""Confirmation and token allocation for electricity purchases.
+
+`purchase_electricity` only records a pending Transaction; the
+`confirm_purchase_task` Celery task calls complete_purchase, which is
+idempotent on transaction_id so redelivered or retried tasks never allocate
+a second token.
+"""
+import logging
+from decimal import Decimal
+
+from django.db import transaction as db_transaction
+
+from transactions import rollups
+from transactions.models import Transaction
+
+from . import ledger
+from .allocator import claim_token
+from .models import Token, TokenPurchase
+from .payments import CONFIRMED, DECLINED, PaymentPending, get_payment_provider
+from .reservations import take_reserved_token
+
+logger = logging.getLogger('meters.purchases')
+
+# kWh credited per currency unit when the pool token carries no units
+UNITS_PER_CURRENCY_UNIT = Decimal('4.2')
+
+
+def estimate_units(amount):
+    return (amount * UNITS_PER_CURRENCY_UNIT).quantize(Decimal('0.01'))
+
+
+def fail_purchase(transaction_id, description):
+    return Transaction.objects.filter(transaction_id=transaction_id, status='pending').update(status='failed', description=description)
+
+
+def _claim_for(txn):
+    # serve from this worker's pre-claimed reservations when possible; otherwise claim a
+    # pool token matching the purchase amount, falling back to any unallocated token
+    pool_token = take_reserved_token(amount=txn.amount, user_id=txn.user_id, transaction_id=txn.transaction_id)
+    if not pool_token:
+        pool_token = claim_token(amount=txn.amount, allow_any=True, user_id=txn.user_id, transaction_id=txn.transaction_id)
+    return pool_token
+
+
+def complete_purchase(transaction_id):
+    """Confirm payment for a pending purchase and allocate its token.
+
+    Returns {'status': ..., 'token_code': ...}. Raises PaymentPending when the
+    provider hasn't settled yet so the caller can retry.
+    """
+    txn = Transaction.objects.filter(transaction_id=transaction_id).first()
+    if txn is None:
+        return {'status': 'missing'}
+    if txn.status != 'pending':
+        return {'status': txn.status, 'token_code': txn.token_code}
+
+    status, message = get_payment_provider().confirm(txn)
+    if status == DECLINED:
+        fail_purchase(transaction_id, f'Payment declined: {message}')
+        return {'status': 'failed'}
+    if status != CONFIRMED:
+        raise PaymentPending(message)
+
+    # the claim commits or rolls back together with the completed transaction, so a
+    # crash mid-way leaves nothing allocated and a retry starts from scratch
+    with db_transaction.atomic():
+        # serialize concurrent deliveries of the same task on the transaction row
+        txn = Transaction.objects.select_for_update().get(pk=txn.pk)
+        if txn.status != 'pending':
+            return {'status': txn.status, 'token_code': txn.token_code}
+
+        pool_token = _claim_for(txn)
+        if not pool_token:
+            txn.status = 'failed'
+            txn.description = 'No tokens available'
+            txn.save(update_fields=['status', 'description', 'updated_at'])
+            return {'status': 'failed'}
+
+        allocated = pool_token.token_code
+        # prefer units from pool metadata; otherwise estimate from amount
+        units = pool_token.units if pool_token.units is not None else estimate_units(txn.amount)
+        amount = pool_token.amount or txn.amount
+
+        if txn.meter_id:
+            Token.objects.create(meter_id=txn.meter_id, token_code=allocated, amount=amount, units=units)
+            ledger.credit(txn.meter_id, units, ledger.PURCHASE, reference=txn.transaction_id)
+        TokenPurchase.objects.create(token_code=allocated, meter_id=txn.meter_id, user_id=txn.user_id, amount=amount, units=units)
+
+        txn.status = 'completed'
+        txn.description = f'Allocated token {allocated}'
+        txn.units = units
+        txn.token_code = allocated
+        txn.save(update_fields=['status', 'description', 'units', 'token_code', 'updated_at'])
+        rollups.record(txn)
+
+    # Create notification for successful token purchase (best effort)
+    try:
+        from notifications.models import Notification
+        Notification.objects.create(
+            user_id=txn.user_id,
+            notification_type='purchase',
+            title='Token Purchase Successful',
+            message=f'You have successfully purchased {units} kWh for ${txn.amount}. Token: {allocated[:4]}...{allocated[-4:]}'
+        )
+    except Exception:
+        logger.exception('Failed to create purchase notification')
+
+    return {'status': 'completed', 'token_code': allocated}
@@ -0,0 +1,157 @@
+"""Batched meter reading ingestion.
+
+Smart-meter feeds deliver readings as NDJSON or CSV rows of
+{meter_number, read_at, units}, units being the kWh consumed since the
+meter's previous reading. Rows are validated a batch at a time (one locked
+meter lookup per batch, duplicates and stale readings found with set
+lookups), summed per meter and posted as one `consumption` ledger entry per
+meter, so the balance decrements and last_reading_at for a whole batch are a
+single UPDATE (see meters.ledger.post_entries). Meters that drop below their
+threshold get an auto-recharge queued by the ledger.
+
+Readings at or before a meter's last_reading_at are skipped as stale, so
+re-sending a batch doesn't consume the units twice.
+"""
+import csv
+import json
+import time
+from collections import defaultdict
+from datetime import timedelta, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction as db_transaction
+from django.db.models import Case, DateTimeField, F, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import ledger
+from .importers import _batched
+from .models import Meter, MeterLedger
+
+DEFAULT_BATCH_SIZE = 5000
+FORMATS = ('ndjson', 'csv')
+# rejected rows listed in the result; the rest are only counted
+MAX_ERRORS = 100
+# tolerated meter clock drift
+FUTURE_SKEW = timedelta(minutes=5)
+MAX_UNITS = Decimal('99999999.99')
+
+
+def iter_rows(lines, fmt):
+    """Raw reading rows from an iterable of text lines; unparseable NDJSON lines yield None."""
+    if fmt == 'csv':
+        yield from csv.DictReader(lines)
+        return
+    if fmt != 'ndjson':
+        raise ValueError(f'Unsupported reading format: {fmt}')
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+def parse_reading(raw, now):
+    """Return (meter_number, read_at, units) or raise ValueError describing the problem."""
+    if not isinstance(raw, dict):
+        raise ValueError('not a JSON object')
+    number = str(raw.get('meter_number') or '').strip()
+    if not number:
+        raise ValueError('meter_number is required')
+    read_at = parse_datetime(str(raw.get('read_at') or ''))
+    if read_at is None:
+        raise ValueError('read_at must be an ISO 8601 datetime')
+    if timezone.is_naive(read_at):
+        read_at = timezone.make_aware(read_at, dt_timezone.utc)
+    if read_at > now + FUTURE_SKEW:
+        raise ValueError('read_at is in the future')
+    try:
+        units = Decimal(str(raw.get('units'))).quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError):
+        raise ValueError('units must be a number')
+    if units < 0 or units > MAX_UNITS:
+        raise ValueError('units out of range')
+    return number, read_at, units
+
+
+def _reject(stats, row, error):
+    stats['rejected'] += 1
+    if len(stats['errors']) < MAX_ERRORS:
+        stats['errors'].append({'row': row, 'error': error})
+
+
+def _ingest_batch(batch, stats):
+    now = timezone.now()
+    parsed = []
+    for row, raw in batch:
+        try:
+            parsed.append((row, *parse_reading(raw, now)))
+        except ValueError as e:
+            _reject(stats, row, str(e))
+
+    with db_transaction.atomic():
+        meters = {
+            number: (pk, last)
+            for pk, number, last in Meter.objects.select_for_update()
+            .filter(meter_number__in={p[1] for p in parsed})
+            .order_by('pk')
+            .values_list('pk', 'meter_number', 'last_reading_at')
+        }
+        seen = set()
+        consumed, counts, latest = defaultdict(Decimal), defaultdict(int), {}
+        for row, number, read_at, units in parsed:
+            if number not in meters:
+                _reject(stats, row, f'unknown meter {number}')
+                continue
+            pk, last = meters[number]
+            if (pk, read_at) in seen:
+                _reject(stats, row, 'duplicate reading')
+                continue
+            seen.add((pk, read_at))
+            if last is not None and read_at <= last:
+                stats['stale'] += 1
+                continue
+            consumed[pk] += units
+            counts[pk] += 1
+            latest[pk] = max(read_at, latest.get(pk, read_at))
+
+        entries = [
+            MeterLedger(meter_id=pk, entry_type=ledger.CONSUMPTION, units=-units, reference=f'{counts[pk]} readings to {latest[pk].isoformat()}')
+            for pk, units in consumed.items()
+        ]
+        ledger.post_entries(entries, top_up=False, updates={
+            'last_reading_at': Case(
+                *[When(pk=pk, then=Value(read_at)) for pk, read_at in latest.items()],
+                default=F('last_reading_at'), output_field=DateTimeField(),
+            ),
+        })
+    stats['applied'] += sum(counts.values())
+    stats['meters'] += len(entries)
+
+
+def ingest_readings(rows, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """Apply raw reading rows in batches; each batch commits on its own.
+
+    Returns {'rows', 'applied', 'stale', 'rejected', 'meters', 'errors', 'seconds'}
+    where meters counts per-batch meter updates and errors lists the first
+    MAX_ERRORS rejected rows (1-based row numbers).
+    """
+    stats = {'rows': 0, 'applied': 0, 'stale': 0, 'rejected': 0, 'meters': 0, 'errors': [], 'seconds': 0.0}
+    started = time.monotonic()
+    for batch in _batched(enumerate(rows, 1), batch_size):
+        _ingest_batch(batch, stats)
+        stats['rows'] += len(batch)
+        stats['seconds'] = time.monotonic() - started
+        if progress:
+            progress(stats)
+    stats['seconds'] = time.monotonic() - started
+    return stats
+
+
+def ingest_file(path, fmt=None, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    fmt = fmt or ('csv' if str(path).lower().endswith('.csv') else 'ndjson')
+    with open(path, 'r', encoding='utf-8', newline='') as fp:
+        return ingest_readings(iter_rows(fp, fmt), batch_size=batch_size, progress=progress)
@@ -0,0 +1,135 @@
+"""Per-worker buffer of pre-claimed TokenPool rows.
+
+Each process leases a small batch of tokens per denomination (one UPDATE for
+the whole batch) and hands them out from an in-memory queue, so the common
+purchase only needs an uncontended primary-key UPDATE instead of competing
+with every other worker for the first unallocated row. Leases expire; the
+`release_token_reservations` command / Celery task returns expired leases
+to the pool if a worker dies holding them.
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .allocation_backends import get_allocation_backend
+from .allocator import allocate_reserved, release_reservations, reserve_tokens
+
+# Don't hand out a token whose lease ends within this many seconds.
+LEASE_SAFETY_MARGIN = 5
+# After a refill finds nothing, skip refills for that denomination this long.
+EMPTY_BACKOFF_SECONDS = 5
+
+
+class TokenReservationBuffer:
+    def __init__(self, batch_size=10, lease_seconds=300, worker_id=None):
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self._queues = defaultdict(deque)
+        self._empty_until = {}
+        self._lock = threading.Lock()
+
+    def _pop(self, key):
+        with self._lock:
+            queue = self._queues[key]
+            cutoff = timezone.now() + timedelta(seconds=LEASE_SAFETY_MARGIN)
+            while queue:
+                entry = queue.popleft()
+                if entry[-1] > cutoff:
+                    return entry
+                # nearly expired: leave it for the reaper
+        return None
+
+    def _refill(self, key):
+        if self._empty_until.get(key, 0) > time.monotonic():
+            return False
+        amount, units = key
+        reserved_until = timezone.now() + timedelta(seconds=self.lease_seconds)
+        rows = reserve_tokens(self.batch_size, self.worker_id, reserved_until, amount=amount, units=units)
+        if not rows:
+            self._empty_until[key] = time.monotonic() + EMPTY_BACKOFF_SECONDS
+            return False
+        with self._lock:
+            self._queues[key].extend((*row, reserved_until) for row in rows)
+        return True
+
+    def take(self, amount=None, units=None, user_id=None, transaction_id=None):
+        """Allocate a buffered token of the denomination, refilling once if the queue is empty.
+
+        Returns an in-memory TokenPool instance like allocator.claim_token, or
+        None so the caller can fall back to a direct claim.
+        """
+        from .models import TokenPool
+
+        key = (amount, units)
+        for _ in range(2):
+            entry = self._pop(key)
+            while entry is not None:
+                pk, code, units_val, amount_val, _lease = entry
+                allocated_at = allocate_reserved(
+                    pk, self.worker_id, user_id=user_id, transaction_id=transaction_id, amount=amount_val, units=units_val,
+                )
+                if allocated_at:
+                    return TokenPool(
+                        pk=pk,
+                        token_code=code,
+                        units=units_val,
+                        amount=amount_val,
+                        is_allocated=True,
+                        allocated_at=allocated_at,
+                        allocated_to_id=user_id,
+                        allocated_transaction_id=transaction_id,
+                    )
+                entry = self._pop(key)
+            if not self._refill(key):
+                return None
+        return None
+
+    def release(self):
+        """Drop the local queues and return this worker's leases to the pool."""
+        with self._lock:
+            self._queues.clear()
+        return release_reservations(worker_id=self.worker_id)
+
+
+_buffer = None
+_buffer_pid = None
+_buffer_lock = threading.Lock()
+
+
+def get_reservation_buffer():
+    """Return this process's buffer, or None when TOKEN_RESERVATION_BATCH_SIZE is 0
+    or the allocation backend doesn't claim from TokenPool rows directly.
+
+    The buffer is keyed on the pid so forked gunicorn workers never share leases.
+    """
+    global _buffer, _buffer_pid
+    batch_size = getattr(settings, 'TOKEN_RESERVATION_BATCH_SIZE', 10)
+    if not batch_size or not get_allocation_backend().supports_reservations:
+        return None
+    with _buffer_lock:
+        if _buffer is None or _buffer_pid != os.getpid():
+            _buffer = TokenReservationBuffer(
+                batch_size=batch_size,
+                lease_seconds=getattr(settings, 'TOKEN_RESERVATION_LEASE_SECONDS', 300),
+            )
+            _buffer_pid = os.getpid()
+        return _buffer
+
+
+def take_reserved_token(amount=None, units=None, user_id=None, transaction_id=None):
+    buffer = get_reservation_buffer()
+    if buffer is None:
+        return None
+    return buffer.take(amount=amount, units=units, user_id=user_id, transaction_id=transaction_id)
+
+
+def release_expired_reservations(now=None):
+    return release_reservations(expired_before=now or timezone.now())
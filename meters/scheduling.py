@@ -0,0 +1,153 @@
+"""Time-window and timezone aware auto-recharge scheduling.
+
+Each enabled AutoRechargeConfig carries next_run_at, the next UTC instant the
+scheduler should consider the user: inside their daily time window
+(time_window_start/end, interpreted in User.timezone), otherwise every
+AUTORECHARGE_SCHEDULE_INTERVAL_SECONDS. Every tick loads only the configs that
+are due through the partial index on next_run_at, sweeps those users and
+pushes next_run_at forward, so work is spread across the day instead of one
+burst sweep over the whole fleet.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+DEFAULT_BATCH_SIZE = 1000
+TICK_LOCK_KEY = 'meters:autorecharge-scheduler-tick'
+
+
+def _interval():
+    return timedelta(seconds=getattr(settings, 'AUTORECHARGE_SCHEDULE_INTERVAL_SECONDS', 3600))
+
+
+def user_zone(name):
+    try:
+        return ZoneInfo(name or 'UTC')
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo('UTC')
+
+
+def in_window(local_time, start, end):
+    """Whether a local wall-clock time falls in [start, end); windows may wrap past midnight."""
+    if start is None or end is None or start == end:
+        return True
+    if start < end:
+        return start <= local_time < end
+    return local_time >= start or local_time < end
+
+
+def next_window_open(start, end, zone, after):
+    """Earliest UTC instant at or after `after` when the daily window is open."""
+    local = after.astimezone(zone)
+    if in_window(local.time(), start, end):
+        return after
+    opening = datetime.combine(local.date(), start, tzinfo=zone)
+    if opening <= local:
+        opening += timedelta(days=1)
+    return opening.astimezone(dt_timezone.utc)
+
+
+def is_window_open(cfg, zone, now=None):
+    now = now or timezone.now()
+    return in_window(now.astimezone(zone).time(), cfg.time_window_start, cfg.time_window_end)
+
+
+def next_run_after(cfg, zone, now):
+    """Next check one interval from now, moved to the next window opening if that falls outside it."""
+    return next_window_open(cfg.time_window_start, cfg.time_window_end, zone, now + _interval())
+
+
+def initial_run_at(cfg, now=None):
+    """First run for a newly enabled/edited config.
+
+    Configs without a window are staggered over one interval by user id so a
+    fleet enabled at once doesn't come due in the same tick.
+    """
+    now = now or timezone.now()
+    if cfg.time_window_start is None or cfg.time_window_end is None:
+        return now + timedelta(seconds=cfg.user_id % max(int(_interval().total_seconds()), 1))
+    return next_window_open(cfg.time_window_start, cfg.time_window_end, user_zone(cfg.user.timezone), now)
+
+
+def reschedule_user(user, now=None):
+    """Recompute next_run_at for a user's enabled config, e.g. after a timezone change."""
+    from .models import AutoRechargeConfig
+
+    cfg = AutoRechargeConfig.objects.filter(user=user, enabled=True).first()
+    if cfg is None:
+        return
+    cfg.user = user
+    AutoRechargeConfig.objects.filter(pk=cfg.pk).update(next_run_at=initial_run_at(cfg, now))
+
+
+def open_window_users(user_ids, now=None):
+    """The subset of user_ids currently inside their auto-recharge window (users without one included)."""
+    from .models import AutoRechargeConfig
+
+    configs = (
+        AutoRechargeConfig.objects.filter(user_id__in=user_ids)
+        .select_related('user')
+        .only('user_id', 'time_window_start', 'time_window_end', 'user__timezone')
+    )
+    closed = {cfg.user_id for cfg in configs if not is_window_open(cfg, user_zone(cfg.user.timezone), now)}
+    return set(user_ids) - closed
+
+
+def meter_window_open(meter_id, now=None):
+    """Whether the owner of meter_id is currently inside their auto-recharge window."""
+    from .models import AutoRechargeConfig
+
+    cfg = (
+        AutoRechargeConfig.objects.select_related('user')
+        .only('time_window_start', 'time_window_end', 'user__timezone')
+        .filter(user__meters=meter_id)
+        .first()
+    )
+    return cfg is None or is_window_open(cfg, user_zone(cfg.user.timezone), now)
+
+
+def run_due(now=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Sweep every user whose next_run_at has passed and reschedule them.
+
+    Returns the sweep summary plus 'scheduled' (configs rescheduled) and
+    'outside_window' (due configs whose window turned out closed, e.g. after a
+    timezone change; they are moved to their next opening without running).
+    """
+    from .models import AutoRechargeConfig
+    from .sweep import sweep
+
+    now = now or timezone.now()
+    summary = {'triggered': 0, 'executed': 0, 'failed': 0, 'scheduled': 0, 'outside_window': 0}
+    # one tick at a time across processes (needs the shared cache, see CACHES in settings); a lost lock just expires
+    if not cache.add(TICK_LOCK_KEY, 1, timeout=300):
+        return summary
+    try:
+        while True:
+            due = list(
+                AutoRechargeConfig.objects.filter(enabled=True, next_run_at__lte=now)
+                .select_related('user')
+                .only('user_id', 'time_window_start', 'time_window_end', 'next_run_at', 'user__timezone')
+                .order_by('next_run_at')[:batch_size]
+            )
+            if not due:
+                break
+            user_ids = []
+            for cfg in due:
+                zone = user_zone(cfg.user.timezone)
+                if is_window_open(cfg, zone, now):
+                    user_ids.append(cfg.user_id)
+                    cfg.next_run_at = next_run_after(cfg, zone, now)
+                else:
+                    summary['outside_window'] += 1
+                    cfg.next_run_at = next_window_open(cfg.time_window_start, cfg.time_window_end, zone, now)
+            if user_ids:
+                for key, n in sweep(user_ids=user_ids).items():
+                    summary[key] += n
+            AutoRechargeConfig.objects.bulk_update(due, ['next_run_at'])
+            summary['scheduled'] += len(due)
+    finally:
+        cache.delete(TICK_LOCK_KEY)
+    return summary
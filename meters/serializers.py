@@ -1,14 +1,17 @@
 from rest_framework import serializers
 from .models import Meter, Token
 from .models import ManualRecharge
-from .models import AutoRechargeConfig, AutoRechargeEvent
+from .models import AutoRechargeConfig, AutoRechargeEvent, AutoRechargeJob
+from .models import TokenDemandForecast
 from datetime import time
+from .bulk import MAX_BULK_METERS
 
 class MeterSerializer(serializers.ModelSerializer):
     class Meta:
         model = Meter
         fields = '__all__'
-        read_only_fields = ['user', 'created_at', 'updated_at']
+        # balance changes go through meters.ledger
+        read_only_fields = ['user', 'current_balance', 'last_top_up', 'last_reading_at', 'created_at', 'updated_at']
 
 class TokenSerializer(serializers.ModelSerializer):
     class Meta:
@@ -31,13 +34,20 @@ class ManualRechargeSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'applied_at', 'masked_token']
 
 
+class AutoRechargeJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AutoRechargeJob
+        fields = ['id', 'status', 'meters_total', 'meters_processed', 'triggered', 'executed', 'failed', 'error', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
+
+
 class AutoRechargeConfigSerializer(serializers.ModelSerializer):
     time_window = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = AutoRechargeConfig
-        fields = ['enabled', 'default_threshold', 'default_amount', 'default_payment_method', 'time_window_start', 'time_window_end', 'time_window', 'apply_to_all', 'updated_at']
-        read_only_fields = ['updated_at']
+        fields = ['enabled', 'default_threshold', 'default_amount', 'default_payment_method', 'time_window_start', 'time_window_end', 'time_window', 'apply_to_all', 'next_run_at', 'updated_at']
+        read_only_fields = ['next_run_at', 'updated_at']
 
     def get_time_window(self, obj):
         if obj.time_window_start and obj.time_window_end:
@@ -53,5 +63,41 @@ class AutoRechargeEventSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = AutoRechargeEvent
-        fields = ['id', 'meter', 'meter_number', 'triggered_at', 'status', 'message', 'amount', 'executed_at']
-        read_only_fields = ['id', 'triggered_at', 'executed_at']
\ No newline at end of file
+        fields = ['id', 'meter', 'meter_number', 'triggered_at', 'status', 'message', 'amount', 'executed_at', 'updated_at']
+        read_only_fields = ['id', 'triggered_at', 'executed_at']
+
+
+class MeterConfigSerializer(serializers.Serializer):
+    """Auto-recharge settings and nickname for one or many meters (see meters.bulk)."""
+    nickname = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    auto_recharge_enabled = serializers.BooleanField(required=False)
+    auto_recharge_threshold = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False, allow_null=True)
+    auto_recharge_amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False, allow_null=True)
+
+
+class MeterConfigItemSerializer(MeterConfigSerializer):
+    id = serializers.IntegerField()
+
+
+class MeterFilterSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+    meter_number_prefix = serializers.CharField(required=False)
+    auto_recharge_enabled = serializers.BooleanField(required=False, allow_null=True, default=None)
+
+
+class MeterBulkConfigSerializer(serializers.Serializer):
+    set = MeterConfigSerializer(required=False)
+    filter = MeterFilterSerializer(required=False)
+    # items are validated one by one so a bad entry doesn't reject the whole request
+    meters = serializers.ListField(child=serializers.DictField(), required=False, max_length=MAX_BULK_METERS)
+
+    def validate(self, attrs):
+        if not attrs.get('set') and not attrs.get('meters'):
+            raise serializers.ValidationError('Provide "set" and/or "meters"')
+        return attrs
+
+
+class TokenDemandForecastSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TokenDemandForecast
+        fields = ['bucket', 'amount', 'units', 'available', 'daily_level', 'weekday_profile', 'projected_next_7_days', 'depletion_date', 'history_days', 'computed_at']
@@ -0,0 +1,275 @@
+"""Set-based auto-recharge sweep.
+
+One annotated query selects every meter whose balance is below its effective
+threshold (the user's AutoRechargeConfig.default_threshold, else the meter's
+own auto_recharge_threshold). Meters are then processed in pk-ordered chunks:
+tokens for the whole chunk are leased and allocated with a couple of
+statements, and the AutoRechargeEvent, Token, TokenPurchase, ledger and
+Notification rows are written with one bulk INSERT each.
+
+For large fleets `run_sharded_sweep` splits the meters by user_id modulo N
+into shards that run as a Celery chord; each shard checkpoints its progress in
+AutoRechargeSweepCheckpoint inside every chunk transaction.
+"""
+import logging
+import os
+import socket
+import uuid
+from collections import defaultdict
+from contextlib import ExitStack
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction as db_transaction
+from django.db.models import DecimalField, F, Value
+from django.db.models.functions import Coalesce, Mod
+from django.utils import timezone
+
+from . import ledger
+from .allocation_backends import get_allocation_backend
+from .allocator import allocate_reserved_many, release_reservations, reserve_tokens
+from .locks import autorecharge_users_lock
+from .models import AutoRechargeEvent, AutoRechargeSweepCheckpoint, Meter, MeterLedger, Token, TokenPurchase
+from .scheduling import open_window_users
+
+logger = logging.getLogger('meters.autorecharge')
+
+DEFAULT_CHUNK_SIZE = 1000
+# Leases taken by the sweep only need to outlive one chunk.
+SWEEP_LEASE_SECONDS = 120
+
+
+def eligible_meters(user_ids=None, force=False, shard=None, shards=1, meter_ids=None):
+    """Meters to recharge, annotated with `threshold` and `recharge_amount`, ordered by pk.
+
+    Only users with an AutoRechargeConfig are considered. Unless force is set the
+    config must be enabled and current_balance must be below the threshold.
+    With shard given, only users with user_id % shards == shard are included.
+    """
+    zero = Value(Decimal('0'), output_field=DecimalField(max_digits=10, decimal_places=2))
+    qs = Meter.objects.filter(user__auto_recharge_config__isnull=False)
+    if user_ids is not None:
+        qs = qs.filter(user_id__in=user_ids)
+    if meter_ids is not None:
+        qs = qs.filter(pk__in=meter_ids)
+    if shard is not None and shards > 1:
+        qs = qs.alias(user_shard=Mod('user_id', shards)).filter(user_shard=shard)
+    qs = qs.annotate(
+        threshold=Coalesce('user__auto_recharge_config__default_threshold', 'auto_recharge_threshold', zero),
+        recharge_amount=Coalesce('user__auto_recharge_config__default_amount', 'auto_recharge_amount'),
+    )
+    if not force:
+        qs = qs.filter(user__auto_recharge_config__enabled=True, current_balance__lt=F('threshold'))
+    return qs.order_by('pk')
+
+
+def _claim_chunk(requests, worker_id):
+    """Claim pool tokens for [(key, units, user_id, transaction_id)]; returns {key: (code, amount, units)}.
+
+    With a backend that allocates straight from TokenPool, tokens are leased per
+    requested denomination (then any denomination for the shortfall) and
+    allocated in one batch; other backends are asked once per request.
+    """
+    backend = get_allocation_backend()
+    claimed = {}
+    if not backend.supports_reservations:
+        for key, units, user_id, transaction_id in requests:
+            token = backend.claim(units=units, allow_any=True, user_id=user_id, transaction_id=transaction_id)
+            if token:
+                claimed[key] = (token.token_code, token.amount, token.units)
+        return claimed
+
+    lease = timezone.now() + timedelta(seconds=SWEEP_LEASE_SECONDS)
+    by_units = defaultdict(list)
+    for request in requests:
+        by_units[request[1]].append(request)
+    leased, waiting = [], []
+    for units, group in by_units.items():
+        rows = reserve_tokens(len(group), worker_id, lease, units=units)
+        leased.extend(zip(group, rows))
+        waiting.extend(group[len(rows):])
+    if waiting:
+        leased.extend(zip(waiting, reserve_tokens(len(waiting), worker_id, lease)))
+
+    assignments = {row[0]: (request[2], request[3]) for request, row in leased}
+    allocated = allocate_reserved_many(assignments, worker_id)
+    for request, (pk, code, units, amount) in leased:
+        if pk in allocated:
+            claimed[request[0]] = (code, amount, units)
+    return claimed
+
+
+def _advance(checkpoint, meters, delta, on_chunk=None):
+    """Record a processed chunk on the shard checkpoint / progress callback; runs inside the chunk transaction."""
+    if on_chunk is not None:
+        on_chunk(meters, delta)
+    if checkpoint is None:
+        return
+    AutoRechargeSweepCheckpoint.objects.filter(pk=checkpoint.pk).update(
+        last_meter_id=meters[-1].pk,
+        triggered=F('triggered') + delta['triggered'],
+        executed=F('executed') + delta['executed'],
+        failed=F('failed') + delta['failed'],
+        updated_at=timezone.now(),
+    )
+
+
+def _process_chunk(meters, worker_id, summary, stdout=None, checkpoint=None, on_chunk=None):
+    try:
+        from notifications.models import Notification
+    except Exception:
+        Notification = None
+
+    now = timezone.now()
+    stamp = int(now.timestamp())
+    events, notifications, tokens, purchases, entries = [], [], [], [], []
+    delta = {'triggered': len(meters), 'executed': 0, 'failed': 0}
+
+    requests = [
+        (m.pk, Decimal(str(m.recharge_amount)), m.user_id, f'auto-{m.user_id}-{m.pk}-{stamp}')
+        for m in meters if m.recharge_amount and m.recharge_amount > 0
+    ]
+    with db_transaction.atomic():
+        claimed = _claim_chunk(requests, worker_id)
+        for m in meters:
+            label = m.meter_number or m.pk
+            notifications.append(('system', m.user_id, 'Auto recharge triggered', f'Auto recharge triggered for meter {label}. Amount: {m.recharge_amount or "N/A"}'))
+            if not (m.recharge_amount and m.recharge_amount > 0):
+                events.append(AutoRechargeEvent(user_id=m.user_id, meter_id=m.pk, status='failed', amount=m.recharge_amount, message='No amount configured'))
+                notifications.append(('alert', m.user_id, 'Auto recharge failed', f'Auto recharge failed for meter {label}: no amount configured.'))
+                delta['failed'] += 1
+                continue
+            requested = Decimal(str(m.recharge_amount))
+            if m.pk in claimed:
+                code, amount, units = claimed[m.pk]
+                units = units or requested
+            else:
+                # no pool token available; generate synthetic token code
+                code, amount, units = f'AUTO-{m.user_id}-{m.pk}-{stamp}', None, requested
+            tokens.append(Token(meter_id=m.pk, token_code=code, amount=amount or Decimal('0.00'), units=units))
+            purchases.append(TokenPurchase(token_code=code, meter_id=m.pk, user_id=m.user_id, amount=amount or Decimal('0.00'), units=units))
+            entries.append(MeterLedger(meter_id=m.pk, entry_type=ledger.AUTO_RECHARGE, units=units, reference=code))
+            events.append(AutoRechargeEvent(
+                user_id=m.user_id, meter_id=m.pk, status='completed', amount=m.recharge_amount, executed_at=now,
+                message=f'Auto recharge executed; token {code} applied.',
+            ))
+            notifications.append(('payment', m.user_id, 'Auto recharge completed', f'Auto recharge of {units} kWh completed for meter {label}. Token: {code}'))
+            delta['executed'] += 1
+
+        AutoRechargeEvent.objects.bulk_create(events)
+        Token.objects.bulk_create(tokens)
+        TokenPurchase.objects.bulk_create(purchases)
+        ledger.post_entries(entries)
+        if Notification is not None:
+            Notification.objects.bulk_create([
+                Notification(user_id=user_id, notification_type=kind, title=title, message=message)
+                for kind, user_id, title, message in notifications
+            ])
+        _advance(checkpoint, meters, delta, on_chunk)
+    for key, n in delta.items():
+        summary[key] += n
+    if stdout:
+        stdout.write(f'Processed {len(meters)} meters (up to meter {meters[-1].pk}): {len(tokens)} recharged\n')
+
+
+def _fail_chunk(meters, error, summary, checkpoint=None, on_chunk=None):
+    with db_transaction.atomic():
+        AutoRechargeEvent.objects.bulk_create([
+            AutoRechargeEvent(user_id=m.user_id, meter_id=m.pk, status='failed', amount=m.recharge_amount, message=f'Execution error: {error}')
+            for m in meters
+        ])
+        _advance(checkpoint, meters, {'triggered': len(meters), 'executed': 0, 'failed': len(meters)}, on_chunk)
+    summary['triggered'] += len(meters)
+    summary['failed'] += len(meters)
+
+
+def sweep(user_ids=None, force=False, chunk_size=DEFAULT_CHUNK_SIZE, stdout=None, shard=None, shards=1, checkpoint=None, meter_ids=None,
+          on_chunk=None, respect_window=False, lock_users=True):
+    """Recharge every eligible meter; returns {'triggered', 'executed', 'failed'} for this call.
+
+    With respect_window, meters whose owner is outside their daily
+    auto-recharge window (meters.scheduling) are skipped; fleet-wide sweeps
+    set it. Callers that already checked the window (the scheduler, the
+    threshold trigger) or act on an explicit user request (run-now, forced
+    runs) leave it off. With lock_users (the default) each chunk takes the
+    per-user locks from meters.locks and skips users whose lock is held, e.g.
+    by a run-now job; callers already holding the user's lock pass False.
+    Chunks are committed independently. If a chunk fails it is rolled back and
+    its meters get a failed event, and the sweep moves on to the next chunk.
+    With a checkpoint, the sweep starts after checkpoint.last_meter_id and
+    advances it with every committed chunk. on_chunk(meters, delta) is called
+    inside each chunk transaction, e.g. to record progress.
+    """
+    summary = {'triggered': 0, 'executed': 0, 'failed': 0}
+    worker_id = f'sweep:{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+    fields = ('pk', 'user_id', 'meter_number')
+    last_pk = checkpoint.last_meter_id if checkpoint is not None else 0
+    qs = eligible_meters(user_ids=user_ids, force=force, shard=shard, shards=shards, meter_ids=meter_ids).only(*fields)
+    try:
+        while True:
+            meters = list(qs.filter(pk__gt=last_pk)[:chunk_size])
+            if not meters:
+                break
+            last_pk = meters[-1].pk
+            if respect_window:
+                open_users = open_window_users({m.user_id for m in meters})
+                meters = [m for m in meters if m.user_id in open_users]
+                if not meters:
+                    continue
+            with ExitStack() as stack:
+                if lock_users:
+                    held = stack.enter_context(autorecharge_users_lock({m.user_id for m in meters}))
+                    meters = [m for m in meters if m.user_id in held]
+                    if not meters:
+                        continue
+                try:
+                    _process_chunk(meters, worker_id, summary, stdout=stdout, checkpoint=checkpoint, on_chunk=on_chunk)
+                except Exception as e:
+                    logger.exception('Auto-recharge sweep chunk failed', extra={'first_meter_id': meters[0].pk, 'last_meter_id': last_pk})
+                    _fail_chunk(meters, e, summary, checkpoint=checkpoint, on_chunk=on_chunk)
+    finally:
+        # anything still leased (e.g. lost between reserve and allocate) goes back to the pool
+        release_reservations(worker_id=worker_id)
+    return summary
+
+
+def run_shard(run_id, shard, shards, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Run (or resume) one shard of a sweep; returns the shard's cumulative summary.
+
+    Idempotent per (run_id, shard): a completed shard just reports its totals,
+    and a crashed one continues after its checkpoint.
+    """
+    checkpoint, _ = AutoRechargeSweepCheckpoint.objects.get_or_create(run_id=run_id, shard=shard, defaults={'shards': shards})
+    if checkpoint.status != 'completed':
+        sweep(shard=shard, shards=shards, chunk_size=chunk_size, checkpoint=checkpoint, respect_window=True)
+        AutoRechargeSweepCheckpoint.objects.filter(pk=checkpoint.pk).update(status='completed', updated_at=timezone.now())
+        checkpoint.refresh_from_db()
+    return checkpoint.summary()
+
+
+def aggregate_summaries(summaries):
+    total = {'triggered': 0, 'executed': 0, 'failed': 0}
+    for summary in summaries:
+        for key in total:
+            total[key] += summary.get(key, 0)
+    return total
+
+
+def run_sharded_sweep(shards, run_id=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Dispatch (or, given run_id, resume) a sweep as a Celery chord of shard tasks; returns (run_id, AsyncResult).
+
+    The chord callback aggregates the shard summaries. Without a broker
+    (CELERY_TASK_ALWAYS_EAGER) the shards run inline and the result is ready
+    immediately.
+    """
+    from celery import chord
+
+    from .tasks import aggregate_autorecharge_sweep_task, autorecharge_shard_task
+
+    if run_id:
+        # resuming: keep the original shard layout so checkpoints line up
+        shards = AutoRechargeSweepCheckpoint.objects.filter(run_id=run_id).values_list('shards', flat=True).first() or shards
+    else:
+        run_id = f'{timezone.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}'
+    header = [autorecharge_shard_task.s(run_id, shard, shards, chunk_size) for shard in range(shards)]
+    return run_id, chord(header)(aggregate_autorecharge_sweep_task.s(run_id))
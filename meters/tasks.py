@@ -1,17 +1,175 @@
 from celery import shared_task
-from django.core import management
+from django.db import OperationalError
 
 
 @shared_task
-def run_autorecharge_task():
-    """Wrapper task that invokes the management command to run autorecharge checks.
+def run_autorecharge_task(shards=None):
+    """Start an auto-recharge sweep split into settings.AUTORECHARGE_SWEEP_SHARDS shards.
 
-    This keeps the actual logic in the management command but allows running it
-    from Celery beat or ad-hoc with a worker.
+    The shards run in parallel on any available workers (see
+    meters.sweep.run_sharded_sweep); the chord callback aggregates their summaries.
     """
+    import logging
+    from django.conf import settings
+    from .planner import warn_on_shortfall
+    from .sweep import run_sharded_sweep
+
     try:
-        management.call_command('run_autorecharge')
-        return {'status': 'ok'}
-    except Exception as e:
-        # let Celery record the exception and optionally retry
-        raise
+        # a dry run first, so a pool about to run dry is logged before the sweep starts
+        warn_on_shortfall()
+    except Exception:
+        logging.getLogger('meters.autorecharge').exception('Auto-recharge planning failed')
+    run_id, _ = run_sharded_sweep(shards or getattr(settings, 'AUTORECHARGE_SWEEP_SHARDS', 1))
+    return {'status': 'dispatched', 'run_id': run_id}
+
+
+@shared_task
+def autorecharge_meter_task(meter_id):
+    """Recharge one meter that crossed below its threshold (queued by meters.triggers).
+
+    Re-checks eligibility, so a meter topped up in the meantime is skipped. Outside
+    the owner's time window nothing happens; the scheduler recharges the meter
+    once the window opens.
+    """
+    from .scheduling import meter_window_open
+    from .sweep import sweep
+
+    if not meter_window_open(meter_id):
+        return {'status': 'outside_window'}
+    return sweep(meter_ids=[meter_id])
+
+
+@shared_task(bind=True, max_retries=12)
+def run_autorecharge_job_task(self, job_id):
+    """Execute a run-now AutoRechargeJob (see meters.jobs); waits for a concurrent run of the same user to finish."""
+    from .jobs import LockBusy, finish_job, run_job
+
+    try:
+        job = run_job(job_id)
+    except LockBusy as exc:
+        if self.request.retries >= self.max_retries:
+            finish_job(job_id, 'failed', str(exc))
+            raise
+        raise self.retry(exc=exc, countdown=5)
+    return {'job_id': job_id, 'status': job.status if job else 'missing'}
+
+
+@shared_task
+def autorecharge_scheduler_tick_task():
+    """Sweep the users whose auto-recharge window is open and who are due (see meters.scheduling)."""
+    from .scheduling import run_due
+    return run_due()
+
+
+@shared_task(bind=True, max_retries=3)
+def autorecharge_shard_task(self, run_id, shard, shards, chunk_size=1000):
+    """Process one shard of a sweep; resumes from its checkpoint when redelivered or retried."""
+    from .sweep import run_shard
+
+    try:
+        return run_shard(run_id, shard, shards, chunk_size=chunk_size)
+    except OperationalError as exc:
+        raise self.retry(exc=exc, countdown=30)
+
+
+@shared_task
+def aggregate_autorecharge_sweep_task(summaries, run_id):
+    """Chord callback: total the shard summaries of one sweep."""
+    import logging
+    from .sweep import aggregate_summaries
+
+    total = aggregate_summaries(summaries)
+    logging.getLogger('meters.autorecharge').info('Auto-recharge sweep %s finished: %s', run_id, total)
+    return {'run_id': run_id, 'shards': len(summaries), **total}
+
+
+@shared_task
+def release_expired_reservations_task():
+    """Return TokenPool rows whose reservation lease expired (e.g. the worker died) to the pool,
+    and tokens the allocation backend handed out without a committed allocation."""
+    from .allocation_backends import get_allocation_backend
+    from .reservations import release_expired_reservations
+    return {'released': release_expired_reservations(), 'recovered': get_allocation_backend().recover()}
+
+
+@shared_task(bind=True, max_retries=8)
+def confirm_purchase_task(self, transaction_id):
+    """Confirm payment for a pending purchase and allocate its token.
+
+    Idempotent on transaction_id (see meters.purchases.complete_purchase), so
+    redeliveries after a worker restart are safe. Retries with exponential
+    backoff while the provider is still settling or the database is
+    unavailable, then marks the transaction failed.
+    """
+    from .payments import PaymentPending
+    from .purchases import complete_purchase, fail_purchase
+
+    try:
+        return complete_purchase(transaction_id)
+    except (PaymentPending, OperationalError) as exc:
+        if self.request.retries >= self.max_retries:
+            fail_purchase(transaction_id, f'Payment confirmation failed: {exc}')
+            raise
+        raise self.retry(exc=exc, countdown=min(5 * 2 ** self.request.retries, 300))
+
+
+@shared_task
+def requeue_stale_purchases_task(older_than_seconds=300):
+    """Re-dispatch confirmation for purchases left pending (e.g. the broker lost the message)."""
+    from datetime import timedelta
+    from django.utils import timezone
+    from transactions.models import Transaction
+
+    cutoff = timezone.now() - timedelta(seconds=older_than_seconds)
+    ids = list(
+        Transaction.objects.filter(status='pending', transaction_type='purchase', created_at__lt=cutoff)
+        .values_list('transaction_id', flat=True)[:1000]
+    )
+    for transaction_id in ids:
+        confirm_purchase_task.delay(transaction_id)
+    return {'requeued': len(ids)}
+
+
+@shared_task
+def compact_meter_ledger_task(older_than_days=30):
+    """Fold old MeterLedger entries into balance snapshots (see meters.ledger)."""
+    from datetime import timedelta
+    from .ledger import compact_ledger
+    return {'folded': compact_ledger(older_than=timedelta(days=older_than_days))}
+
+
+@shared_task
+def forecast_token_demand_task():
+    """Refresh daily demand per denomination and the pool depletion forecasts (see meters.forecasting)."""
+    from .forecasting import run_forecast
+    return run_forecast()
+
+
+@shared_task
+def verify_pending_recharges_task():
+    """Resolve all pending manual recharges in one batch (see meters.verification)."""
+    from .verification import verify_pending_recharges
+    return verify_pending_recharges()
+
+
+def schedule_recharge_verification(delay=2, user_id=None):
+    """Queue one verification tick within `delay` seconds, coalescing concurrent requests.
+
+    Every pending manual recharge created inside the window is handled by the
+    same tick; the beat schedule covers anything that arrives afterwards and
+    expires rows that never resolve. With CELERY_TASK_ALWAYS_EAGER the
+    countdown would be ignored and the fleet-wide batch would run inside the
+    caller's request, so only user_id's pending rows are verified inline;
+    ManualRechargeViewSet calls this on every status poll, and
+    run_periodic_tasks runs the full batch in place of beat.
+    """
+    from django.conf import settings
+    from django.core.cache import cache
+
+    if getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
+        if user_id is not None:
+            from .verification import verify_pending_recharges
+            verify_pending_recharges(user_id=user_id)
+        return
+    if cache.add('meters:verify-recharges-scheduled', 1, timeout=delay):
+        verify_pending_recharges_task.apply_async(countdown=delay)
@@ -0,0 +1,70 @@
+from decimal import Decimal
+from unittest import skipUnless
+from django.db import transaction
+from django.test import TestCase, override_settings
+from meters.models import TokenPool
+from meters.allocator import claim_token
+from meters.allocation_backends import InMemoryBackend, RedisListBackend, get_allocation_backend, set_allocation_backend
+from meters.counters import pool_availability
+from meters.importers import import_token_rows
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+@override_settings(TOKEN_ALLOCATION_BACKEND='meters.allocation_backends.InMemoryBackend')
+class InMemoryBackendTest(TestCase):
+    def test_claims_without_touching_the_pool(self):
+        backend = get_allocation_backend()
+        self.assertIsInstance(backend, InMemoryBackend)
+        backend.add('MEM-1', amount='10')
+        backend.add('MEM-2')
+        self.assertEqual(claim_token(amount=Decimal('10.00')).token_code, 'MEM-1')
+        self.assertIsNone(claim_token(amount=Decimal('10.00')))
+        self.assertEqual(claim_token(amount=Decimal('10.00'), allow_any=True).token_code, 'MEM-2')
+
+
+@skipUnless(fakeredis, 'fakeredis is not installed')
+class RedisListBackendTest(TestCase):
+    def setUp(self):
+        self.backend = RedisListBackend(client=fakeredis.FakeRedis())
+        set_allocation_backend(self.backend)
+        self.addCleanup(set_allocation_backend, None)
+
+    def test_import_pushes_tokens_and_claims_pop_them(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            import_token_rows([('R1', Decimal('10.00'), None), ('R2', None, None)])
+        token = claim_token(amount=Decimal('10.00'), user_id=None, transaction_id='txn-r')
+        self.assertEqual(token.token_code, 'R1')
+        self.assertTrue(TokenPool.objects.get(token_code='R1').is_allocated)
+        self.assertEqual(pool_availability()['total_allocated'], 1)
+        self.assertIsNone(claim_token(amount=Decimal('10.00')))
+        self.assertEqual(claim_token(amount=Decimal('10.00'), allow_any=True).token_code, 'R2')
+
+    def test_rolled_back_claim_is_recovered(self):
+        TokenPool.objects.create(token_code='B1')
+        self.backend.rebuild()
+        try:
+            with transaction.atomic():
+                self.assertEqual(claim_token(allow_any=True).token_code, 'B1')
+                raise RuntimeError('payment write failed')
+        except RuntimeError:
+            pass
+        self.assertFalse(TokenPool.objects.get(token_code='B1').is_allocated)
+        self.assertIsNone(claim_token(allow_any=True))
+        self.assertEqual(self.backend.recover(), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(claim_token(allow_any=True).token_code, 'B1')
+        # acknowledged on commit, nothing left to recover
+        self.assertEqual(self.backend.recover(), 0)
+
+    def test_stale_entries_are_skipped(self):
+        TokenPool.objects.create(token_code='S1')
+        TokenPool.objects.create(token_code='S2')
+        self.assertEqual(self.backend.rebuild(), 2)
+        # S1 gets applied manually by code, leaving a stale id in the list
+        claim_token(token_code='S1')
+        self.assertEqual(claim_token(allow_any=True).token_code, 'S2')
+        self.assertIsNone(claim_token(allow_any=True))
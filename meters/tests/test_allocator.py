@@ -0,0 +1,35 @@
+from django.test import TestCase
+from usersAuth.models import User
+from meters.models import TokenPool
+from meters.allocator import claim_token
+from decimal import Decimal
+
+
+class ClaimTokenTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alloc', email='alloc@example.com', password='pass')
+        TokenPool.objects.create(token_code='T-ANY-1')
+        TokenPool.objects.create(token_code='T-TEN-1', amount=Decimal('10.00'), units=Decimal('42.00'))
+
+    def test_claims_matching_denomination_first(self):
+        token = claim_token(amount=Decimal('10.00'), allow_any=True, user_id=self.user.id, transaction_id='txn-1')
+        self.assertEqual(token.token_code, 'T-TEN-1')
+        self.assertEqual(token.units, Decimal('42.00'))
+        row = TokenPool.objects.get(token_code='T-TEN-1')
+        self.assertTrue(row.is_allocated)
+        self.assertEqual(row.allocated_to_id, self.user.id)
+        self.assertEqual(row.allocated_transaction_id, 'txn-1')
+
+    def test_falls_back_to_any_token_only_when_allowed(self):
+        self.assertIsNone(claim_token(amount=Decimal('5.00')))
+        token = claim_token(amount=Decimal('5.00'), allow_any=True)
+        self.assertEqual(token.token_code, 'T-ANY-1')
+
+    def test_token_code_is_claimed_once(self):
+        self.assertIsNotNone(claim_token(token_code='T-ANY-1', user_id=self.user.id))
+        self.assertIsNone(claim_token(token_code='T-ANY-1', user_id=self.user.id))
+
+    def test_returns_none_when_pool_is_exhausted(self):
+        claim_token()
+        claim_token()
+        self.assertIsNone(claim_token(allow_any=True))
@@ -0,0 +1,70 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from usersAuth.models import User
+from meters.models import AutoRechargeEvent, Meter
+
+
+class AutoRechargeEventFeedTest(TestCase):
+    url = '/api/meters/auto-recharge/events/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='feeduser', email='feed@example.com', password='pass')
+        self.meter = Meter.objects.create(user=self.user, meter_number='FEED-1', address='A')
+        base = timezone.now() - timedelta(hours=1)
+        self.events = AutoRechargeEvent.objects.bulk_create([
+            AutoRechargeEvent(user=self.user, meter=self.meter, status='completed', amount=Decimal('5.00'))
+            for _ in range(5)
+        ])
+        # distinct, ascending trigger times; updated_at equal to them
+        for i, ev in enumerate(self.events):
+            AutoRechargeEvent.objects.filter(pk=ev.pk).update(triggered_at=base + timedelta(minutes=i), updated_at=base + timedelta(minutes=i))
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_cursor_pages_cover_the_feed_newest_first(self):
+        first = self.client.get(self.url, {'limit': 2})
+        self.assertEqual([e['id'] for e in first.data], [self.events[4].id, self.events[3].id])
+        self.assertIn('rel="next"', first['Link'])
+        seen = [e['id'] for e in first.data]
+        cursor = first['X-Next-Cursor']
+        while cursor:
+            page = self.client.get(self.url, {'limit': 2, 'cursor': cursor})
+            seen += [e['id'] for e in page.data]
+            cursor = page.get('X-Next-Cursor')
+        self.assertEqual(seen, [ev.id for ev in reversed(self.events)])
+
+    def test_since_returns_only_changed_events(self):
+        r = self.client.get(self.url)
+        since = r['X-Last-Modified']
+        self.assertEqual(self.client.get(self.url, {'since': since}).data, [])
+
+        changed = self.events[0]
+        changed.status = 'failed'
+        changed.save()
+        data = self.client.get(self.url, {'since': since}).data
+        self.assertEqual([(e['id'], e['status']) for e in data], [(changed.id, 'failed')])
+
+        self.assertEqual(self.client.get(self.url, {'since': 'yesterday'}).status_code, 400)
+
+    def test_if_none_match_returns_304_until_the_feed_changes(self):
+        r = self.client.get(self.url)
+        etag = r['ETag']
+        with self.assertNumQueries(1):
+            cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], etag)
+
+        AutoRechargeEvent.objects.create(user=self.user, meter=self.meter, status='pending')
+        fresh = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(fresh.status_code, 200)
+        self.assertEqual(len(fresh.data), 6)
+        self.assertNotEqual(fresh['ETag'], etag)
+
+    def test_other_users_events_are_excluded(self):
+        other = User.objects.create_user(username='feedother', email='feedother@example.com', password='pass')
+        meter = Meter.objects.create(user=other, meter_number='FEED-2', address='B')
+        AutoRechargeEvent.objects.create(user=other, meter=meter, status='completed')
+        self.assertEqual(len(self.client.get(self.url).data), 5)
@@ -0,0 +1,69 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from usersAuth.models import User
+from meters.jobs import STALE_AFTER, LockBusy, request_run_now, run_job
+from meters.locks import autorecharge_user_lock
+from meters.models import AutoRechargeConfig, AutoRechargeEvent, AutoRechargeJob, Meter
+
+
+@override_settings(TOKEN_RESERVATION_BATCH_SIZE=0)
+class RunNowJobTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='jobuser', email='job@example.com', password='pass')
+        AutoRechargeConfig.objects.create(user=self.user, enabled=True, default_threshold=Decimal('10.00'), default_amount=Decimal('20.00'))
+        self.meter = Meter.objects.create(user=self.user, meter_number='JOB-1', address='A', current_balance=Decimal('50.00'))
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_repeated_requests_share_one_job(self):
+        first = self.client.post('/api/meters/auto-recharge/run-now/').json()
+        second = self.client.post('/api/meters/auto-recharge/run-now/').json()
+        self.assertEqual((first['status'], first['coalesced']), ('started', False))
+        self.assertEqual((second['job_id'], second['coalesced']), (first['job_id'], True))
+        self.assertEqual(AutoRechargeJob.objects.count(), 1)
+
+    def test_job_endpoint_reports_summary(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            job_id = self.client.post('/api/meters/auto-recharge/run-now/').json()['job_id']
+        data = self.client.get(f'/api/meters/auto-recharge/jobs/{job_id}/').json()
+        self.assertEqual(data['status'], 'completed')
+        self.assertEqual((data['meters_total'], data['meters_processed'], data['executed']), (1, 1, 1))
+        self.assertEqual(AutoRechargeEvent.objects.filter(meter=self.meter).count(), 1)
+        # finished jobs don't block a new run
+        self.assertFalse(self.client.post('/api/meters/auto-recharge/run-now/').json()['coalesced'])
+
+    def test_job_waits_for_the_user_lock(self):
+        job = AutoRechargeJob.objects.create(user=self.user)
+        with autorecharge_user_lock(self.user.id) as acquired:
+            self.assertTrue(acquired)
+            with self.assertRaises(LockBusy):
+                run_job(job.id)
+        self.assertEqual(run_job(job.id).status, 'completed')
+
+    def test_progress_keeps_a_long_job_fresh(self):
+        job = AutoRechargeJob.objects.create(user=self.user)
+        AutoRechargeJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - STALE_AFTER * 2)
+        self.assertEqual(run_job(job.id).status, 'completed')
+        self.assertGreater(AutoRechargeJob.objects.get(pk=job.pk).updated_at, timezone.now() - timedelta(minutes=1))
+        _, created = request_run_now(self.user)
+        self.assertTrue(created)
+        self.assertEqual(AutoRechargeJob.objects.get(pk=job.pk).status, 'completed')
+
+    def test_sweeps_skip_users_with_a_run_in_progress(self):
+        from meters.sweep import sweep
+
+        Meter.objects.filter(pk=self.meter.pk).update(current_balance=Decimal('5.00'))
+        with autorecharge_user_lock(self.user.id) as acquired:
+            self.assertTrue(acquired)
+            self.assertEqual(sweep()['triggered'], 0)
+        self.assertEqual(sweep()['executed'], 1)
+
+    def test_other_users_jobs_are_hidden(self):
+        other = User.objects.create_user(username='other', email='other@example.com', password='pass')
+        job = AutoRechargeJob.objects.create(user=other)
+        self.assertEqual(self.client.get(f'/api/meters/auto-recharge/jobs/{job.id}/').status_code, 404)
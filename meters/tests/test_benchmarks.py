@@ -0,0 +1,24 @@
+import json
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from meters.benchmarks import percentile
+from meters.models import TokenPool
+
+
+@override_settings(TOKEN_RESERVATION_BATCH_SIZE=0)
+class BenchMetersCommandTest(TestCase):
+    def test_percentile_is_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual((percentile(values, 50), percentile(values, 95), percentile(values, 99)), (50, 95, 99))
+        self.assertIsNone(percentile([], 50))
+
+    def test_reports_every_operation_and_cleans_up(self):
+        out = StringIO()
+        call_command('bench_meters', pool_size=200, users=2, workers=1, operations=5, cleanup=True, stdout=out, stderr=StringIO())
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report['results']), {'purchase', 'recharge', 'apply', 'autorecharge'})
+        for stats in report['results'].values():
+            self.assertEqual((stats['operations'], stats['errors']), (5, 0))
+            self.assertGreater(stats['queries_per_op'], 0)
+        self.assertFalse(TokenPool.objects.exists())
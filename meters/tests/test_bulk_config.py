@@ -0,0 +1,68 @@
+from decimal import Decimal
+from django.test import TestCase
+from rest_framework.test import APIClient
+from usersAuth.models import User
+from meters.models import AutoRechargeConfig, Meter
+
+
+class BulkMeterConfigTest(TestCase):
+    url = '/api/meters/bulk-config/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='fleet', email='fleet@example.com', password='pass')
+        self.meters = [Meter.objects.create(user=self.user, meter_number=f'FLEET-{i}', address='A') for i in range(4)]
+        self.other = User.objects.create_user(username='notfleet', email='notfleet@example.com', password='pass')
+        self.foreign = Meter.objects.create(user=self.other, meter_number='OTHER-1', address='B')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_shared_and_per_meter_values_in_constant_queries(self):
+        body = {
+            'set': {'auto_recharge_enabled': True, 'auto_recharge_threshold': '5.00'},
+            'meters': [
+                {'id': self.meters[0].id, 'nickname': 'Shop', 'auto_recharge_threshold': '8.00'},
+                {'id': self.meters[1].id, 'auto_recharge_amount': '20.00'},
+            ],
+        }
+        # 3 reads + 2 updates + savepoint/release, however many meters are involved
+        with self.assertNumQueries(7):
+            r = self.client.post(self.url, body, format='json')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.data['updated'], 4)
+
+        m0, m1, m2, _ = [Meter.objects.get(pk=m.pk) for m in self.meters]
+        self.assertEqual((m0.nickname, m0.auto_recharge_threshold, m0.auto_recharge_enabled), ('Shop', Decimal('8.00'), True))
+        self.assertEqual((m1.auto_recharge_threshold, m1.auto_recharge_amount), (Decimal('5.00'), Decimal('20.00')))
+        self.assertEqual((m2.auto_recharge_threshold, m2.auto_recharge_amount, m2.nickname), (Decimal('5.00'), None, ''))
+
+    def test_filter_limits_the_shared_update(self):
+        r = self.client.post(self.url, {
+            'set': {'nickname': 'Flat'},
+            'filter': {'meter_number_prefix': 'FLEET-', 'ids': [self.meters[2].id, self.meters[3].id, self.foreign.id]},
+        }, format='json')
+        self.assertEqual(sorted(row['id'] for row in r.data['results']), [self.meters[2].id, self.meters[3].id])
+        self.assertEqual(list(Meter.objects.filter(nickname='Flat').values_list('pk', flat=True).order_by('pk')), [self.meters[2].id, self.meters[3].id])
+        self.assertEqual(Meter.objects.get(pk=self.foreign.pk).nickname, '')
+
+    def test_per_meter_results_report_invalid_and_foreign_meters(self):
+        r = self.client.post(self.url, {'meters': [
+            {'id': self.meters[0].id, 'auto_recharge_amount': '-1'},
+            {'id': self.foreign.id, 'nickname': 'Mine'},
+            {'id': self.meters[1].id, 'nickname': 'Ok'},
+        ]}, format='json')
+        statuses = {row['id']: row['status'] for row in r.data['results']}
+        self.assertEqual(statuses, {self.meters[0].id: 'invalid', self.foreign.id: 'not_found', self.meters[1].id: 'updated'})
+        self.assertEqual(Meter.objects.get(pk=self.foreign.pk).nickname, '')
+        self.assertEqual(self.client.post(self.url, {}, format='json').status_code, 400)
+
+    def test_apply_to_all_fills_only_missing_values(self):
+        Meter.objects.filter(pk=self.meters[0].pk).update(auto_recharge_threshold=Decimal('3.00'))
+        AutoRechargeConfig.objects.create(user=self.user)
+        r = self.client.post('/api/meters/auto-recharge/settings/', {
+            'default_threshold': '10.00', 'default_amount': '15.00', 'apply_to_all': True,
+        }, format='json')
+        self.assertEqual(r.status_code, 200)
+        m0, m1 = Meter.objects.get(pk=self.meters[0].pk), Meter.objects.get(pk=self.meters[1].pk)
+        self.assertEqual((m0.auto_recharge_threshold, m0.auto_recharge_amount), (Decimal('3.00'), Decimal('15.00')))
+        self.assertEqual((m1.auto_recharge_threshold, m1.auto_recharge_amount), (Decimal('10.00'), Decimal('15.00')))
+        self.assertIsNone(Meter.objects.get(pk=self.foreign.pk).auto_recharge_threshold)
@@ -0,0 +1,81 @@
+import csv
+import gzip
+import io
+import json
+from decimal import Decimal
+from django.test import TestCase
+from rest_framework.test import APIClient
+from usersAuth.models import User
+from meters.models import ManualRecharge, Meter, Token, TokenPurchase
+from transactions.models import Transaction
+
+
+def _body(response):
+    data = b''.join(response.streaming_content)
+    if response.get('Content-Encoding') == 'gzip':
+        data = gzip.decompress(data)
+    return data.decode('utf-8')
+
+
+class ExportTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='exp', email='exp@example.com', password='pass')
+        other = User.objects.create_user(username='expother', email='expother@example.com', password='pass')
+        self.meter = Meter.objects.create(user=self.user, meter_number='EXP-1', address='A')
+        other_meter = Meter.objects.create(user=other, meter_number='EXP-2', address='B')
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, meter=self.meter, transaction_id=f'EXP-{i}', amount=Decimal('5.00'), units=Decimal('21.00'),
+                        status='completed' if i % 2 else 'failed', transaction_type='purchase', payment_method='dev',
+                        description=f'row, "{i}"')
+            for i in range(5)
+        ] + [Transaction(user=other, transaction_id='EXP-OTHER', amount=Decimal('1'), status='completed', payment_method='dev')])
+        Token.objects.create(meter=self.meter, token_code='11112222', amount=Decimal('5.00'), units=Decimal('21.00'))
+        Token.objects.create(meter=other_meter, token_code='33334444', amount=Decimal('5.00'), units=Decimal('21.00'))
+        TokenPurchase.objects.create(token_code='P1', meter=self.meter, user=self.user, amount=Decimal('5.00'), units=Decimal('21.00'))
+        ManualRecharge.objects.create(token_code='12345678901234567890', masked_token='1234****7890', meter=self.meter, user=self.user,
+                                      units=Decimal('10.00'), status='success')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_transactions_csv_applies_list_filters(self):
+        r = self.client.get('/api/transactions/export/', {'status': 'completed'})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r['Content-Type'], 'text/csv')
+        self.assertIn('attachment; filename="transactions-', r['Content-Disposition'])
+        rows = list(csv.reader(io.StringIO(_body(r))))
+        self.assertEqual(rows[0][:3], ['transaction_id', 'created_at', 'status'])
+        self.assertEqual(sorted(row[0] for row in rows[1:]), ['EXP-1', 'EXP-3'])
+        self.assertIn(['EXP-1', 'row, "1"'], [row[-2:] for row in rows[1:]])
+
+    def test_ndjson_gzipped_on_request(self):
+        r = self.client.get('/api/transactions/export/', {'export_format': 'ndjson', 'search': 'EXP'}, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(r['Content-Encoding'], 'gzip')
+        records = [json.loads(line) for line in _body(r).splitlines()]
+        self.assertEqual(len(records), 5)
+        self.assertEqual(records[0]['amount'], '5.00')
+        self.assertEqual(records[0]['meter_number'], 'EXP-1')
+
+    def test_invalid_format_rejected(self):
+        self.assertEqual(self.client.get('/api/transactions/export/', {'export_format': 'xml'}).status_code, 400)
+
+    def test_tokens_purchases_and_recharges(self):
+        tokens = list(csv.DictReader(io.StringIO(_body(self.client.get('/api/tokens/export/')))))
+        self.assertEqual([t['token_code'] for t in tokens], ['11112222'])
+        self.assertEqual(tokens[0]['is_used'], 'False')
+
+        purchases = list(csv.DictReader(io.StringIO(_body(self.client.get('/api/meters/purchases/export/')))))
+        self.assertEqual([(p['token_code'], p['meter_number']) for p in purchases], [('P1', 'EXP-1')])
+
+        recharges = _body(self.client.get('/api/recharges/export/', {'export_format': 'ndjson', 'status': 'success'}))
+        record = json.loads(recharges)
+        self.assertEqual(record['token_code'], '12345678901234567890')
+        self.assertEqual(record['applied_at'], None)
+        self.assertEqual(_body(self.client.get('/api/recharges/export/', {'export_format': 'ndjson', 'date_to': '2000-01-01'})), '')
+
+    def test_staff_can_export_all_users(self):
+        self.assertEqual(_body(self.client.get('/api/tokens/export/', {'scope': 'all'})).count('\n'), 2)
+        staff = User.objects.create_user(username='expstaff', email='expstaff@example.com', password='pass', is_staff=True)
+        self.client.force_authenticate(user=staff)
+        self.assertEqual(_body(self.client.get('/api/tokens/export/', {'scope': 'all'})).count('\n'), 3)
+        body = _body(self.client.get('/api/transactions/export/', {'scope': 'all'}))
+        self.assertIn('EXP-OTHER', body)
@@ -0,0 +1,76 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from usersAuth.models import User
+from meters.forecasting import aggregate_daily_demand, forecast_demand
+from meters.importers import import_token_rows
+from meters.models import Meter, TokenDemandDaily, TokenDemandForecast, TokenPurchase
+
+
+class TokenDemandForecastTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='fc', email='fc@example.com', password='pass')
+        self.meter = Meter.objects.create(user=self.user, meter_number='FC-1', address='A')
+        self.today = timezone.localdate()
+        # four weeks of 5 purchases per weekday and none at weekends
+        for offset in range(1, 29):
+            day = self.today - timedelta(days=offset)
+            if day.weekday() < 5:
+                self._purchases(day, 5)
+        self._purchases(self.today - timedelta(days=1), 3, code='AUTO-1-1-')
+        import_token_rows([(f'FCTOKEN{i}', Decimal('10.00'), Decimal('42.00')) for i in range(98)])
+        import_token_rows([('FCIDLE1', Decimal('50.00'), Decimal('210.00'))])
+
+    def _purchases(self, day, n, code='FC', amount='10.00', units='42.00'):
+        at = timezone.make_aware(datetime.combine(day, time(12)))
+        created = TokenPurchase.objects.bulk_create([
+            TokenPurchase(token_code=f'{code}{day:%m%d}{i}', meter=self.meter, user=self.user, amount=Decimal(amount), units=Decimal(units))
+            for i in range(n)
+        ])
+        TokenPurchase.objects.filter(pk__in=[p.pk for p in created]).update(purchased_at=at)
+
+    def test_aggregates_daily_series_incrementally(self):
+        self.assertEqual(aggregate_daily_demand(), 20)
+        self.assertEqual(TokenDemandDaily.objects.filter(purchases=5).count(), 20)
+
+        self._purchases(self.today, 2)
+        # only the last stored day onwards is re-aggregated: that day and today
+        with self.assertNumQueries(6):
+            self.assertEqual(aggregate_daily_demand(), 2)
+        self.assertEqual(TokenDemandDaily.objects.get(day=self.today).purchases, 2)
+        self.assertEqual(TokenDemandDaily.objects.count(), 21)
+
+    def test_weekly_seasonal_forecast_and_depletion(self):
+        aggregate_daily_demand()
+        forecasts = {f.bucket: f for f in forecast_demand(history_days=28)}
+        busy, idle = forecasts['10.00|42.00'], forecasts['50.00|210.00']
+
+        self.assertAlmostEqual(busy.daily_level, 25 / 7, places=3)
+        self.assertEqual([round(p, 1) for p in busy.weekday_profile], [1.4] * 5 + [0.0] * 2)
+        self.assertAlmostEqual(busy.projected_next_7_days, 25.0, places=1)
+        # 98 tokens at 5 per weekday run out on the 20th weekday, counting today
+        day, weekdays = self.today, 0
+        while True:
+            weekdays += day.weekday() < 5
+            if weekdays == 20:
+                break
+            day += timedelta(days=1)
+        self.assertEqual(busy.depletion_date, day)
+        self.assertEqual(busy.available, 98)
+        self.assertIsNone(idle.depletion_date)
+        self.assertEqual(TokenDemandForecast.objects.count(), 2)
+
+    def test_forecast_endpoint_is_staff_only(self):
+        aggregate_daily_demand()
+        forecast_demand()
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        self.assertEqual(client.get('/api/meters/token-pool/forecast/').status_code, 403)
+
+        staff = User.objects.create_user(username='fcstaff', email='fcstaff@example.com', password='pass', is_staff=True)
+        client.force_authenticate(user=staff)
+        data = client.get('/api/meters/token-pool/forecast/').json()
+        self.assertEqual([f['bucket'] for f in data], ['10.00|42.00', '50.00|210.00'])
+        self.assertIsNotNone(data[0]['depletion_date'])
@@ -0,0 +1,83 @@
+import io
+import os
+import tempfile
+from decimal import Decimal
+from django.core.management import call_command
+from django.test import TestCase
+from meters.models import TokenImportManifest, TokenPool
+from meters.importers import iter_json_array, import_token_file, sync_token_file
+
+
+class IterJsonArrayTest(TestCase):
+    def test_parses_across_chunk_boundaries(self):
+        text = '[\n  {"token": "111"},\n  {"token": "222", "units": 12.5},\n  {"token": "333"}\n]'
+        rows = list(iter_json_array(io.StringIO(text), chunk_size=7))
+        self.assertEqual([r['token'] for r in rows], ['111', '222', '333'])
+        self.assertEqual(rows[1]['units'], 12.5)
+
+    def test_empty_array(self):
+        self.assertEqual(list(iter_json_array(io.StringIO('[]'))), [])
+
+
+class ImportTokensCommandTest(TestCase):
+    def _write(self, suffix, content):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_imports_json_in_batches_and_updates_metadata(self):
+        TokenPool.objects.create(token_code='A1')
+        path = self._write('.json', '[{"token": "A1", "amount": 10}, {"token": "B2"}, {"token": "C3", "kwh": 4.2}, {"nope": 1}]')
+        out = io.StringIO()
+        call_command('import_tokens', path=path, batch_size=2, stdout=out)
+        self.assertIn('Imported 2 tokens', out.getvalue())
+        self.assertEqual(TokenPool.objects.count(), 3)
+        self.assertEqual(TokenPool.objects.get(token_code='A1').amount, Decimal('10.00'))
+        self.assertEqual(TokenPool.objects.get(token_code='C3').units, Decimal('4.20'))
+
+    def test_imports_ndjson_and_csv(self):
+        ndjson = self._write('.ndjson', '{"token": "N1"}\n\n{"token_code": "N2", "price": "5"}\n')
+        csv_path = self._write('.csv', 'token,amount,units\nC1,10,42\nC2,,\n')
+        stats = import_token_file(ndjson)
+        self.assertEqual(stats['created'], 2)
+        stats = import_token_file(csv_path)
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(TokenPool.objects.get(token_code='N2').amount, Decimal('5.00'))
+        self.assertIsNone(TokenPool.objects.get(token_code='C2').units)
+
+
+class ImportManifestTest(TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+
+    def _write(self, codes):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('[' + ', '.join(f'{{"token": "{c}"}}' for c in codes) + ']')
+
+    def test_unchanged_file_is_skipped_and_grown_file_imports_tail(self):
+        self._write(['A', 'B'])
+        self.assertEqual(sync_token_file(self.path)['mode'], 'full')
+
+        stats = sync_token_file(self.path)
+        self.assertEqual(stats['mode'], 'unchanged')
+        self.assertEqual(stats['rows'], 0)
+
+        self._write(['A', 'B', 'C'])
+        stats = sync_token_file(self.path)
+        self.assertEqual(stats['mode'], 'delta')
+        self.assertEqual(stats['rows'], 1)
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(TokenImportManifest.objects.get().row_count, 3)
+
+    def test_rewritten_prefix_triggers_full_import(self):
+        self._write(['A', 'B'])
+        sync_token_file(self.path)
+        self._write(['X', 'B', 'C'])
+        stats = sync_token_file(self.path)
+        self.assertEqual(stats['mode'], 'full')
+        self.assertEqual(stats['rows'], 3)
+        self.assertEqual(TokenPool.objects.count(), 4)
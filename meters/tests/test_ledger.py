@@ -0,0 +1,64 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from usersAuth.models import User
+from meters import ledger
+from meters.models import Meter, MeterBalanceSnapshot, MeterLedger
+
+
+class MeterLedgerTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='ledger', email='ledger@example.com', password='pass')
+        self.meter = Meter.objects.create(user=self.user, meter_number='LED-1', address='Addr', current_balance=Decimal('3.00'))
+
+    def _balance(self):
+        return Meter.objects.get(pk=self.meter.pk).current_balance
+
+    def test_opening_balance_is_recorded(self):
+        entry = MeterLedger.objects.get(meter=self.meter)
+        self.assertEqual((entry.entry_type, entry.units), ('adjustment', Decimal('3.00')))
+        self.assertEqual(ledger.audit_balances(), [])
+
+    def test_credits_on_stale_instances_are_not_lost(self):
+        stale = Meter.objects.get(pk=self.meter.pk)
+        ledger.credit(self.meter.pk, Decimal('10.00'), ledger.PURCHASE, reference='T1')
+        ledger.credit(stale.pk, Decimal('5.50'), ledger.MANUAL_RECHARGE, reference='T2')
+        ledger.adjust(self.meter.pk, Decimal('-1.50'))
+        self.assertEqual(self._balance(), Decimal('17.00'))
+        self.assertIsNotNone(Meter.objects.get(pk=self.meter.pk).last_top_up)
+
+    def test_full_save_of_a_stale_instance_keeps_the_balance(self):
+        stale = Meter.objects.get(pk=self.meter.pk)
+        ledger.credit(self.meter.pk, Decimal('10.00'), ledger.PURCHASE, reference='T1')
+        stale.nickname = 'Renamed'
+        stale.save()
+        self.assertEqual(stale.current_balance, Decimal('13.00'))
+        self.assertEqual(self._balance(), Decimal('13.00'))
+        self.assertEqual(Meter.objects.get(pk=self.meter.pk).nickname, 'Renamed')
+        self.assertEqual(ledger.audit_balances(), [])
+
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        resp = client.patch(f'/api/meters/{self.meter.pk}/', {'nickname': 'Api', 'current_balance': '999.00'}, format='json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self._balance(), Decimal('13.00'))
+
+    def test_compaction_keeps_balance_and_folds_entries(self):
+        ledger.credit(self.meter.pk, Decimal('10.00'), ledger.PURCHASE)
+        MeterLedger.objects.update(created_at=timezone.now() - timedelta(days=40))
+        ledger.credit(self.meter.pk, Decimal('2.00'), ledger.PURCHASE)
+
+        self.assertEqual(ledger.compact_ledger(older_than=timedelta(days=30), chunk_size=1), 2)
+        snapshot = MeterBalanceSnapshot.objects.get(meter=self.meter)
+        self.assertEqual(snapshot.balance, Decimal('13.00'))
+        self.assertEqual(MeterLedger.objects.filter(meter=self.meter).count(), 1)
+        self.assertEqual(ledger.audit_balances(), [])
+
+    def test_rebuild_repairs_drifted_balances(self):
+        ledger.credit(self.meter.pk, Decimal('7.00'), ledger.AUTO_RECHARGE)
+        Meter.objects.filter(pk=self.meter.pk).update(current_balance=Decimal('999.00'))
+        self.assertEqual(ledger.audit_balances(), [(self.meter.pk, Decimal('999.00'), Decimal('10.00'))])
+        self.assertEqual(ledger.rebuild_balances(), 1)
+        self.assertEqual(self._balance(), Decimal('10.00'))
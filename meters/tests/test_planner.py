@@ -0,0 +1,56 @@
+import io
+import json
+from decimal import Decimal
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from usersAuth.models import User
+from meters.importers import import_token_rows
+from meters.models import AutoRechargeConfig, Meter, Token, TokenPool
+from meters.planner import plan_autorecharge
+from meters.sweep import sweep
+
+
+@override_settings(TOKEN_RESERVATION_BATCH_SIZE=0)
+class AutoRechargePlannerTest(TestCase):
+    def _meter(self, n, balance, enabled=True, amount='21.00'):
+        user = User.objects.create_user(username=f'plan{n}', email=f'plan{n}@example.com', password='pass')
+        AutoRechargeConfig.objects.create(
+            user=user, enabled=enabled, default_threshold=Decimal('10.00'),
+            default_amount=Decimal(amount) if amount else None,
+        )
+        return Meter.objects.create(user=user, meter_number=f'PL-{n}', address='A', current_balance=Decimal(balance))
+
+    def setUp(self):
+        for i in range(5):
+            self._meter(i, '1.00')
+        self._meter(5, '2.00', amount='42.00')
+        self._meter(6, '50.00')                 # above threshold
+        self._meter(7, '1.00', enabled=False)   # disabled
+        self._meter(8, '1.00', amount=None)     # no amount
+        import_token_rows([(f'PLANTOKEN{i}', Decimal('5.00'), Decimal('21.00')) for i in range(3)])
+        import_token_rows([('PLANOTHER1', Decimal('2.00'), Decimal('8.40'))])
+
+    def test_plan_matches_what_the_sweep_then_does(self):
+        with self.assertNumQueries(2):
+            result = plan_autorecharge()
+        self.assertEqual((result['meters'], result['due'], result['without_amount']), (9, 7, 1))
+        self.assertEqual(result['buckets'], [
+            {'units': '21.00', 'meters': 5, 'available': 3, 'exact': 3, 'shortfall': 2},
+            {'units': '42.00', 'meters': 1, 'available': 0, 'exact': 0, 'shortfall': 1},
+        ])
+        self.assertEqual((result['exact'], result['fallback'], result['synthetic']), (3, 1, 2))
+        self.assertEqual(result['units_requested'], '147.00')
+        self.assertEqual(len(result['warnings']), 4)
+        # the plan is a dry run
+        self.assertEqual(TokenPool.objects.filter(is_allocated=True).count(), 0)
+
+        sweep()
+        self.assertEqual(TokenPool.objects.filter(is_allocated=True).count(), result['exact'] + result['fallback'])
+        self.assertEqual(Token.objects.filter(token_code__startswith='AUTO-').count(), result['synthetic'])
+
+    def test_command_prints_json_plan_for_selected_users(self):
+        user_id = Meter.objects.get(meter_number='PL-5').user_id
+        out = io.StringIO()
+        call_command('plan_autorecharge', user_ids=[user_id], json=True, stdout=out)
+        result = json.loads(out.getvalue())
+        self.assertEqual((result['meters'], result['due'], result['fallback']), (1, 1, 1))
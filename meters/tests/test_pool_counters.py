@@ -0,0 +1,94 @@
+from decimal import Decimal
+from unittest import mock
+from django.test import TestCase
+from rest_framework.test import APIClient
+from usersAuth.models import User
+from meters.models import Meter, TokenPool
+from meters.allocator import claim_token
+from meters.counters import available_tokens, pool_availability, rebuild_counters, record_import
+from meters.importers import import_token_rows
+from transactions.models import Transaction
+
+
+class PoolCountersTest(TestCase):
+    def test_import_and_allocation_keep_counters_in_step(self):
+        import_token_rows([
+            ('P1', Decimal('10.00'), None),
+            ('P2', Decimal('10.00'), None),
+            ('P3', None, None),
+        ])
+        self.assertEqual(available_tokens(amount=Decimal('10.00')), 2)
+        self.assertEqual(pool_availability()['total_available'], 3)
+
+        claim_token(amount=Decimal('10.00'))
+        stats = pool_availability()
+        self.assertEqual(stats['total_available'], 2)
+        self.assertEqual(stats['total_allocated'], 1)
+        self.assertEqual(available_tokens(amount=Decimal('10.00')), 1)
+
+    def test_codes_lost_to_a_concurrent_import_are_not_counted(self):
+        bulk_create = TokenPool.objects.bulk_create
+
+        def racing_bulk_create(rows, **kwargs):
+            # another import commits RACE-1 between our existence check and our insert
+            TokenPool.objects.create(token_code='RACE-1', amount=Decimal('10.00'))
+            record_import([(Decimal('10.00'), None)])
+            return bulk_create(rows, **kwargs)
+
+        with mock.patch.object(TokenPool.objects, 'bulk_create', side_effect=racing_bulk_create):
+            stats = import_token_rows([('RACE-1', Decimal('10.00'), None), ('RACE-2', Decimal('10.00'), None)], use_copy=False)
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(available_tokens(amount=Decimal('10.00')), 2)
+        self.assertFalse(TokenPool.objects.filter(reserved_by__isnull=False).exists())
+
+    def test_admin_edits_adjust_counters(self):
+        from django.contrib.admin.sites import site
+        from meters.admin import TokenPoolAdmin
+
+        admin = TokenPoolAdmin(TokenPool, site)
+        token = TokenPool(token_code='ADM-T1', amount=Decimal('5.00'))
+        admin.save_model(None, token, None, False)
+        self.assertEqual(available_tokens(amount=Decimal('5.00')), 1)
+        token.is_allocated = True
+        admin.save_model(None, token, None, True)
+        self.assertEqual(pool_availability()['total_allocated'], 1)
+        self.assertEqual(available_tokens(), 0)
+        admin.delete_model(None, token)
+        self.assertEqual(pool_availability()['total_allocated'], 0)
+
+    def test_rebuild_matches_pool(self):
+        TokenPool.objects.create(token_code='X1', amount=Decimal('5.00'))
+        TokenPool.objects.create(token_code='X2', is_allocated=True)
+        rebuild_counters()
+        stats = pool_availability()
+        self.assertEqual(stats['total_available'], 1)
+        self.assertEqual(stats['total_allocated'], 1)
+
+
+class PurchaseAdmissionTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.meter = Meter.objects.create(user=self.user, meter_number='ADM-1', address='Addr')
+
+    def test_purchase_rejected_when_pool_is_empty(self):
+        resp = self.client.post(f'/api/meters/{self.meter.id}/purchase_electricity/', {'amount': '10.00'}, format='json')
+        self.assertEqual(resp.status_code, 409)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_admission_falls_back_to_the_pool_when_counters_are_stale(self):
+        # created outside the importer, so the counters never saw it
+        TokenPool.objects.create(token_code='RAW-1', amount=Decimal('10.00'))
+        self.assertEqual(available_tokens(), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(f'/api/meters/{self.meter.id}/purchase_electricity/', {'amount': '10.00'}, format='json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(Transaction.objects.get().status, 'completed')
+
+    def test_availability_endpoint(self):
+        import_token_rows([('A1', Decimal('10.00'), None)])
+        resp = self.client.get('/api/meters/token-pool/availability/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data['total_available'], 1)
+        self.assertEqual(len(resp.data['buckets']), 1)
@@ -0,0 +1,52 @@
+from decimal import Decimal
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from usersAuth.models import User
+from meters.models import Meter, Token, TokenPool, TokenPurchase
+from meters.importers import import_token_rows
+from meters.payments import DECLINED, BasePaymentProvider
+from meters.purchases import complete_purchase
+from transactions.models import Transaction
+
+
+class DecliningProvider(BasePaymentProvider):
+    def confirm(self, transaction):
+        return DECLINED, 'card declined'
+
+
+@override_settings(TOKEN_RESERVATION_BATCH_SIZE=0)
+class PurchaseFlowTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='purchaser', email='purchaser@example.com', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.meter = Meter.objects.create(user=self.user, meter_number='PUR-1', address='Addr', current_balance=Decimal('1.00'))
+        import_token_rows([('PUR-TOKEN-1', Decimal('10.00'), Decimal('40.00')), ('PUR-TOKEN-2', None, None)])
+
+    def _purchase(self, amount='10.00'):
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(f'/api/meters/{self.meter.id}/purchase_electricity/', {'amount': amount}, format='json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data['status'], 'pending')
+        return Transaction.objects.get(transaction_id=resp.data['transaction_id'])
+
+    def test_purchase_is_confirmed_and_allocated_by_the_task(self):
+        txn = self._purchase()
+        self.assertEqual(txn.status, 'completed')
+        self.assertEqual(txn.token_code, 'PUR-TOKEN-1')
+        self.assertEqual(txn.units, Decimal('40.00'))
+        self.assertTrue(Token.objects.filter(meter=self.meter, token_code='PUR-TOKEN-1').exists())
+        self.assertEqual(Meter.objects.get(pk=self.meter.pk).current_balance, Decimal('41.00'))
+
+    def test_completion_is_idempotent(self):
+        txn = self._purchase()
+        result = complete_purchase(txn.transaction_id)
+        self.assertEqual(result, {'status': 'completed', 'token_code': 'PUR-TOKEN-1'})
+        self.assertEqual(TokenPurchase.objects.filter(token_code='PUR-TOKEN-1').count(), 1)
+        self.assertFalse(TokenPool.objects.get(token_code='PUR-TOKEN-2').is_allocated)
+
+    @override_settings(PAYMENT_PROVIDER='meters.tests.test_purchase.DecliningProvider')
+    def test_declined_payment_fails_without_allocating(self):
+        txn = self._purchase()
+        self.assertEqual(txn.status, 'failed')
+        self.assertFalse(TokenPool.objects.filter(is_allocated=True).exists())
@@ -0,0 +1,94 @@
+import io
+import os
+import tempfile
+from decimal import Decimal
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from usersAuth.models import User
+from meters import ledger
+from meters.models import AutoRechargeConfig, Meter, MeterLedger
+from meters.readings import ingest_readings
+
+
+class MeterReadingIngestionTest(TestCase):
+    url = '/api/meters/readings/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', email='reader@example.com', password='pass')
+        self.meter = Meter.objects.create(user=self.user, meter_number='RD-1', address='A', current_balance=Decimal('50.00'))
+        self.other = Meter.objects.create(user=self.user, meter_number='RD-2', address='B', current_balance=Decimal('30.00'))
+        self.staff = User.objects.create_user(username='feed', email='feed-staff@example.com', password='pass', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.staff)
+
+    def _post(self, body, content_type='application/x-ndjson'):
+        return self.client.generic('POST', self.url, body, content_type=content_type)
+
+    def test_ndjson_batch_decrements_balances_once(self):
+        body = '\n'.join([
+            '{"meter_number": "RD-1", "read_at": "2026-01-01T00:15:00Z", "units": "1.50"}',
+            '{"meter_number": "RD-1", "read_at": "2026-01-01T00:30:00Z", "units": "2.00"}',
+            '{"meter_number": "RD-2", "read_at": "2026-01-01T00:30:00Z", "units": "4"}',
+            '{"meter_number": "RD-1", "read_at": "2026-01-01T00:30:00Z", "units": "2.00"}',
+            '{"meter_number": "NOPE", "read_at": "2026-01-01T00:30:00Z", "units": "1"}',
+            '{"meter_number": "RD-2", "read_at": "yesterday", "units": "1"}',
+            'not json',
+        ])
+        r = self._post(body)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual((r.data['rows'], r.data['applied'], r.data['rejected'], r.data['meters']), (7, 3, 4, 2))
+        self.assertEqual([e['row'] for e in r.data['errors']], [6, 7, 4, 5])
+
+        meter = Meter.objects.get(pk=self.meter.pk)
+        self.assertEqual(meter.current_balance, Decimal('46.50'))
+        self.assertEqual(meter.last_reading_at.isoformat(), '2026-01-01T00:30:00+00:00')
+        self.assertIsNone(meter.last_top_up)
+        self.assertEqual(Meter.objects.get(pk=self.other.pk).current_balance, Decimal('26.00'))
+        self.assertEqual(MeterLedger.objects.filter(entry_type=ledger.CONSUMPTION).count(), 2)
+        self.assertEqual(ledger.audit_balances([self.meter.pk, self.other.pk]), [])
+
+        # re-sending the same readings is a no-op
+        again = self._post(body)
+        self.assertEqual((again.data['applied'], again.data['stale']), (0, 3))
+        self.assertEqual(Meter.objects.get(pk=self.meter.pk).current_balance, Decimal('46.50'))
+
+    def test_csv_file_via_command_in_batches(self):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w') as fp:
+            fp.write('meter_number,read_at,units\n')
+            for minute in range(10):
+                fp.write(f'RD-2,2026-01-01T01:{minute:02d}:00Z,0.5\n')
+        try:
+            call_command('ingest_readings', path, batch_size=3, verbosity=0, stdout=io.StringIO())
+        finally:
+            os.remove(path)
+        self.assertEqual(Meter.objects.get(pk=self.other.pk).current_balance, Decimal('25.00'))
+        self.assertEqual(MeterLedger.objects.filter(meter=self.other, entry_type=ledger.CONSUMPTION).count(), 4)
+
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=False)
+    def test_crossing_threshold_queues_autorecharge(self):
+        AutoRechargeConfig.objects.create(user=self.user, enabled=True, default_threshold=Decimal('40.00'), default_amount=Decimal('20.00'))
+        rows = [{'meter_number': 'RD-1', 'read_at': '2026-01-01T00:15:00Z', 'units': '15'}]
+        with mock.patch('meters.tasks.autorecharge_meter_task.apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                ingest_readings(rows)
+        apply_async.assert_called_once_with((self.meter.pk,), countdown=60)
+
+    def test_non_staff_is_rejected(self):
+        self.client.force_authenticate(user=self.user)
+        r = self._post('{"meter_number": "RD-1", "read_at": "2026-01-01T00:15:00Z", "units": "1"}')
+        self.assertEqual(r.status_code, 403)
+        self.assertEqual(Meter.objects.get(pk=self.meter.pk).current_balance, Decimal('50.00'))
+
+    def test_clients_cannot_set_last_reading_at(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        r = client.post('/api/meters/', {'meter_number': 'RD-3', 'address': 'C', 'last_reading_at': '2099-01-01T00:00:00Z'}, format='json')
+        self.assertEqual(r.status_code, 201)
+        self.assertIsNone(Meter.objects.get(meter_number='RD-3').last_reading_at)
+        client.patch(f'/api/meters/{self.meter.pk}/', {'last_reading_at': '2099-01-01T00:00:00Z'}, format='json')
+        self.assertIsNone(Meter.objects.get(pk=self.meter.pk).last_reading_at)
@@ -0,0 +1,48 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.test import TestCase
+from django.utils import timezone
+from meters.models import TokenPool
+from meters.allocator import claim_token
+from meters.reservations import TokenReservationBuffer, release_expired_reservations
+
+
+class TokenReservationBufferTest(TestCase):
+    def setUp(self):
+        for i in range(3):
+            TokenPool.objects.create(token_code=f'R-{i}', amount=Decimal('10.00'))
+        self.buffer = TokenReservationBuffer(batch_size=2, lease_seconds=60, worker_id='worker-a')
+
+    def test_take_reserves_a_batch_and_allocates_from_it(self):
+        token = self.buffer.take(amount=Decimal('10.00'), transaction_id='txn-1')
+        self.assertEqual(token.token_code, 'R-0')
+        row = TokenPool.objects.get(token_code='R-0')
+        self.assertTrue(row.is_allocated)
+        self.assertIsNone(row.reserved_by)
+        # the second token of the batch stays leased to this worker and is not claimable
+        leased = TokenPool.objects.get(token_code='R-1')
+        self.assertEqual(leased.reserved_by, 'worker-a')
+        self.assertFalse(leased.is_allocated)
+        self.assertEqual(claim_token(amount=Decimal('10.00')).token_code, 'R-2')
+        self.assertEqual(self.buffer.take(amount=Decimal('10.00')).token_code, 'R-1')
+
+    def test_empty_denomination_returns_none(self):
+        self.assertIsNone(self.buffer.take(amount=Decimal('99.00')))
+
+    def test_expired_leases_are_reaped_and_not_allocated(self):
+        self.buffer.take(amount=Decimal('10.00'))
+        TokenPool.objects.filter(token_code='R-1').update(reserved_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(release_expired_reservations(), 1)
+        row = TokenPool.objects.get(token_code='R-1')
+        self.assertIsNone(row.reserved_by)
+        self.assertEqual(claim_token(token_code='R-1').token_code, 'R-1')
+
+    def test_claim_by_code_takes_a_leased_token(self):
+        self.buffer.take(amount=Decimal('10.00'))
+        token = claim_token(token_code='R-1', user_id=None)
+        self.assertEqual(token.token_code, 'R-1')
+        row = TokenPool.objects.get(token_code='R-1')
+        self.assertTrue(row.is_allocated)
+        self.assertIsNone(row.reserved_until)
+        # the buffer skips the entry it lost and refills with the next token
+        self.assertEqual(self.buffer.take(amount=Decimal('10.00')).token_code, 'R-2')
@@ -0,0 +1,100 @@
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from usersAuth.models import User
+from meters.models import AutoRechargeConfig, AutoRechargeEvent, Meter
+from meters.scheduling import in_window, next_window_open, run_due, user_zone
+
+UTC = dt_timezone.utc
+
+
+class WindowMathTest(TestCase):
+    def test_windows_wrap_past_midnight(self):
+        self.assertTrue(in_window(time(23, 30), time(22, 0), time(2, 0)))
+        self.assertTrue(in_window(time(1, 0), time(22, 0), time(2, 0)))
+        self.assertFalse(in_window(time(12, 0), time(22, 0), time(2, 0)))
+        self.assertTrue(in_window(time(12, 0), None, None))
+
+    def test_next_opening_is_computed_in_the_users_timezone(self):
+        harare = user_zone('Africa/Harare')  # UTC+2
+        now = datetime(2026, 1, 1, 5, 0, tzinfo=UTC)  # 07:00 local
+        self.assertEqual(next_window_open(time(8, 0), time(10, 0), harare, now), datetime(2026, 1, 1, 6, 0, tzinfo=UTC))
+        later = datetime(2026, 1, 1, 9, 0, tzinfo=UTC)  # 11:00 local: window already closed today
+        self.assertEqual(next_window_open(time(8, 0), time(10, 0), harare, later), datetime(2026, 1, 2, 6, 0, tzinfo=UTC))
+        self.assertEqual(user_zone('Not/AZone'), user_zone('UTC'))
+
+
+@override_settings(TOKEN_RESERVATION_BATCH_SIZE=0, AUTORECHARGE_SCHEDULE_INTERVAL_SECONDS=3600)
+class SchedulerTickTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = datetime(2026, 1, 1, 7, 0, tzinfo=UTC)  # 09:00 in Harare
+
+    def _config(self, n, start, end, tz='Africa/Harare'):
+        user = User.objects.create_user(username=f'sched{n}', email=f'sched{n}@example.com', password='pass', timezone=tz)
+        Meter.objects.create(user=user, meter_number=f'SC-{n}', address='A', current_balance=Decimal('1.00'))
+        cfg = AutoRechargeConfig.objects.create(user=user, enabled=True, default_threshold=Decimal('10.00'), default_amount=Decimal('20.00'),
+                                                time_window_start=start, time_window_end=end)
+        return cfg
+
+    def test_tick_runs_only_due_users_inside_their_window(self):
+        open_cfg = self._config(1, time(8, 0), time(10, 0))
+        closed_cfg = self._config(2, time(20, 0), time(22, 0))
+        not_due = self._config(3, None, None)
+        AutoRechargeConfig.objects.filter(pk__in=[open_cfg.pk, closed_cfg.pk]).update(next_run_at=self.now - timedelta(minutes=1))
+        AutoRechargeConfig.objects.filter(pk=not_due.pk).update(next_run_at=self.now + timedelta(minutes=5))
+
+        summary = run_due(now=self.now)
+
+        self.assertEqual((summary['executed'], summary['scheduled'], summary['outside_window']), (1, 2, 1))
+        self.assertEqual(list(AutoRechargeEvent.objects.values_list('user_id', flat=True)), [open_cfg.user_id])
+        open_cfg.refresh_from_db()
+        closed_cfg.refresh_from_db()
+        self.assertEqual(open_cfg.next_run_at, next_window_open(time(8, 0), time(10, 0), user_zone('Africa/Harare'), self.now + timedelta(hours=1)))
+        self.assertEqual(closed_cfg.next_run_at, datetime(2026, 1, 1, 18, 0, tzinfo=UTC))
+        # nothing is due anymore
+        self.assertEqual(run_due(now=self.now)['scheduled'], 0)
+
+    def test_saving_a_config_schedules_it(self):
+        cfg = self._config(1, None, None)
+        self.assertIsNotNone(cfg.next_run_at)
+        cfg.enabled = False
+        cfg.save(update_fields=['enabled'])
+        cfg.refresh_from_db()
+        self.assertIsNone(cfg.next_run_at)
+
+    def test_unrelated_saves_keep_next_run_at(self):
+        cfg = self._config(1, time(8, 0), time(10, 0))
+        AutoRechargeConfig.objects.filter(pk=cfg.pk).update(next_run_at=self.now)
+        cfg = AutoRechargeConfig.objects.get(pk=cfg.pk)
+        cfg.default_amount = Decimal('30.00')
+        cfg.save()
+        cfg.save(update_fields=['default_threshold'])
+        self.assertEqual(AutoRechargeConfig.objects.get(pk=cfg.pk).next_run_at, self.now)
+
+        cfg.time_window_start = time(9, 0)
+        cfg.save(update_fields=['time_window_start'])
+        self.assertNotEqual(AutoRechargeConfig.objects.get(pk=cfg.pk).next_run_at, self.now)
+
+    def test_timezone_change_reschedules(self):
+        cfg = self._config(1, time(8, 0), time(10, 0))
+        AutoRechargeConfig.objects.filter(pk=cfg.pk).update(next_run_at=self.now)
+        user = User.objects.get(pk=cfg.user_id)
+        user.first_name = 'Unrelated'
+        user.save()
+        self.assertEqual(AutoRechargeConfig.objects.get(pk=cfg.pk).next_run_at, self.now)
+        user.timezone = 'America/New_York'
+        user.save()
+        self.assertNotEqual(AutoRechargeConfig.objects.get(pk=cfg.pk).next_run_at, self.now)
+
+    def test_fleet_sweeps_skip_users_outside_their_window(self):
+        from django.utils import timezone
+        from meters.sweep import run_shard
+
+        now = timezone.now().astimezone(UTC)
+        inside = self._config(1, (now - timedelta(hours=1)).time(), (now + timedelta(hours=1)).time(), tz='UTC')
+        self._config(2, (now + timedelta(hours=3)).time(), (now + timedelta(hours=4)).time(), tz='UTC')
+        summary = run_shard('window-run', 0, 1)
+        self.assertEqual(summary['executed'], 1)
+        self.assertEqual(list(AutoRechargeEvent.objects.values_list('user_id', flat=True)), [inside.user_id])
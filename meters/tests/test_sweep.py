@@ -0,0 +1,108 @@
+from decimal import Decimal
+from unittest import skipUnless
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from usersAuth.models import User
+from meters.importers import import_token_rows
+from meters.locks import autorecharge_users_lock
+from meters.models import AutoRechargeConfig, AutoRechargeEvent, AutoRechargeSweepCheckpoint, Meter, Token, TokenPool
+from meters.sweep import eligible_meters, run_shard, run_sharded_sweep, sweep
+from notifications.models import Notification
+
+
+@override_settings(TOKEN_RESERVATION_BATCH_SIZE=0)
+class AutoRechargeSweepTest(TestCase):
+    def _user(self, n, enabled=True, threshold='10.00', amount='21.00'):
+        user = User.objects.create_user(username=f'sweep{n}', email=f'sweep{n}@example.com', password='pass')
+        AutoRechargeConfig.objects.create(
+            user=user, enabled=enabled,
+            default_threshold=Decimal(threshold) if threshold else None,
+            default_amount=Decimal(amount) if amount else None,
+        )
+        return user
+
+    def test_selects_meters_below_effective_threshold(self):
+        low = Meter.objects.create(user=self._user(1), meter_number='SW-1', address='A', current_balance=Decimal('2.00'))
+        Meter.objects.create(user=self._user(2), meter_number='SW-2', address='A', current_balance=Decimal('50.00'))
+        Meter.objects.create(user=self._user(3, enabled=False), meter_number='SW-3', address='A', current_balance=Decimal('1.00'))
+        # no config threshold: falls back to the meter's own threshold
+        own = Meter.objects.create(user=self._user(4, threshold=None), meter_number='SW-4', address='A',
+                                   current_balance=Decimal('3.00'), auto_recharge_threshold=Decimal('4.00'))
+        self.assertEqual(list(eligible_meters().values_list('pk', flat=True)), [low.pk, own.pk])
+
+    def test_sweep_writes_in_bulk_per_chunk(self):
+        import_token_rows([(f'SWEEPTOKEN{i}', Decimal('5.00'), Decimal('21.00')) for i in range(3)])
+        meters = [
+            Meter.objects.create(user=self._user(i), meter_number=f'SW-{i}', address='A', current_balance=Decimal('1.00'))
+            for i in range(5)
+        ]
+        summary = sweep(chunk_size=10)
+
+        self.assertEqual(summary, {'triggered': 5, 'executed': 5, 'failed': 0})
+        self.assertEqual(TokenPool.objects.filter(is_allocated=True).count(), 3)
+        self.assertEqual(Token.objects.filter(token_code__startswith='AUTO-').count(), 2)
+        self.assertEqual(AutoRechargeEvent.objects.filter(status='completed').count(), 5)
+        self.assertEqual(Notification.objects.filter(notification_type='payment').count(), 5)
+        for m in meters:
+            self.assertEqual(Meter.objects.get(pk=m.pk).current_balance, Decimal('22.00'))
+        # balances are now above threshold, so a second sweep finds nothing
+        self.assertEqual(sweep()['triggered'], 0)
+
+    def test_query_count_does_not_grow_with_meters(self):
+        for i in range(20):
+            Meter.objects.create(user=self._user(i), meter_number=f'SWQ-{i}', address='A', current_balance=Decimal('1.00'))
+        with self.assertNumQueries(15):
+            summary = sweep(chunk_size=100)
+        self.assertEqual(summary['executed'], 20)
+
+    def test_per_user_locks_cost_the_same_for_any_chunk_size(self):
+        def queries(first, count):
+            for i in range(first, first + count):
+                Meter.objects.create(user=self._user(i), meter_number=f'SWL-{i}', address='A', current_balance=Decimal('1.00'))
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(sweep(chunk_size=100)['executed'], count)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(queries(0, 2), queries(100, 30))
+
+    @skipUnless(connection.vendor == 'postgresql', 'advisory locks are PostgreSQL only')
+    def test_advisory_locks_are_taken_per_chunk(self):
+        with self.assertNumQueries(2):
+            with autorecharge_users_lock(range(1, 500)) as acquired:
+                self.assertEqual(acquired, set(range(1, 500)))
+
+    def test_missing_amount_fails_event(self):
+        meter = Meter.objects.create(user=self._user(1, amount=None), meter_number='SW-X', address='A', current_balance=Decimal('1.00'))
+        self.assertEqual(sweep(), {'triggered': 1, 'executed': 0, 'failed': 1})
+        self.assertEqual(AutoRechargeEvent.objects.get(meter=meter).message, 'No amount configured')
+
+
+@override_settings(TOKEN_RESERVATION_BATCH_SIZE=0)
+class ShardedSweepTest(TestCase):
+    def setUp(self):
+        for i in range(6):
+            user = User.objects.create_user(username=f'shard{i}', email=f'shard{i}@example.com', password='pass')
+            AutoRechargeConfig.objects.create(user=user, enabled=True, default_threshold=Decimal('10.00'), default_amount=Decimal('20.00'))
+            Meter.objects.create(user=user, meter_number=f'SH-{i}', address='A', current_balance=Decimal('1.00'))
+
+    def test_shards_partition_meters(self):
+        shard_sets = [set(eligible_meters(shard=s, shards=3).values_list('pk', flat=True)) for s in range(3)]
+        self.assertEqual(sum(len(s) for s in shard_sets), 6)
+        self.assertEqual(set.union(*shard_sets), set(eligible_meters().values_list('pk', flat=True)))
+
+    def test_chord_aggregates_shard_summaries(self):
+        run_id, result = run_sharded_sweep(3)
+        self.assertEqual(result.get(), {'run_id': run_id, 'shards': 3, 'triggered': 6, 'executed': 6, 'failed': 0})
+        self.assertEqual(AutoRechargeSweepCheckpoint.objects.filter(run_id=run_id, status='completed').count(), 3)
+
+    def test_resumed_shard_skips_committed_meters(self):
+        pks = list(eligible_meters(shard=0, shards=2).values_list('pk', flat=True))
+        # simulate a crash after the first chunk of shard 0 was committed
+        checkpoint = AutoRechargeSweepCheckpoint.objects.create(run_id='crashed', shard=0, shards=2, last_meter_id=pks[0], triggered=1, executed=1)
+        summary = run_shard('crashed', 0, 2)
+        self.assertEqual(summary['triggered'], len(pks))
+        self.assertFalse(AutoRechargeEvent.objects.filter(meter_id=pks[0]).exists())
+        self.assertEqual(AutoRechargeEvent.objects.filter(meter_id__in=pks[1:]).count(), len(pks) - 1)
+        checkpoint.refresh_from_db()
+        self.assertEqual((checkpoint.status, checkpoint.last_meter_id), ('completed', pks[-1]))
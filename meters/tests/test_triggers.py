@@ -0,0 +1,46 @@
+from decimal import Decimal
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from usersAuth.models import User
+from meters import ledger
+from meters.models import AutoRechargeConfig, AutoRechargeEvent, Meter, MeterLedger
+
+
+@override_settings(TOKEN_RESERVATION_BATCH_SIZE=0)
+class ThresholdCrossingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='crossing', email='crossing@example.com', password='pass')
+        AutoRechargeConfig.objects.create(user=self.user, enabled=True, default_threshold=Decimal('10.00'), default_amount=Decimal('20.00'))
+        self.meter = Meter.objects.create(user=self.user, meter_number='CR-1', address='A', current_balance=Decimal('15.00'))
+
+    def test_crossing_below_threshold_recharges_meter(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ledger.debit(self.meter.pk, Decimal('8.00'))
+        self.assertEqual(AutoRechargeEvent.objects.get(meter=self.meter).status, 'completed')
+        self.assertEqual(Meter.objects.get(pk=self.meter.pk).current_balance, Decimal('27.00'))
+
+    def test_eager_mode_recharges_a_batch_with_one_sweep(self):
+        other = Meter.objects.create(user=self.user, meter_number='CR-2', address='B', current_balance=Decimal('12.00'))
+        entries = [
+            MeterLedger(meter_id=self.meter.pk, entry_type=ledger.ADJUSTMENT, units=Decimal('-8.00')),
+            MeterLedger(meter_id=other.pk, entry_type=ledger.ADJUSTMENT, units=Decimal('-5.00')),
+        ]
+        with mock.patch('meters.sweep.sweep', return_value={}) as sweep:
+            with self.captureOnCommitCallbacks(execute=True):
+                ledger.post_entries(entries)
+        sweep.assert_called_once_with(meter_ids=[self.meter.pk, other.pk], respect_window=True)
+
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=False)
+    def test_only_crossings_queue_and_jobs_are_debounced(self):
+        with mock.patch('meters.tasks.autorecharge_meter_task.apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                ledger.debit(self.meter.pk, Decimal('2.00'))   # 13: still above
+            self.assertFalse(apply_async.called)
+            with self.captureOnCommitCallbacks(execute=True):
+                ledger.debit(self.meter.pk, Decimal('4.00'))   # 9: crossed
+            with self.captureOnCommitCallbacks(execute=True):
+                ledger.adjust(self.meter.pk, Decimal('5.00'))  # back to 14
+                ledger.debit(self.meter.pk, Decimal('6.00'))   # 8: crossed again within the window
+            apply_async.assert_called_once_with((self.meter.pk,), countdown=60)
@@ -0,0 +1,84 @@
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from usersAuth.models import User
+from meters.models import ManualRecharge, Meter, TokenPurchase
+from meters.usage import meter_usage, periods_between
+
+
+class MeterUsageTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='usage', email='usage@example.com', password='pass')
+        self.meter = Meter.objects.create(user=self.user, meter_number='USE-1', address='A')
+        self.other = Meter.objects.create(user=self.user, meter_number='USE-2', address='B')
+        self.today = timezone.localdate()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _at(self, day, hour=12):
+        return timezone.make_aware(datetime.combine(day, time(hour)))
+
+    def _purchase(self, day, amount='10.00', units='42.00', meter=None):
+        p = TokenPurchase.objects.create(token_code=f'USE{TokenPurchase.objects.count()}', meter=meter or self.meter, user=self.user,
+                                         amount=Decimal(amount), units=Decimal(units))
+        TokenPurchase.objects.filter(pk=p.pk).update(purchased_at=self._at(day))
+
+    def _recharge(self, day, units='5.00', status='success'):
+        ManualRecharge.objects.create(token_code='1234567890', meter=self.meter, user=self.user, units=Decimal(units), status=status,
+                                      applied_at=self._at(day))
+
+    def test_periods_align_to_bucket_start(self):
+        self.assertEqual(periods_between(date(2026, 1, 14), date(2026, 1, 20), 'week'), [date(2026, 1, 12), date(2026, 1, 19)])
+        self.assertEqual(periods_between(date(2025, 12, 5), date(2026, 2, 1), 'month'),
+                         [date(2025, 12, 1), date(2026, 1, 1), date(2026, 2, 1)])
+
+    def test_daily_and_monthly_buckets(self):
+        yesterday = self.today - timedelta(days=1)
+        self._purchase(yesterday)
+        self._purchase(yesterday, amount='5.00', units='21.00')
+        self._purchase(self.today)
+        self._purchase(self.today, meter=self.other)
+        self._recharge(self.today)
+        self._recharge(self.today, status='failed')
+
+        data = self.client.get(f'/api/meters/{self.meter.pk}/usage/', {'from': str(yesterday), 'to': str(self.today)}).json()
+        self.assertEqual([r['period'] for r in data['results']], [str(yesterday), str(self.today)])
+        first, last = data['results']
+        self.assertEqual((first['purchases'], first['amount'], first['units']), (2, 15.0, 63.0))
+        self.assertEqual((last['purchases'], last['recharges'], last['recharged_units'], last['units']), (1, 1, 5.0, 47.0))
+
+        months = self.client.get(f'/api/meters/{self.meter.pk}/usage/', {'bucket': 'month'}).json()['results']
+        self.assertEqual(len(months), 12)
+        self.assertEqual(months[-1]['period'], str(self.today.replace(day=1)))
+        self.assertEqual(sum(m['purchases'] for m in months), 3)
+
+    def test_closed_periods_are_served_from_cache(self):
+        start = self.today - timedelta(days=6)
+        self._purchase(start)
+        self._purchase(self.today)
+        meter_usage(self.meter.pk, 'day', start, self.today)
+
+        # backdated rows don't show up in cached closed days; today is always recomputed
+        self._purchase(start)
+        self._purchase(self.today)
+        with self.assertNumQueries(2):
+            rows = meter_usage(self.meter.pk, 'day', start, self.today)
+        self.assertEqual([r['purchases'] for r in rows], [1, 0, 0, 0, 0, 0, 2])
+
+        cache.clear()
+        self.assertEqual(meter_usage(self.meter.pk, 'day', start, self.today)[0]['purchases'], 2)
+
+    def test_validation_and_ownership(self):
+        url = f'/api/meters/{self.meter.pk}/usage/'
+        self.assertEqual(self.client.get(url, {'bucket': 'year'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'from': '2026-02-30'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'from': str(self.today), 'to': str(self.today - timedelta(days=1))}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'from': '2000-01-01'}).status_code, 400)
+
+        stranger = User.objects.create_user(username='usage2', email='usage2@example.com', password='pass')
+        self.client.force_authenticate(user=stranger)
+        self.assertEqual(self.client.get(url).status_code, 404)
@@ -0,0 +1,82 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from usersAuth.models import User
+from meters.models import ManualRecharge, Meter, Token, TokenPool
+from meters.importers import import_token_rows
+from meters.verification import verify_pending_recharges
+
+
+class RechargeVerificationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='verifier', email='verifier@example.com', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.meter = Meter.objects.create(user=self.user, meter_number='VER-1', address='Addr', current_balance=Decimal('2.00'))
+
+    def _recharge(self, token):
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(f'/api/meters/{self.meter.id}/recharge_token/', {'token': token}, format='json')
+        return resp
+
+    def test_unknown_token_stays_pending_until_it_reaches_the_pool(self):
+        resp = self._recharge('LATE-TOKEN-1')
+        self.assertEqual(resp.status_code, 202)
+        mr = ManualRecharge.objects.get(pk=resp.data['id'])
+        self.assertEqual(mr.status, 'pending')
+
+        import_token_rows([('LATETOKEN1', Decimal('5.00'), Decimal('21.00'))])
+        summary = verify_pending_recharges()
+        self.assertEqual(summary['success'], 1)
+
+        mr.refresh_from_db()
+        self.assertEqual(mr.status, 'success')
+        self.assertEqual(mr.units, Decimal('21.00'))
+        self.assertTrue(TokenPool.objects.get(token_code='LATETOKEN1').is_allocated)
+        self.assertTrue(Token.objects.filter(meter=self.meter, token_code='LATETOKEN1').exists())
+        self.assertEqual(Meter.objects.get(pk=self.meter.pk).current_balance, Decimal('23.00'))
+
+    def test_batch_resolves_rejects_and_expires(self):
+        other = Meter.objects.create(user=self.user, meter_number='VER-2', address='Addr')
+        Token.objects.create(meter=other, token_code='USEDELSEWHERE', amount=Decimal('1.00'), units=Decimal('4.00'))
+        used = ManualRecharge.objects.create(token_code='USEDELSEWHERE', meter=self.meter, user=self.user)
+        stale = ManualRecharge.objects.create(token_code='NEVERSEEN', meter=self.meter, user=self.user)
+        fresh = ManualRecharge.objects.create(token_code='NOTYET', meter=self.meter, user=self.user)
+        ManualRecharge.objects.filter(pk=stale.pk).update(created_at=timezone.now() - timedelta(minutes=5))
+
+        with self.assertNumQueries(6):
+            # pending rows, Token lookup, TokenPool lookup, savepoint pair, one bulk update
+            summary = verify_pending_recharges(timeout_seconds=60)
+
+        self.assertEqual(summary, {'checked': 3, 'success': 0, 'rejected': 1, 'failed': 1, 'pending': 1})
+        self.assertEqual(ManualRecharge.objects.get(pk=used.pk).status, 'rejected')
+        self.assertEqual(ManualRecharge.objects.get(pk=stale.pk).status, 'failed')
+        self.assertEqual(ManualRecharge.objects.get(pk=fresh.pk).status, 'pending')
+
+    def test_pooled_token_without_a_meter_fails(self):
+        import_token_rows([('ORPHANTOKEN', Decimal('5.00'), Decimal('21.00'))])
+        orphan = ManualRecharge.objects.create(token_code='ORPHANTOKEN', meter=None, user=self.user)
+        self.assertEqual(verify_pending_recharges()['failed'], 1)
+        self.assertEqual(ManualRecharge.objects.get(pk=orphan.pk).status, 'failed')
+        self.assertFalse(TokenPool.objects.get(token_code='ORPHANTOKEN').is_allocated)
+
+    def test_status_polls_retry_and_expire_without_beat(self):
+        from django.core.cache import cache
+
+        resp = self._recharge('POLL-TOKEN-1')
+        mr_id = resp.data['id']
+        cache.clear()
+        import_token_rows([('POLLTOKEN1', Decimal('5.00'), Decimal('21.00'))])
+        self.assertEqual(self.client.get(f'/api/recharges/{mr_id}/').data['status'], 'success')
+
+        mr_id = self._recharge('POLL-TOKEN-2').data['id']
+        other = User.objects.create_user(username='bystander', email='bystander@example.com', password='pass')
+        theirs = ManualRecharge.objects.create(token_code='THEIRTOKEN', user=other)
+        ManualRecharge.objects.filter(pk__in=[mr_id, theirs.pk]).update(created_at=timezone.now() - timedelta(hours=1))
+        cache.clear()
+        statuses = {r['id']: r['status'] for r in self.client.get('/api/recharges/').data['results']}
+        self.assertEqual(statuses[mr_id], 'failed')
+        # a poll only verifies the caller's own rows; the fleet batch is left to run_periodic_tasks
+        self.assertEqual(ManualRecharge.objects.get(pk=theirs.pk).status, 'pending')
@@ -0,0 +1,58 @@
+"""Event-driven auto-recharge.
+
+Whenever the ledger lowers a meter's balance, `queue_threshold_crossings`
+checks (with one query) which of those meters just went from at/above their
+effective threshold to below it and queues a debounced per-meter recharge,
+so auto-recharge work follows the meters that need it instead of rescanning
+the fleet. The scheduled sweep remains as a safety net. Without a broker
+(CELERY_TASK_ALWAYS_EAGER) the countdown would be ignored and every crossing
+would run its own sweep inside the commit, so the meters that crossed in one
+transaction are recharged together by a single sweep instead. The debounce key
+lives in the default cache, which must be shared between processes (see
+CACHES in settings).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+
+
+def _debounce_key(meter_id):
+    return f'meters:autorecharge-queued:{meter_id}'
+
+
+def crossed_threshold(decreases):
+    """Return ids of meters in {meter_id: negative delta} that crossed below their threshold.
+
+    Must run after the balance UPDATE, in the same transaction. Only meters
+    eligible for auto-recharge (enabled config) are considered.
+    """
+    from .sweep import eligible_meters
+
+    rows = eligible_meters(meter_ids=list(decreases)).values_list('pk', 'current_balance', 'threshold')
+    return [pk for pk, balance, threshold in rows if balance - decreases[pk] >= threshold]
+
+
+def schedule_meter_autorecharge(meter_id):
+    """Queue one recharge job for the meter unless one is already pending within the debounce window."""
+    from .tasks import autorecharge_meter_task
+
+    delay = getattr(settings, 'AUTORECHARGE_DEBOUNCE_SECONDS', 60)
+    if cache.add(_debounce_key(meter_id), 1, timeout=delay):
+        autorecharge_meter_task.apply_async((meter_id,), countdown=delay)
+
+
+def recharge_crossed(meter_ids):
+    """Recharge meters that crossed their threshold with one sweep; the eager-mode stand-in for the per-meter tasks."""
+    from .sweep import sweep
+    return sweep(meter_ids=meter_ids, respect_window=True)
+
+
+def queue_threshold_crossings(decreases):
+    crossed = crossed_threshold(decreases)
+    if not crossed:
+        return
+    if getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
+        db_transaction.on_commit(lambda: recharge_crossed(crossed))
+        return
+    for meter_id in crossed:
+        db_transaction.on_commit(lambda meter_id=meter_id: schedule_meter_autorecharge(meter_id))
@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import MeterViewSet, TokenViewSet, ManualRechargeViewSet
-from .views import AutoRechargeViewSet
+from .views import AutoRechargeViewSet, TokenPoolViewSet
 
 router = DefaultRouter()
 router.register(r'meters', MeterViewSet, basename='meter')
@@ -14,5 +14,9 @@ urlpatterns = [
     path('meters/auto-recharge/settings/', AutoRechargeViewSet.as_view({'get': 'get_config', 'post': 'save_config'}), name='auto-recharge-settings'),
     path('meters/auto-recharge/events/', AutoRechargeViewSet.as_view({'get': 'list_events'}), name='auto-recharge-events'),
     path('meters/auto-recharge/run-now/', AutoRechargeViewSet.as_view({'post': 'run_now'}), name='auto-recharge-run-now'),
+    path('meters/auto-recharge/jobs/<int:pk>/', AutoRechargeViewSet.as_view({'get': 'job_status'}), name='auto-recharge-job'),
     path('meters/auto-recharge/trigger/<int:pk>/', AutoRechargeViewSet.as_view({'post': 'trigger_for_meter'}), name='auto-recharge-trigger'),
+    path('meters/purchases/export/', TokenViewSet.as_view({'get': 'export_purchases'}), name='token-purchases-export'),
+    path('meters/token-pool/availability/', TokenPoolViewSet.as_view({'get': 'availability'}), name='token-pool-availability'),
+    path('meters/token-pool/forecast/', TokenPoolViewSet.as_view({'get': 'forecast'}), name='token-pool-forecast'),
 ]
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""Per-meter usage bucketed by day, week or month.
+
+`meter_usage` sums TokenPurchase rows (purchases and auto-recharges) and
+successful ManualRecharge rows per period with TruncDay/TruncWeek/TruncMonth
+aggregates, so no rows are shipped to Python. Periods that have ended don't
+change any more; their totals are cached per (meter, bucket, period) and
+only the missing ones plus the current period are recomputed on a request.
+Backdated imports (import_purchased) can change a closed period; those
+entries expire after USAGE_CACHE_TIMEOUT.
+"""
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import Coalesce, TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import ManualRecharge, TokenPurchase
+
+BUCKETS = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+DEFAULT_PERIODS = {'day': 30, 'week': 12, 'month': 12}
+MAX_PERIODS = 400
+USAGE_CACHE_TIMEOUT = 7 * 24 * 3600
+
+
+def period_start(day, bucket):
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_period(start, bucket):
+    if bucket == 'week':
+        return start + timedelta(days=7)
+    if bucket == 'month':
+        return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start + timedelta(days=1)
+
+
+def periods_between(start, end, bucket):
+    """Period starts covering start..end inclusive, the first aligned down to its period."""
+    current = period_start(start, bucket)
+    periods = []
+    while current <= end:
+        periods.append(current)
+        current = next_period(current, bucket)
+    return periods
+
+
+def default_range(bucket, today=None):
+    end = today or timezone.localdate()
+    start = period_start(end, bucket)
+    for _ in range(DEFAULT_PERIODS[bucket] - 1):
+        start = period_start(start - timedelta(days=1), bucket)
+    return start, end
+
+
+def _empty():
+    return {
+        'purchases': 0, 'amount': Decimal('0'), 'purchased_units': Decimal('0'),
+        'recharges': 0, 'recharged_units': Decimal('0'),
+    }
+
+
+def _aware(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _aggregate(meter_id, bucket, start, end):
+    """Totals per period start for periods in [start, end) (period-aligned dates)."""
+    trunc = BUCKETS[bucket]
+    since, until = _aware(start), _aware(end)
+    totals = {}
+    purchases = (
+        TokenPurchase.objects.filter(meter_id=meter_id, purchased_at__gte=since, purchased_at__lt=until)
+        .annotate(period=trunc('purchased_at', output_field=DateField()))
+        .values('period')
+        .annotate(n=Count('id'), total=Sum('amount'), total_units=Sum('units'))
+        .order_by()
+    )
+    for r in purchases:
+        row = totals.setdefault(r['period'], _empty())
+        row.update(purchases=r['n'], amount=r['total'] or Decimal('0'), purchased_units=r['total_units'] or Decimal('0'))
+    recharges = (
+        ManualRecharge.objects.filter(meter_id=meter_id, status='success')
+        .annotate(at=Coalesce('applied_at', 'created_at'))
+        .filter(at__gte=since, at__lt=until)
+        .annotate(period=trunc('at', output_field=DateField()))
+        .values('period')
+        .annotate(n=Count('id'), total_units=Sum('units'))
+        .order_by()
+    )
+    for r in recharges:
+        row = totals.setdefault(r['period'], _empty())
+        row.update(recharges=r['n'], recharged_units=r['total_units'] or Decimal('0'))
+    return totals
+
+
+def _cache_key(meter_id, bucket, start):
+    return f'meter-usage:{meter_id}:{bucket}:{start.isoformat()}'
+
+
+def meter_usage(meter_id, bucket, start, end, today=None):
+    """Usage rows for every period touching start..end, oldest first.
+
+    Closed periods come from the cache when present; at most two grouped
+    queries per source cover whatever is missing.
+    """
+    today = today or timezone.localdate()
+    current = period_start(today, bucket)
+    periods = periods_between(start, end, bucket)
+    if len(periods) > MAX_PERIODS:
+        raise ValueError(f'At most {MAX_PERIODS} {bucket} periods per request')
+
+    closed = [p for p in periods if p < current]
+    keys = {p: _cache_key(meter_id, bucket, p) for p in closed}
+    cached = cache.get_many(keys.values())
+    results = {p: cached[keys[p]] for p in closed if keys[p] in cached}
+
+    missing = [p for p in closed if p not in results]
+    if missing:
+        computed = _aggregate(meter_id, bucket, missing[0], next_period(missing[-1], bucket))
+        fresh = {p: computed.get(p, _empty()) for p in missing}
+        cache.set_many({keys[p]: row for p, row in fresh.items()}, timeout=USAGE_CACHE_TIMEOUT)
+        results.update(fresh)
+    open_periods = [p for p in periods if p >= current]
+    if open_periods:
+        computed = _aggregate(meter_id, bucket, open_periods[0], next_period(open_periods[-1], bucket))
+        results.update({p: computed.get(p, _empty()) for p in open_periods})
+
+    return [
+        {'period': p, **results[p], 'units': results[p]['purchased_units'] + results[p]['recharged_units']}
+        for p in periods
+    ]
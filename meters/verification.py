@@ -0,0 +1,104 @@
+"""Batched verification of pending manual recharges.
+
+A token entered in `recharge_token` that is not yet known is stored as a
+pending ManualRecharge. Instead of a polling thread per request, one
+scheduled worker resolves every pending row per tick with a single
+`token_code__in` lookup against TokenPool and Token, writes the outcomes in
+bulk, and expires rows that stayed unknown for too long.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from . import ledger
+from .allocator import allocate_pk
+from .models import ManualRecharge, MeterLedger, Token, TokenPool
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def verify_pending_recharges(now=None, timeout_seconds=None, batch_size=DEFAULT_BATCH_SIZE, user_id=None):
+    """Resolve up to batch_size pending ManualRecharge rows (only user_id's, if given); returns a summary dict."""
+    now = now or timezone.now()
+    if timeout_seconds is None:
+        timeout_seconds = getattr(settings, 'MANUAL_RECHARGE_VERIFY_TIMEOUT', 30)
+    expire_before = now - timedelta(seconds=timeout_seconds)
+    summary = {'checked': 0, 'success': 0, 'rejected': 0, 'failed': 0, 'pending': 0}
+
+    pending = ManualRecharge.objects.filter(status='pending')
+    if user_id is not None:
+        pending = pending.filter(user_id=user_id)
+    pending = list(pending.order_by('pk')[:batch_size])
+    if not pending:
+        return summary
+    summary['checked'] = len(pending)
+
+    codes = {mr.token_code for mr in pending}
+    applied = {
+        code: (meter_id, units)
+        for code, meter_id, units in Token.objects.filter(token_code__in=codes).values_list('token_code', 'meter_id', 'units')
+    }
+    pool = {
+        row[0]: row[1:]
+        for row in TokenPool.objects.filter(token_code__in=codes).values_list(
+            'token_code', 'pk', 'amount', 'units', 'is_allocated', 'allocated_to_id'
+        )
+    }
+
+    new_tokens = []
+    credits = []
+    updated = []
+
+    with db_transaction.atomic():
+        for mr in pending:
+            code = mr.token_code
+            if code in applied:
+                meter_id, units = applied[code]
+                if meter_id == mr.meter_id:
+                    mr.status, mr.units, mr.applied_at = 'success', units or None, now
+                    mr.message = 'Found applied token during verification'
+                else:
+                    mr.status, mr.message = 'rejected', 'Token already used on another meter'
+            elif code in pool:
+                pk, amount, units, is_allocated, allocated_to_id = pool[code]
+                # allocated_to is only set on allocated rows
+                if mr.user_id is not None and allocated_to_id == mr.user_id:
+                    mr.status, mr.units, mr.applied_at = 'success', units or None, now
+                    mr.message = 'Token already allocated to this meter'
+                elif is_allocated:
+                    if mr.created_at < expire_before:
+                        mr.status, mr.message = 'rejected', 'Token already used on another meter'
+                    else:
+                        continue
+                elif not mr.meter_id:
+                    # nothing to apply the token to (meter deleted); it would stay pending forever
+                    mr.status, mr.message = 'failed', 'Meter no longer exists'
+                # the user supplied this exact code, so a buffer's lease on it doesn't stand in the way
+                elif allocate_pk(pk, user_id=mr.user_id, amount=amount, units=units, include_leased=True):
+                    units_v = units or Decimal('0')
+                    new_tokens.append(Token(meter_id=mr.meter_id, token_code=code, amount=amount or Decimal('0.00'), units=units_v))
+                    credits.append(MeterLedger(meter_id=mr.meter_id, entry_type=ledger.MANUAL_RECHARGE, units=units_v, reference=code))
+                    applied[code] = (mr.meter_id, units_v)
+                    mr.status, mr.units, mr.applied_at = 'success', units_v, now
+                    mr.message = 'Allocated from pool (background)'
+                elif mr.created_at < expire_before:
+                    mr.status, mr.message = 'failed', 'Verification timeout - token could not be allocated'
+                else:
+                    continue
+            elif mr.created_at < expire_before:
+                mr.status, mr.message = 'failed', 'Verification timeout - token not found'
+            else:
+                continue
+            updated.append(mr)
+
+        Token.objects.bulk_create(new_tokens)
+        ledger.post_entries(credits)
+        ManualRecharge.objects.bulk_update(updated, ['status', 'units', 'applied_at', 'message'])
+
+    for mr in updated:
+        summary[mr.status] += 1
+    summary['pending'] = summary['checked'] - len(updated)
+    return summary
@@ -3,9 +3,16 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from .models import Meter, Token, TokenPurchase, TokenPool, ManualRecharge
 from .serializers import MeterSerializer, TokenSerializer, ManualRechargeSerializer
-from .serializers import AutoRechargeConfigSerializer, AutoRechargeEventSerializer
-from .models import AutoRechargeConfig, AutoRechargeEvent
+from .serializers import AutoRechargeConfigSerializer, AutoRechargeEventSerializer, AutoRechargeJobSerializer
+from .models import AutoRechargeConfig, AutoRechargeEvent, AutoRechargeJob
+from . import ledger
+from .allocator import claim_token
+from .counters import has_available_tokens, pool_availability
+from datetime import timezone as dt_timezone
+
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.http import parse_etags
 from django.db import transaction as db_transaction
 from rest_framework import mixins
 from rest_framework import status
@@ -19,6 +26,37 @@ class ManualRechargeViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, Ge
     def get_queryset(self):
         return ManualRecharge.objects.filter(user=self.request.user).order_by('-created_at')
 
+    def _resolve_pending(self):
+        # without a broker (CELERY_TASK_ALWAYS_EAGER) the client's status polls also verify
+        # (and eventually expire) the requesting user's own pending rows
+        from django.conf import settings
+        from .tasks import schedule_recharge_verification
+
+        if getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
+            schedule_recharge_verification(user_id=self.request.user.pk)
+
+    def list(self, request, *args, **kwargs):
+        self._resolve_pending()
+        return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        self._resolve_pending()
+        return super().retrieve(request, *args, **kwargs)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream manual recharges as CSV or NDJSON (?export_format=, date_from/date_to, status; see meters.exports)."""
+        from .exports import export_response, export_scope, filter_dates
+
+        qs = export_scope(request, self.get_queryset(), ManualRecharge.objects.all())
+        if request.query_params.get('status'):
+            qs = qs.filter(status=request.query_params['status'])
+        columns = (
+            ('id', 'id'), ('token_code', 'token_code'), ('meter_number', 'meter__meter_number'), ('units', 'units'),
+            ('status', 'status'), ('message', 'message'), ('created_at', 'created_at'), ('applied_at', 'applied_at'),
+        )
+        return export_response(request, filter_dates(qs, request, 'created_at').order_by('-created_at', '-id'), columns, 'manual-recharges')
+
     @action(detail=False, methods=['get'], url_path='inspect')
     def inspect(self, request):
         """Debug endpoint: return related TokenPool, TokenPurchase, Token and ManualRecharge info for a token_code or manual recharge id.
@@ -121,21 +159,109 @@ class MeterViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
     
+    @action(detail=False, methods=['post'], url_path='bulk-config')
+    def bulk_config(self, request):
+        """Apply auto-recharge settings and nicknames to many meters in one request.
+
+        `set` holds values for every meter matched by `filter` (ids,
+        meter_number_prefix, auto_recharge_enabled; all of the user's meters
+        when omitted); `meters` is a list of {id, ...values} for per-meter
+        values, which win over `set`. The response has one result per meter:
+        updated (with the stored values), not_found or invalid (with errors).
+        """
+        from .bulk import configure_meters
+        from .serializers import MeterBulkConfigSerializer, MeterConfigItemSerializer
+
+        serializer = MeterBulkConfigSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        data = serializer.validated_data
+
+        results, per_meter = [], {}
+        for item in data.get('meters', []):
+            item_serializer = MeterConfigItemSerializer(data=item)
+            if not item_serializer.is_valid():
+                results.append({'id': item.get('id'), 'status': 'invalid', 'errors': item_serializer.errors})
+                continue
+            values = dict(item_serializer.validated_data)
+            per_meter.setdefault(values.pop('id'), {}).update(values)
+
+        updated = configure_meters(request.user, values=data.get('set'), per_meter=per_meter, **data.get('filter', {}))
+        results += [{'id': pk, 'status': 'not_found'} for pk in per_meter if pk not in updated]
+        results += [{'status': 'updated', **row} for row in updated.values()]
+        return Response({'updated': len(updated), 'results': results})
+
+    @action(detail=False, methods=['post'], url_path='readings')
+    def ingest_readings(self, request):
+        """Staff/feed endpoint: apply a batch of meter readings.
+
+        The body is NDJSON (default) or CSV (Content-Type: text/csv) with
+        meter_number, read_at and units (kWh consumed since the previous
+        reading). It is streamed line by line, so large batches are not held
+        in memory; see meters.readings for validation and stale handling.
+        """
+        import codecs
+        from .readings import ingest_readings, iter_rows
+
+        if not request.user.is_staff:
+            return Response({'detail': 'Not allowed'}, status=403)
+        fmt = 'csv' if request.content_type.startswith('text/csv') else 'ndjson'
+        try:
+            stats = ingest_readings(iter_rows(codecs.iterdecode(request._request, 'utf-8'), fmt))
+        except UnicodeDecodeError:
+            return Response({'detail': 'Body must be UTF-8'}, status=400)
+        return Response(stats)
+
+    @action(detail=True, methods=['get'])
+    def usage(self, request, pk=None):
+        """kWh bought per period: ?bucket=day|week|month (default day), ?from=&to= (YYYY-MM-DD).
+
+        Periods are aligned to their start (weeks begin on Monday), so `from`
+        may fall inside the first one. Without a range the last 30 days, 12
+        weeks or 12 months are returned. See meters.usage for the caching.
+        """
+        from django.utils.dateparse import parse_date
+        from .usage import BUCKETS, default_range, meter_usage
+
+        meter = self.get_object()
+        bucket = request.query_params.get('bucket', 'day')
+        if bucket not in BUCKETS:
+            return Response({'detail': f'bucket must be one of {", ".join(BUCKETS)}'}, status=400)
+        start, end = default_range(bucket)
+        try:
+            end = parse_date(request.query_params.get('to') or '') or end
+            start = parse_date(request.query_params.get('from') or '') or start
+            if start > end:
+                raise ValueError('from must not be after to')
+            rows = meter_usage(meter.pk, bucket, start, end)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=400)
+        return Response({
+            'meter': meter.pk,
+            'bucket': bucket,
+            'from': start,
+            'to': end,
+            'results': [
+                {**row, 'amount': float(row['amount']), 'purchased_units': float(row['purchased_units']),
+                 'recharged_units': float(row['recharged_units']), 'units': float(row['units'])}
+                for row in rows
+            ],
+        })
+
     @action(detail=True, methods=['post'])
     def purchase_electricity(self, request, pk=None):
-        """Create a pending transaction and schedule mock payment processing.
+        """Create a pending transaction and queue payment confirmation.
 
-        The actual token allocation is done in a background thread to simulate
-        a delayed payment confirmation (webhook-like). This uses TokenPool
-        for DB-backed token allocation.
+        Confirmation and TokenPool allocation run in the
+        `confirm_purchase_task` Celery task (see meters.purchases) once the
+        pending transaction is committed; clients poll the transaction for
+        the result.
         """
         meter = self.get_object()
         from decimal import Decimal
         import uuid
         from transactions.models import Transaction
-        from meters.models import Token as TokenModel, TokenPool
-        from django.utils import timezone
-        import threading, time
+        from .tasks import confirm_purchase_task
 
         if meter.user.id != request.user.id:
             return Response({'detail': 'Unauthorized'}, status=403)
@@ -148,6 +274,10 @@ class MeterViewSet(viewsets.ModelViewSet):
         except Exception:
             return Response({'detail': 'Invalid amount'}, status=400)
 
+        # reject up front when the pool can't serve this purchase, instead of failing after payment
+        if not has_available_tokens(amount=amount_dec, allow_any=True):
+            return Response({'detail': 'No tokens available for this amount'}, status=409)
+
         # Create pending transaction
         transaction_id = uuid.uuid4().hex
         transaction = Transaction.objects.create(
@@ -161,112 +291,11 @@ class MeterViewSet(viewsets.ModelViewSet):
             description='Pending purchase - awaiting confirmation',
         )
 
-        # Background worker to simulate payment processing and token allocation
-        def process_payment(txn_id: str, user_id: int):
-            import time
-            from decimal import Decimal as _Decimal
-            from django.db import transaction as _db_transaction
-            from transactions.models import Transaction as _Transaction
-            from meters.models import Token as _TokenModel, TokenPool as _TokenPool
-            from usersAuth.models import User as UserModel
-
-            # simulate payment delay
-            time.sleep(3)  # 3 second delay to simulate processing
-
-            # allocate token from TokenPool atomically
-            allocated = None
-            try:
-                with _db_transaction.atomic():
-                    # prefer a pool token that matches the purchase amount, if available
-                    pool_token = _TokenPool.objects.select_for_update(skip_locked=True).filter(is_allocated=False, amount=amount_dec).first()
-                    if not pool_token:
-                        # fall back to any unallocated token
-                        pool_token = _TokenPool.objects.select_for_update(skip_locked=True).filter(is_allocated=False).first()
-                    if not pool_token:
-                        _Transaction.objects.filter(transaction_id=txn_id).update(status='failed', description='No tokens available')
-                        return
-
-                    pool_token.is_allocated = True
-                    pool_token.allocated_at = timezone.now()
-                    # resolve user inside the background thread
-                    try:
-                        pool_token.allocated_to = UserModel.objects.get(pk=user_id) if user_id is not None else None
-                    except Exception:
-                        pool_token.allocated_to = None
-                    pool_token.allocated_transaction_id = txn_id
-                    pool_token.save()
-
-                allocated = pool_token.token_code
-
-                # create TokenModel for meter
-                # prefer units from pool metadata; otherwise estimate from amount
-                if pool_token.units is not None:
-                    units = pool_token.units
-                else:
-                    units = (amount_dec * _Decimal('4.2')).quantize(_Decimal('0.01'))
-                _TokenModel.objects.create(
-                    meter=meter,
-                    token_code=allocated,
-                    amount=pool_token.amount or amount_dec,
-                    units=units,
-                )
-
-                # update meter balance and last top-up timestamp
-                try:
-                    meter.current_balance = (meter.current_balance or _Decimal('0')) + units
-                    meter.last_top_up = timezone.now()
-                    meter.save(update_fields=['current_balance', 'last_top_up'])
-                except Exception:
-                    pass
-
-                # mark txn completed and set units/token
-                _Transaction.objects.filter(transaction_id=txn_id).update(status='completed', description=f'Allocated token {allocated}', units=units, token_code=allocated)
-
-                # create DB-backed audit record for the purchased token (best effort)
-                try:
-                    from .models import TokenPurchase as _TokenPurchase
-                    user_obj = None
-                    try:
-                        user_obj = UserModel.objects.get(pk=user_id) if user_id is not None else None
-                    except Exception:
-                        user_obj = None
-
-                    _TokenPurchase.objects.create(
-                        token_code=allocated,
-                        meter=meter,
-                        user=user_obj,
-                        amount=pool_token.amount or amount_dec,
-                        units=pool_token.units if pool_token.units is not None else (amount_dec * _Decimal('4.2')).quantize(_Decimal('0.01')),
-                    )
-                    
-                    # Create notification for successful token purchase
-                    if user_obj:
-                        try:
-                            from notifications.models import Notification
-                            units_display = pool_token.units if pool_token.units is not None else (amount_dec * _Decimal('4.2')).quantize(_Decimal('0.01'))
-                            Notification.objects.create(
-                                user=user_obj,
-                                notification_type='purchase',
-                                title='Token Purchase Successful',
-                                message=f'You have successfully purchased {units_display} kWh for ${amount_dec}. Token: {allocated[:4]}...{allocated[-4:]}'
-                            )
-                        except Exception as notif_err:
-                            import logging
-                            logging.exception('Failed to create purchase notification')
-                except Exception:
-                    # don't block allocation if audit creation fails; log and continue
-                    import logging
-                    logging.exception('Failed to create TokenPurchase record')
-
-            except Exception as e:
-                _Transaction.objects.filter(transaction_id=txn_id).update(status='failed', description=f'Error allocating token: {str(e)}')
-
-        import threading
-        threading.Thread(target=process_payment, args=(transaction.transaction_id, request.user.id if hasattr(request, 'user') else None), daemon=True).start()
+        db_transaction.on_commit(lambda: confirm_purchase_task.delay(transaction_id))
 
         # return pending transaction info
         return Response({'status': 'pending', 'transaction_id': transaction.transaction_id})
-    
+
     @action(detail=True, methods=['post'])
     def recharge_token(self, request, pk=None):
         meter = self.get_object()
@@ -330,27 +359,12 @@ class MeterViewSet(viewsets.ModelViewSet):
             # try to allocate from pool atomically
             try:
                 with db_transaction.atomic():
-                    # lock and re-check
-                    pool_locked = TokenPool.objects.select_for_update(skip_locked=True).filter(token_code=normalized, is_allocated=False).first()
+                    # claim only if still unallocated (a concurrent request may have won it)
+                    pool_locked = claim_token(token_code=normalized, user_id=request.user.id)
                     if pool_locked:
-                        pool_locked.is_allocated = True
-                        pool_locked.allocated_at = timezone.now()
-                        # store user id here for traceability; allocated_to is a User FK in original model
-                        try:
-                            pool_locked.allocated_to = request.user
-                        except Exception:
-                            # allocated_to may be a Meter FK in some variants; ignore if assignment fails
-                            pass
-                        pool_locked.save()
-
                         units_val = pool_locked.units if pool_locked.units is not None else Decimal('0')
                         token_obj = Token.objects.create(meter=meter, token_code=normalized, amount=pool_locked.amount or Decimal('0.00'), units=units_val)
-                        try:
-                            meter.current_balance = (meter.current_balance or Decimal('0')) + units_val
-                            meter.last_top_up = timezone.now()
-                            meter.save(update_fields=['current_balance', 'last_top_up'])
-                        except Exception:
-                            pass
+                        ledger.credit(meter.id, units_val, ledger.MANUAL_RECHARGE, reference=normalized)
 
                         mr = ManualRecharge.objects.create(token_code=normalized, meter=meter, user=request.user, units=units_val, status='success', applied_at=timezone.now(), message='Allocated from pool')
                         return Response({'status': 'success', 'id': mr.id, 'units': str(units_val)})
@@ -358,68 +372,13 @@ class MeterViewSet(viewsets.ModelViewSet):
                 mr = ManualRecharge.objects.create(token_code=normalized, meter=meter, user=request.user, status='failed', message=str(e))
                 return Response({'status': 'failed', 'id': mr.id, 'message': str(e)}, status=500)
 
-        # 3) not found -> create pending MR and background verify
+        # 3) not found -> create pending MR for the verification worker
         mr = ManualRecharge.objects.create(token_code=normalized, meter=meter, user=request.user, status='pending', message='Verification scheduled')
 
-        def background_check(mr_id, tcode, meter_id, user_id):
-            import time
-            from django.db import transaction as dbt
-            attempts = 6
-            for attempt in range(attempts):
-                time.sleep(2)
-                try:
-                    with dbt.atomic():
-                        p = TokenPool.objects.select_for_update(skip_locked=True).filter(token_code=tcode, is_allocated=False).first()
-                        if p:
-                            p.is_allocated = True
-                            p.allocated_at = timezone.now()
-                            # resolve user in background thread
-                            try:
-                                from usersAuth.models import User as UserModel
-                                if user_id is not None:
-                                    p.allocated_to = UserModel.objects.get(pk=user_id)
-                                else:
-                                    p.allocated_to = None
-                            except Exception:
-                                p.allocated_to = None
-                            p.save()
-                            units_v = p.units or Decimal('0')
-                            mobj = Meter.objects.get(pk=meter_id)
-                            Token.objects.create(meter=mobj, token_code=tcode, amount=p.amount or Decimal('0.00'), units=units_v)
-                            mr_local = ManualRecharge.objects.get(pk=mr_id)
-                            mr_local.status = 'success'
-                            mr_local.units = units_v
-                            mr_local.applied_at = timezone.now()
-                            mr_local.message = 'Allocated from pool (background)'
-                            mr_local.save(update_fields=['status', 'units', 'applied_at', 'message'])
-                            return
-                        tok = Token.objects.filter(token_code=tcode).first()
-                        if tok:
-                            mr_local = ManualRecharge.objects.get(pk=mr_id)
-                            if tok.meter_id == meter_id:
-                                mr_local.status = 'success'
-                                mr_local.units = tok.units or None
-                                mr_local.applied_at = timezone.now()
-                                mr_local.message = 'Found applied token during verification'
-                                mr_local.save(update_fields=['status', 'units', 'applied_at', 'message'])
-                            else:
-                                mr_local.status = 'rejected'
-                                mr_local.message = 'Token already used on another meter'
-                                mr_local.save(update_fields=['status', 'message'])
-                            return
-                except Exception:
-                    pass
-            # exhausted
-            try:
-                mr_local = ManualRecharge.objects.get(pk=mr_id)
-                mr_local.status = 'failed'
-                mr_local.message = 'Verification timeout - token not found'
-                mr_local.save(update_fields=['status', 'message'])
-            except Exception:
-                pass
-
-        import threading
-        threading.Thread(target=background_check, args=(mr.id, normalized, meter.id, request.user.id if hasattr(request, 'user') else None), daemon=True).start()
+        # resolved by the batched verification worker (meters.verification); nudge it so
+        # the token is picked up without waiting for the next scheduled tick
+        from .tasks import schedule_recharge_verification
+        db_transaction.on_commit(lambda: schedule_recharge_verification(user_id=request.user.pk))
 
         return Response({'status': 'pending', 'id': mr.id, 'message': 'Verification scheduled'}, status=202)
 
@@ -454,15 +413,8 @@ class MeterViewSet(viewsets.ModelViewSet):
         # Try pool
         try:
             with db_transaction.atomic():
-                pool = TokenPool.objects.select_for_update(skip_locked=True).filter(token_code=normalized, is_allocated=False).first()
+                pool = claim_token(token_code=normalized, user_id=request.user.id)
                 if pool:
-                    pool.is_allocated = True
-                    pool.allocated_at = timezone.now()
-                    try:
-                        pool.allocated_to = request.user
-                    except Exception:
-                        pass
-                    pool.save(update_fields=['is_allocated', 'allocated_at', 'allocated_to'])
                     units = pool.units or Decimal('0')
                 else:
                     if units_val is None and not force:
@@ -471,12 +423,7 @@ class MeterViewSet(viewsets.ModelViewSet):
 
             # create Token and update meter
             token_obj = Token.objects.create(meter=meter, token_code=normalized, amount=Decimal('0.00'), units=units)
-            try:
-                meter.current_balance = (meter.current_balance or Decimal('0')) + units
-                meter.last_top_up = timezone.now()
-                meter.save(update_fields=['current_balance', 'last_top_up'])
-            except Exception:
-                pass
+            ledger.credit(meter.id, units, ledger.MANUAL_RECHARGE, reference=normalized)
 
             mr = ManualRecharge.objects.create(token_code=normalized, meter=meter, user=request.user, units=units, status='success', applied_at=timezone.now(), message='Applied via apply_token')
             return Response({'status': 'success', 'id': mr.id, 'units': str(units)})
@@ -489,6 +436,47 @@ class TokenViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         return Token.objects.filter(meter__user=self.request.user)
 
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream tokens as CSV or NDJSON (?export_format=, date_from/date_to; see meters.exports)."""
+        from .exports import export_response, export_scope, filter_dates
+
+        qs = export_scope(request, self.get_queryset(), Token.objects.all())
+        columns = (
+            ('token_code', 'token_code'), ('meter_number', 'meter__meter_number'), ('amount', 'amount'), ('units', 'units'),
+            ('is_used', 'is_used'), ('used_at', 'used_at'), ('created_at', 'created_at'),
+        )
+        return export_response(request, filter_dates(qs, request, 'created_at').order_by('-created_at', '-id'), columns, 'tokens')
+
+    def export_purchases(self, request):
+        """Stream TokenPurchase records as CSV or NDJSON (?export_format=, date_from/date_to)."""
+        from .exports import export_response, export_scope, filter_dates
+
+        qs = export_scope(request, TokenPurchase.objects.filter(user=request.user), TokenPurchase.objects.all())
+        columns = (
+            ('token_code', 'token_code'), ('meter_number', 'meter__meter_number'), ('user_email', 'user__email'),
+            ('amount', 'amount'), ('units', 'units'), ('purchased_at', 'purchased_at'),
+        )
+        return export_response(request, filter_dates(qs, request, 'purchased_at').order_by('-purchased_at', '-id'), columns, 'token-purchases')
+
+
+class TokenPoolViewSet(viewsets.ViewSet):
+    """Token pool availability, read from the maintained per-denomination counters."""
+
+    def availability(self, request):
+        return Response(pool_availability())
+
+    def forecast(self, request):
+        """Staff only: projected pool depletion per denomination, soonest first (see meters.forecasting)."""
+        from django.db.models import F
+        from .models import TokenDemandForecast
+        from .serializers import TokenDemandForecastSerializer
+
+        if not request.user.is_staff:
+            return Response({'detail': 'Not allowed'}, status=403)
+        qs = TokenDemandForecast.objects.order_by(F('depletion_date').asc(nulls_last=True), 'bucket')
+        return Response(TokenDemandForecastSerializer(qs, many=True).data)
+
 
 class AutoRechargeViewSet(viewsets.ViewSet):
     """Simple endpoints for managing user auto-recharge configuration and events."""
@@ -505,26 +493,46 @@ class AutoRechargeViewSet(viewsets.ViewSet):
             serializer.save()
             # If apply_to_all is true, optionally update meters defaults
             if serializer.validated_data.get('apply_to_all'):
-                # apply defaults to meters where fields are empty
-                meters = Meter.objects.filter(user=request.user)
-                update_fields = []
-                for m in meters:
-                    changed = False
-                    if obj.default_threshold is not None and (m.auto_recharge_threshold is None):
-                        m.auto_recharge_threshold = obj.default_threshold
-                        changed = True
-                    if obj.default_amount is not None and (m.auto_recharge_amount is None):
-                        m.auto_recharge_amount = obj.default_amount
-                        changed = True
-                    if changed:
-                        m.save()
+                # apply defaults to meters where fields are empty, in one UPDATE
+                from .bulk import fill_missing_defaults
+                fill_missing_defaults(request.user, threshold=obj.default_threshold, amount=obj.default_amount)
             return Response(serializer.data)
         return Response(serializer.errors, status=400)
 
     def list_events(self, request):
-        qs = AutoRechargeEvent.objects.filter(user=request.user).order_by('-triggered_at')
-        serializer = AutoRechargeEventSerializer(qs, many=True)
-        return Response(serializer.data)
+        """Auto-recharge events, newest first, cursor-paginated.
+
+        `?since=<ISO datetime>` returns only events created or changed after
+        that instant; the X-Last-Modified header carries the value to pass on
+        the next poll. The ETag covers the whole filtered feed, so a repeated
+        poll with If-None-Match gets an empty 304 from a single aggregate query.
+        The next page, if any, is in the Link / X-Next-Cursor headers.
+        """
+        from .pagination import AutoRechargeEventPagination, feed_etag
+
+        qs = AutoRechargeEvent.objects.filter(user=request.user)
+        since = request.query_params.get('since')
+        if since:
+            since_at = parse_datetime(since)
+            if since_at is None:
+                return Response({'detail': 'since must be an ISO 8601 datetime'}, status=400)
+            if timezone.is_naive(since_at):
+                since_at = timezone.make_aware(since_at, dt_timezone.utc)
+            qs = qs.filter(updated_at__gt=since_at)
+
+        etag, last_modified = feed_etag(qs, request.query_params)
+        headers = {'ETag': etag}
+        if last_modified is not None:
+            headers['X-Last-Modified'] = last_modified.isoformat()
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        paginator = AutoRechargeEventPagination()
+        page = paginator.paginate_queryset(qs.select_related('meter'), request, view=self)
+        response = paginator.get_paginated_response(AutoRechargeEventSerializer(page, many=True).data)
+        for name, value in headers.items():
+            response[name] = value
+        return response
 
     def trigger_for_meter(self, request, pk=None):
         """Manually trigger an auto-recharge attempt for a meter (developer action)."""
@@ -538,25 +546,23 @@ class AutoRechargeViewSet(viewsets.ViewSet):
 
     @action(detail=False, methods=['post'], url_path='run-now')
     def run_now(self, request):
-        """Trigger auto-recharge checks for the current user and run them synchronously in a background thread.
+        """Trigger a forced auto-recharge run for the current user.
 
-        This endpoint returns immediately with a 'started' response while the actual
-        work is performed in a daemon thread. The work writes AutoRechargeEvent rows
-        to the database so the frontend can poll `/events/` to see the results.
+        Repeated requests while a run is queued or in progress return the same
+        job instead of starting another one. The run happens in the
+        `run_autorecharge_job_task` Celery task; poll
+        `/meters/auto-recharge/jobs/<job_id>/` for progress and the summary.
         """
-        from .utils import run_autorecharge_for_user
-        import threading
-
-        user = request.user
-
-        def worker():
-            try:
-                # Force a run to ensure an attempt even if config is disabled
-                run_autorecharge_for_user(user, force=True)
-            except Exception:
-                # swallow exceptions — events/errors are recorded to DB by the util
-                pass
-
-        t = threading.Thread(target=worker, daemon=True)
-        t.start()
-        return Response({'status': 'started'})
\ No newline at end of file
+        from .jobs import request_run_now
+        from .tasks import run_autorecharge_job_task
+
+        job, created = request_run_now(request.user)
+        if created:
+            db_transaction.on_commit(lambda: run_autorecharge_job_task.delay(job.id))
+        return Response({'status': 'started', 'job_id': job.id, 'coalesced': not created})
+
+    def job_status(self, request, pk=None):
+        job = AutoRechargeJob.objects.filter(pk=pk, user=request.user).first()
+        if job is None:
+            return Response({'detail': 'Job not found'}, status=404)
+        return Response(AutoRechargeJobSerializer(job).data)
\ No newline at end of file
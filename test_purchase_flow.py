@@ -7,7 +7,8 @@ import django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 django.setup()
 
-from meters.models import TokenPool, Meter
+from meters.models import Meter
+from meters.counters import pool_availability
 from usersAuth.models import User
 from transactions.models import Transaction
 
@@ -17,9 +18,10 @@ print("SYSTEM STATUS CHECK")
 print("=" * 60)
 
 # 1. Check tokens
-total_tokens = TokenPool.objects.count()
-available_tokens = TokenPool.objects.filter(is_allocated=False).count()
-allocated_tokens = TokenPool.objects.filter(is_allocated=True).count()
+pool_stats = pool_availability()
+available_tokens = pool_stats['total_available']
+allocated_tokens = pool_stats['total_allocated']
+total_tokens = available_tokens + allocated_tokens
 
 print(f"\n📦 TOKEN POOL:")
 print(f"   Total tokens: {total_tokens}")
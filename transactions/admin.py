@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Transaction
+from django.db import transaction
+from . import rollups
+from .models import DailySpending, Transaction
 
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
@@ -22,3 +24,30 @@ class TransactionAdmin(admin.ModelAdmin):
             "fields": ("created_at", "updated_at"),
         }),
     )
+
+    # keep DailySpending in step with edits made here
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            previous = Transaction.objects.select_for_update().filter(pk=obj.pk).first() if change else None
+            super().save_model(request, obj, form, change)
+            rollups.apply_change(previous, obj)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            rollups.apply_change(obj, None)
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            for obj in queryset.filter(status=rollups.COMPLETED):
+                rollups.apply_change(obj, None)
+            super().delete_queryset(request, queryset)
+
+
+@admin.register(DailySpending)
+class DailySpendingAdmin(admin.ModelAdmin):
+    list_display = ("user", "meter_id", "day", "transaction_type", "count", "amount", "units")
+    search_fields = ("user__email",)
+    list_filter = ("transaction_type", "day")
+    readonly_fields = ("user", "meter_id", "day", "transaction_type", "count", "amount", "units")
+    exclude = ("meter",)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from transactions.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the DailySpending rollups from completed transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users', help='Only rebuild these user ids (repeatable)')
+
+    def handle(self, *args, **options):
+        rows = rebuild_rollups(user_ids=options['users'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} daily spending rows'))
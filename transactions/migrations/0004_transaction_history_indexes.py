@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meters', '0021_token_demand_forecast'),
+        ('transactions', '0003_merge_0002_add_units_and_tokencode_0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='transaction_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'amount', 'id'], name='transaction_user_amount_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+from django.db import migrations
+
+TABLE = 'transactions_transaction'
+FTS = 'transactions_transaction_fts'
+
+POSTGRESQL_FORWARD = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    f'CREATE INDEX IF NOT EXISTS transaction_txid_trgm_idx ON {TABLE} USING gin (transaction_id gin_trgm_ops)',
+    f'CREATE INDEX IF NOT EXISTS transaction_desc_trgm_idx ON {TABLE} USING gin (description gin_trgm_ops)',
+]
+POSTGRESQL_BACKWARD = [
+    'DROP INDEX IF EXISTS transaction_txid_trgm_idx',
+    'DROP INDEX IF EXISTS transaction_desc_trgm_idx',
+]
+
+SQLITE_FORWARD = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS} USING fts5("
+    f"transaction_id, description, content='{TABLE}', content_rowid='id', tokenize='trigram')",
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS}_ai AFTER INSERT ON {TABLE} BEGIN
+        INSERT INTO {FTS}(rowid, transaction_id, description) VALUES (new.id, new.transaction_id, new.description);
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS}_ad AFTER DELETE ON {TABLE} BEGIN
+        INSERT INTO {FTS}({FTS}, rowid, transaction_id, description) VALUES ('delete', old.id, old.transaction_id, old.description);
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS}_au AFTER UPDATE OF transaction_id, description ON {TABLE} BEGIN
+        INSERT INTO {FTS}({FTS}, rowid, transaction_id, description) VALUES ('delete', old.id, old.transaction_id, old.description);
+        INSERT INTO {FTS}(rowid, transaction_id, description) VALUES (new.id, new.transaction_id, new.description);
+    END''',
+    f"INSERT INTO {FTS}({FTS}) VALUES ('rebuild')",
+]
+SQLITE_BACKWARD = [
+    f'DROP TRIGGER IF EXISTS {FTS}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS}_au',
+    f'DROP TABLE IF EXISTS {FTS}',
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+    """Search indexes for transactions.search: pg_trgm GIN indexes, or an FTS5 trigram table on SQLite."""
+
+    dependencies = [
+        ('transactions', '0004_transaction_history_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'postgresql': POSTGRESQL_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            _run({'postgresql': POSTGRESQL_BACKWARD, 'sqlite': SQLITE_BACKWARD}),
+        ),
+    ]
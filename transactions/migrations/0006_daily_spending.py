@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def backfill_daily_spending(apps, schema_editor):
+    Transaction = apps.get_model('transactions', 'Transaction')
+    DailySpending = apps.get_model('transactions', 'DailySpending')
+    zero = models.Value(0, output_field=models.DecimalField(max_digits=14, decimal_places=2))
+    rows = (
+        Transaction.objects.filter(status='completed')
+        .annotate(day=TruncDate('created_at'))
+        .values('user_id', 'meter_id', 'day', 'transaction_type')
+        .annotate(n=Count('id'), total=Coalesce(Sum('amount'), zero), total_units=Coalesce(Sum('units'), zero))
+        .order_by()
+    )
+    DailySpending.objects.bulk_create(
+        [
+            DailySpending(user_id=r['user_id'], meter_id=r['meter_id'], day=r['day'], transaction_type=r['transaction_type'],
+                          count=r['n'], amount=r['total'], units=r['total_units'])
+            for r in rows
+        ],
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meters', '0021_token_demand_forecast'),
+        ('transactions', '0005_transaction_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySpending',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('transaction_type', models.CharField(choices=[('purchase', 'Purchase'), ('recharge', 'Recharge'), ('refund', 'Refund')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('units', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('meter', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='meters.meter')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_spending', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'day'], name='dailyspending_user_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'meter', 'day', 'transaction_type'), name='dailyspending_unique_key'), models.UniqueConstraint(condition=models.Q(('meter__isnull', True)), fields=('user', 'day', 'transaction_type'), name='dailyspending_unique_no_meter')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_spending, migrations.RunPython.noop),
+    ]
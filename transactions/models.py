@@ -33,6 +33,41 @@ class Transaction(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # per-user history, newest first; keyset pagination (transactions.pagination)
+            models.Index(fields=['user', '-created_at', '-id'], name='transaction_user_created_idx'),
+            models.Index(fields=['user', 'amount', 'id'], name='transaction_user_amount_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.transaction_id} - {self.amount}"
\ No newline at end of file
+        return f"{self.transaction_id} - {self.amount}"
+
+class DailySpending(models.Model):
+    """Completed transactions rolled up per (user, meter, day, transaction_type).
+
+    Kept in step by transactions.rollups in the same database transaction as
+    the status change, so stats and spending charts read O(days) rows instead
+    of scanning Transaction. The meter reference isn't constrained: a deleted
+    meter's rows keep their totals (the user's transactions still count)
+    until the next rebuild moves them to meter=None.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_spending')
+    meter = models.ForeignKey(Meter, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+')
+    day = models.DateField()
+    transaction_type = models.CharField(max_length=20, choices=Transaction.TRANSACTION_TYPE_CHOICES)
+    count = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'meter', 'day', 'transaction_type'], name='dailyspending_unique_key'),
+            # NULLs are distinct in the constraint above
+            models.UniqueConstraint(
+                fields=['user', 'day', 'transaction_type'], condition=models.Q(meter__isnull=True), name='dailyspending_unique_no_meter'
+            ),
+        ]
+        indexes = [models.Index(fields=['user', 'day'], name='dailyspending_user_day_idx')]
+
+    def __str__(self):
+        return f"{self.user_id} {self.day} {self.transaction_type}: {self.amount}"
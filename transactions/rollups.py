@@ -0,0 +1,120 @@
+"""Per-user daily spending rollups.
+
+Every completed Transaction is counted in one DailySpending row keyed by
+(user, meter, local day of created_at, transaction_type). `apply_change` is
+called in the same database transaction as the save that moves a transaction
+into or out of `completed` (or edits a completed one), so the rollup commits
+or rolls back with it. `rebuild_rollups` recomputes the table from
+Transaction with one grouped aggregate if it ever drifts, e.g. after bulk
+updates that bypass apply_change.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import DailySpending, Transaction
+
+COMPLETED = 'completed'
+REBUILD_BATCH_SIZE = 5000
+
+
+def _adjust(user_id, meter_id, day, transaction_type, count, amount, units):
+    key = {'user_id': user_id, 'meter_id': meter_id, 'day': day, 'transaction_type': transaction_type}
+    changes = {'count': F('count') + count, 'amount': F('amount') + amount, 'units': F('units') + units}
+    with transaction.atomic():
+        if DailySpending.objects.filter(**key).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                DailySpending.objects.create(**key, count=count, amount=amount, units=units)
+        except IntegrityError:
+            # another writer created the row first
+            DailySpending.objects.filter(**key).update(**changes)
+
+
+def record(txn, sign=1):
+    """Add (sign=1) or remove (sign=-1) one completed transaction from its rollup row."""
+    _adjust(
+        txn.user_id, txn.meter_id, timezone.localdate(txn.created_at), txn.transaction_type,
+        sign, sign * Decimal(txn.amount), sign * Decimal(txn.units or 0),
+    )
+
+
+def apply_change(previous, current):
+    """Move a transaction's contribution from its `previous` state to `current`.
+
+    Either may be None (created / deleted); only completed states count.
+    """
+    if previous is not None and previous.status == COMPLETED:
+        record(previous, -1)
+    if current is not None and current.status == COMPLETED:
+        record(current, 1)
+
+
+def rebuild_rollups(user_ids=None):
+    """Recompute DailySpending from completed transactions; returns the number of rows written."""
+    completed = Transaction.objects.filter(status=COMPLETED)
+    stale = DailySpending.objects.all()
+    if user_ids:
+        completed = completed.filter(user_id__in=user_ids)
+        stale = stale.filter(user_id__in=user_ids)
+    zero = Value(Decimal('0'), output_field=DecimalField(max_digits=14, decimal_places=2))
+    rows = (
+        completed.annotate(day=TruncDate('created_at'))
+        .values('user_id', 'meter_id', 'day', 'transaction_type')
+        .annotate(n=Count('id'), total=Coalesce(Sum('amount'), zero), total_units=Coalesce(Sum('units'), zero))
+        .order_by()
+    )
+    rollups = [
+        DailySpending(
+            user_id=r['user_id'], meter_id=r['meter_id'], day=r['day'], transaction_type=r['transaction_type'],
+            count=r['n'], amount=r['total'], units=r['total_units'],
+        )
+        for r in rows
+    ]
+    with transaction.atomic():
+        stale.delete()
+        DailySpending.objects.bulk_create(rollups, batch_size=REBUILD_BATCH_SIZE)
+    return len(rollups)
+
+
+def user_totals(user):
+    """Lifetime completed spend for a user: {'amount', 'units', 'count', 'purchases'}."""
+    totals = DailySpending.objects.filter(user=user).aggregate(
+        total=Sum('amount'), total_units=Sum('units'), n=Sum('count'),
+        purchases=Sum('count', filter=Q(transaction_type='purchase')),
+    )
+    return {
+        'amount': totals['total'] or Decimal('0'),
+        'units': totals['total_units'] or Decimal('0'),
+        'count': totals['n'] or 0,
+        'purchases': totals['purchases'] or 0,
+    }
+
+
+def daily_series(user, start, end, meter_id=None):
+    """Completed spend per day from start to end inclusive, zero-filled, plus per-type totals."""
+    rows = DailySpending.objects.filter(user=user, day__gte=start, day__lte=end)
+    if meter_id is not None:
+        rows = rows.filter(meter_id=meter_id)
+    days = {}
+    by_type = {}
+    for r in rows.values('day', 'transaction_type').annotate(n=Sum('count'), total=Sum('amount'), total_units=Sum('units')).order_by():
+        for bucket in (days.setdefault(r['day'], _empty()), by_type.setdefault(r['transaction_type'], _empty())):
+            bucket['count'] += r['n']
+            bucket['amount'] += r['total']
+            bucket['units'] += r['total_units']
+    series = []
+    day = start
+    while day <= end:
+        series.append({'day': day, **days.get(day, _empty())})
+        day += timedelta(days=1)
+    return series, by_type
+
+
+def _empty():
+    return {'count': 0, 'amount': Decimal('0'), 'units': Decimal('0')}
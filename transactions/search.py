@@ -0,0 +1,52 @@
+"""Indexed transaction search.
+
+`TransactionSearchFilter` keeps DRF SearchFilter semantics (every term must
+occur, case-insensitively, in transaction_id or description) but is served
+by an index on each backend:
+
+* PostgreSQL: the ILIKE '%term%' queries SearchFilter builds are answered by
+  pg_trgm GIN indexes on both columns (migration 0005).
+* SQLite: terms are matched against the FTS5 trigram table
+  transactions_transaction_fts, which triggers keep in step with the table.
+  Django rebuilds a SQLite table (dropping its triggers) on some ALTERs, so a
+  migration that does that to Transaction has to recreate them.
+
+Terms shorter than three characters can't be served by trigrams and fall
+back to a plain scan. `meter_prefix_q` turns a meter number prefix into a
+condition the meter_number index can serve.
+"""
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+FTS_TABLE = 'transactions_transaction_fts'
+MIN_TRIGRAM_TERM = 3
+
+
+def meter_prefix_q(value, field='meter_number'):
+    if connection.vendor == 'sqlite':
+        # SQLite's LIKE is case-insensitive and can't use the BINARY index; a range can
+        upper = value[:-1] + chr(ord(value[-1]) + 1)
+        return Q(**{f'{field}__gte': value, f'{field}__lt': upper})
+    # PostgreSQL serves LIKE 'x%' from the varchar_pattern_ops index Django adds to unique CharFields
+    return Q(**{f'{field}__startswith': value})
+
+
+def _fts_phrase(term):
+    return '"{}"'.format(term.replace('"', '""'))
+
+
+class TransactionSearchFilter(filters.SearchFilter):
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms or connection.vendor != 'sqlite':
+            return super().filter_queryset(request, queryset, view)
+        indexed = [t for t in terms if len(t) >= MIN_TRIGRAM_TERM]
+        if indexed:
+            match = ' AND '.join(_fts_phrase(t) for t in indexed)
+            queryset = queryset.filter(pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]))
+        for term in terms:
+            if len(term) < MIN_TRIGRAM_TERM:
+                queryset = queryset.filter(Q(transaction_id__icontains=term) | Q(description__icontains=term))
+        return queryset
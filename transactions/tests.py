@@ -1,3 +1,206 @@
-from django.test import TestCase
+import io
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from meters.importers import import_token_rows
+from meters.models import Meter
+from usersAuth.models import User
+from . import rollups
+from .models import DailySpending, Transaction
 
-# Create your tests here.
+
+class TransactionCursorPaginationTest(TestCase):
+    url = '/api/transactions/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='history', email='history@example.com', password='pass')
+        base = timezone.now() - timedelta(days=30)
+        txns = Transaction.objects.bulk_create([
+            Transaction(user=self.user, transaction_id=f'HIST-{i}', amount=Decimal(i % 4 + 1), status='completed',
+                        transaction_type='purchase', payment_method='dev')
+            for i in range(12)
+        ])
+        # pairs share a timestamp so the id tie-breaker matters
+        for i, txn in enumerate(txns):
+            Transaction.objects.filter(pk=txn.pk).update(created_at=base + timedelta(hours=i // 2))
+        self.ids = [t.pk for t in txns]
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _walk(self, params):
+        seen, url = [], self.url
+        r = self.client.get(url, params)
+        while True:
+            self.assertNotIn('count', r.data)
+            seen += [t['id'] for t in r.data['results']]
+            if not r.data['next']:
+                return seen
+            r = self.client.get(r.data['next'])
+
+    def test_cursor_mode_walks_history_newest_first(self):
+        expected = list(Transaction.objects.filter(user=self.user).order_by('-created_at', '-id').values_list('pk', flat=True))
+        self.assertEqual(self._walk({'pagination': 'cursor', 'page_size': 5}), expected)
+
+    def test_cursor_mode_keeps_ordering_and_filters(self):
+        seen = self._walk({'pagination': 'cursor', 'page_size': 4, 'ordering': 'created_at'})
+        expected = list(Transaction.objects.filter(user=self.user).order_by('created_at', 'id').values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+        # the cursor only encodes created_at, so other orderings are served page by page
+        r = self.client.get(self.url, {'pagination': 'cursor', 'page_size': 20, 'ordering': 'amount'})
+        self.assertEqual(r.data['count'], 12)
+        by_amount = [t['amount'] for t in r.data['results']]
+        self.assertEqual(by_amount, sorted(by_amount))
+
+        Transaction.objects.filter(pk=self.ids[0]).update(status='failed')
+        self.assertEqual(self._walk({'pagination': 'cursor', 'status': 'failed'}), [self.ids[0]])
+
+    def test_page_number_mode_is_the_default(self):
+        r = self.client.get(self.url)
+        self.assertEqual(r.data['count'], 12)
+
+
+class TransactionSearchTest(TestCase):
+    url = '/api/transactions/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='searcher', email='searcher@example.com', password='pass')
+        self.meter = Meter.objects.create(user=self.user, meter_number='SRCH-0042', nickname='Shop', address='A')
+        other_meter = Meter.objects.create(user=self.user, meter_number='XSRCH-1', address='B')
+        self.txn = Transaction.objects.create(user=self.user, meter=self.meter, transaction_id='TXN-ALPHA-001', amount=Decimal('5'),
+                                              status='completed', transaction_type='purchase', payment_method='dev',
+                                              description='Allocated token 11112222')
+        Transaction.objects.create(user=self.user, meter=other_meter, transaction_id='TXN-BETA-002', amount=Decimal('5'),
+                                   status='completed', transaction_type='purchase', payment_method='dev', description='Refund issued')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _ids(self, **params):
+        return sorted(t['transaction_id'] for t in self.client.get(self.url, params).data['results'])
+
+    def test_search_matches_substrings_in_id_and_description(self):
+        self.assertEqual(self._ids(search='alpha'), ['TXN-ALPHA-001'])
+        self.assertEqual(self._ids(search='1112'), ['TXN-ALPHA-001'])
+        self.assertEqual(self._ids(search='txn refund'), ['TXN-BETA-002'])
+        self.assertEqual(self._ids(search='TXN'), ['TXN-ALPHA-001', 'TXN-BETA-002'])
+        # short terms fall back to a scan
+        self.assertEqual(self._ids(search='01'), ['TXN-ALPHA-001'])
+
+    def test_search_index_follows_updates_and_deletes(self):
+        Transaction.objects.filter(pk=self.txn.pk).update(description='Payment declined')
+        self.assertEqual(self._ids(search='declined'), ['TXN-ALPHA-001'])
+        self.assertEqual(self._ids(search='11112222'), [])
+        self.txn.delete()
+        self.assertEqual(self._ids(search='declined'), [])
+
+    def test_meter_filter_by_prefix_or_nickname(self):
+        self.assertEqual(self._ids(meter='SRCH-00'), ['TXN-ALPHA-001'])
+        self.assertEqual(self._ids(meter='Shop'), ['TXN-ALPHA-001'])
+        self.assertEqual(self._ids(meter=str(self.meter.pk)), ['TXN-ALPHA-001'])
+        self.assertEqual(self._ids(meter='0042'), [])
+
+
+@override_settings(TOKEN_RESERVATION_BATCH_SIZE=0)
+class DailySpendingRollupTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='spender', email='spender@example.com', password='pass')
+        self.meter = Meter.objects.create(user=self.user, meter_number='SPEND-1', address='A')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _purchase(self, amount):
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(f'/api/meters/{self.meter.id}/purchase_electricity/', {'amount': amount}, format='json')
+        return Transaction.objects.get(transaction_id=resp.data['transaction_id'])
+
+    def _snapshot(self):
+        return list(DailySpending.objects.order_by('day', 'transaction_type').values_list('meter_id', 'day', 'transaction_type', 'count', 'amount', 'units'))
+
+    def test_completed_purchases_are_rolled_up(self):
+        import_token_rows([('SPEND-TOKEN-1', Decimal('10.00'), Decimal('42.00')), ('SPEND-TOKEN-2', Decimal('5.00'), Decimal('21.00'))])
+        self._purchase('10.00')
+        self._purchase('5.00')
+        # no token left: the purchase is rejected and never counted
+        self.client.post(f'/api/meters/{self.meter.id}/purchase_electricity/', {'amount': '5.00'}, format='json')
+
+        row = DailySpending.objects.get()
+        self.assertEqual((row.meter_id, row.day, row.transaction_type), (self.meter.pk, timezone.localdate(), 'purchase'))
+        self.assertEqual((row.count, row.amount, row.units), (2, Decimal('15.00'), Decimal('63.00')))
+
+        with self.assertNumQueries(2):
+            data = self.client.get('/api/users/stats/').data
+        self.assertEqual((data['total_spent'], data['tokens_purchased'], data['meters_managed']), (15.0, 2, 1))
+
+    def test_status_changes_and_rebuild_agree(self):
+        now = timezone.now()
+        txns = Transaction.objects.bulk_create([
+            Transaction(user=self.user, meter=meter, transaction_id=f'SPEND-{i}', amount=Decimal('2.50'), units=units,
+                        status='completed', transaction_type=kind, payment_method='dev')
+            for i, (meter, units, kind) in enumerate([
+                (self.meter, Decimal('10'), 'purchase'), (self.meter, None, 'purchase'), (None, Decimal('1'), 'recharge'),
+            ])
+        ])
+        Transaction.objects.filter(pk=txns[0].pk).update(created_at=now - timedelta(days=3))
+        for txn in Transaction.objects.filter(pk__in=[t.pk for t in txns]):
+            rollups.apply_change(None, txn)
+        built_incrementally = self._snapshot()
+        self.assertEqual(call_command('rebuild_spending_rollups', stdout=io.StringIO()), None)
+        self.assertEqual(self._snapshot(), built_incrementally)
+        self.assertEqual(len(built_incrementally), 3)
+
+        # refunding a completed purchase takes it back out
+        previous = Transaction.objects.get(pk=txns[1].pk)
+        current = Transaction.objects.get(pk=txns[1].pk)
+        current.status = 'refunded'
+        current.save()
+        rollups.apply_change(previous, current)
+        today = DailySpending.objects.get(meter=self.meter, day=timezone.localdate())
+        self.assertEqual((today.count, today.amount), (0, Decimal('0.00')))
+        rollups.rebuild_rollups()
+        self.assertFalse(DailySpending.objects.filter(meter=self.meter, day=timezone.localdate()).exists())
+
+    def test_spending_series_is_zero_filled(self):
+        txn = Transaction.objects.create(user=self.user, meter=self.meter, transaction_id='SPEND-CHART', amount=Decimal('4.00'),
+                                         units=Decimal('16.80'), status='completed', transaction_type='purchase', payment_method='dev')
+        rollups.apply_change(None, txn)
+        data = self.client.get('/api/users/spending/', {'days': 7}).json()
+        self.assertEqual(len(data['days']), 7)
+        self.assertEqual(data['days'][-1], {'day': str(timezone.localdate()), 'count': 1, 'amount': 4.0, 'units': 16.8})
+        self.assertEqual(sum(d['count'] for d in data['days'][:-1]), 0)
+        self.assertEqual(data['by_type'], {'purchase': {'count': 1, 'amount': 4.0, 'units': 16.8}})
+        self.assertEqual(self.client.get('/api/users/spending/', {'meter': self.meter.pk + 1}).json()['by_type'], {})
+        self.assertEqual(self.client.get('/api/users/spending/', {'date_from': '2020-01-01'}).status_code, 400)
+
+    def test_user_admin_inline_edits_update_rollups(self):
+        txn = Transaction.objects.create(user=self.user, meter=self.meter, transaction_id='SPEND-INLINE', amount=Decimal('4.00'),
+                                         units=Decimal('16.80'), status='completed', transaction_type='purchase', payment_method='dev')
+        rollups.apply_change(None, txn)
+        admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='pass')
+        self.client.force_login(admin)
+        url = f'/admin/usersAuth/user/{self.user.pk}/change/'
+
+        def post(**changes):
+            # resubmit the change form as rendered, with `changes` applied to the transaction row
+            page = self.client.get(url)
+            formsets = [inline.formset for inline in page.context['inline_admin_formsets']]
+            data = {}
+            for form in [page.context['adminform'].form] + [f for fs in formsets for f in (fs.management_form, *fs.forms)]:
+                for name in form.fields:
+                    value = form[name].value()
+                    if value is None or value is False:
+                        continue
+                    data[form.add_prefix(name)] = [str(v) for v in value] if isinstance(value, (list, tuple)) else str(value)
+            row = next(fs for fs in formsets if fs.model is Transaction).forms[0]
+            data.update({row.add_prefix(name): value for name, value in changes.items()})
+            self.assertEqual(self.client.post(url, data).status_code, 302)
+
+        post(amount='6.00')
+        self.assertEqual(DailySpending.objects.get().amount, Decimal('6.00'))
+        post(status='refunded')
+        self.assertEqual(DailySpending.objects.get().count, 0)
+        post(status='completed')
+        post(DELETE='on')
+        self.assertFalse(Transaction.objects.filter(pk=txn.pk).exists())
+        self.assertEqual((DailySpending.objects.get().count, DailySpending.objects.get().amount), (0, Decimal('0.00')))
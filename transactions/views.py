@@ -1,6 +1,12 @@
+from django.db.models import Q
 from rest_framework import viewsets, filters
+from rest_framework.decorators import action
 from django_filters.rest_framework import DjangoFilterBackend, FilterSet, DateFilter, CharFilter
+from meters.exports import export_response, export_scope
+from meters.models import Meter
 from .models import Transaction
+from .pagination import TransactionCursorPagination
+from .search import TransactionSearchFilter, meter_prefix_q
 from .serializers import TransactionSerializer
 
 
@@ -14,20 +20,49 @@ class TransactionFilterSet(FilterSet):
         fields = ['status', 'transaction_type', 'date_from', 'date_to', 'meter']
 
     def filter_by_meter(self, queryset, name, value):
-        # allow filtering by meter id or meter_number substring
+        # allow filtering by meter id, meter_number prefix or nickname
         try:
-            mid = int(value)
-            return queryset.filter(meter__id=mid)
-        except Exception:
-            return queryset.filter(meter__meter_number__icontains=value)
+            return queryset.filter(meter__id=int(value))
+        except ValueError:
+            pass
+        # resolve the user's matching meters first so transactions are found through meter_id
+        meters = Meter.objects.filter(meter_prefix_q(value) | Q(nickname=value))
+        if self.request is not None:
+            meters = meters.filter(user=self.request.user)
+        return queryset.filter(meter__in=meters.values('pk'))
 
 
 class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = TransactionSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, TransactionSearchFilter, filters.OrderingFilter]
     filterset_class = TransactionFilterSet
     search_fields = ['transaction_id', 'description']
     ordering_fields = ['created_at', 'amount']
 
     def get_queryset(self):
-        return Transaction.objects.filter(user=self.request.user)
\ No newline at end of file
+        return Transaction.objects.filter(user=self.request.user)
+
+    EXPORT_COLUMNS = (
+        ('transaction_id', 'transaction_id'), ('created_at', 'created_at'), ('status', 'status'),
+        ('transaction_type', 'transaction_type'), ('amount', 'amount'), ('units', 'units'),
+        ('token_code', 'token_code'), ('payment_method', 'payment_method'),
+        ('meter_number', 'meter__meter_number'), ('description', 'description'),
+    )
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream the filtered history as CSV or NDJSON (?export_format=); takes the same filters, search and ordering as the list."""
+        qs = export_scope(request, self.get_queryset(), Transaction.objects.all())
+        return export_response(request, self.filter_queryset(qs), self.EXPORT_COLUMNS, 'transactions')
+
+    @property
+    def paginator(self):
+        # ?pagination=cursor (or following a cursor link) switches to keyset pagination,
+        # unless the requested ordering can't be encoded in a cursor
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if (params.get('pagination') == 'cursor' or 'cursor' in params) and TransactionCursorPagination.supports(self.request):
+                self._paginator = TransactionCursorPagination()
+            else:
+                self._paginator = self.pagination_class() if self.pagination_class else None
+        return self._paginator
@@ -1,6 +1,8 @@
 from django.contrib import admin
+from django.db import transaction
 from .models import User, AccountDeletionRequest, DataExportRequest
 from meters.models import Meter
+from transactions import rollups
 from transactions.models import Transaction
 
 class MeterInline(admin.TabularInline):
@@ -39,6 +41,23 @@ class UserAdmin(admin.ModelAdmin):
         }),
     )
 
+    # inline transaction edits must keep DailySpending in step, like TransactionAdmin
+    def save_formset(self, request, form, formset, change):
+        if formset.model is not Transaction:
+            return super().save_formset(request, form, formset, change)
+        with transaction.atomic():
+            instances = formset.save(commit=False)
+            for obj in formset.deleted_objects:
+                # the bound instance carries the submitted values; count out what was stored
+                previous = Transaction.objects.select_for_update().filter(pk=obj.pk).first()
+                rollups.apply_change(previous, None)
+                obj.delete()
+            for obj in instances:
+                previous = Transaction.objects.select_for_update().filter(pk=obj.pk).first() if obj.pk else None
+                obj.save()
+                rollups.apply_change(previous, obj)
+            formset.save_m2m()
+
 
 @admin.register(AccountDeletionRequest)
 class AccountDeletionRequestAdmin(admin.ModelAdmin):
@@ -13,6 +13,21 @@ class User(AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_timezone = instance.__dict__.get('timezone')
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        loaded = getattr(self, '_loaded_timezone', None)
+        self._loaded_timezone = self.timezone
+        if loaded is not None and loaded != self.timezone:
+            # auto-recharge windows are in local time; move the next scheduled check
+            from meters.scheduling import reschedule_user
+            reschedule_user(self)
+
     def __str__(self):
         return self.email
 
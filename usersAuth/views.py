@@ -155,38 +155,53 @@ class UserViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Get user statistics for the account overview."""
-        from django.db.models import Sum, Count
-        from transactions.models import Transaction
-        from meters.models import Meter, Token
+        from meters.models import Meter
+        from transactions.rollups import user_totals
         
         user = request.user
         
-        # Total spent from completed transactions
-        total_spent = Transaction.objects.filter(
-            user=user, 
-            status='completed'
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        # Spend and purchases from the completed-transaction rollups
+        totals = user_totals(user)
         
         # Meters managed
         meters_count = Meter.objects.filter(user=user).count()
         
-        # Tokens purchased (from completed transactions)
-        tokens_count = Transaction.objects.filter(
-            user=user,
-            status='completed',
-            transaction_type='purchase'
-        ).count()
-        
         # Member since
         member_since = user.date_joined.strftime('%B %Y')
         
         return Response({
-            'total_spent': float(total_spent),
+            'total_spent': float(totals['amount']),
             'meters_managed': meters_count,
-            'tokens_purchased': tokens_count,
+            'tokens_purchased': totals['purchases'],
             'member_since': member_since
         })
 
+    @action(detail=False, methods=['get'])
+    def spending(self, request):
+        """Daily completed spend for charts: ?days=30 (max 366) or ?date_from=&date_to=, optional ?meter=<id>."""
+        from datetime import timedelta
+        from django.utils.dateparse import parse_date
+        from transactions.rollups import daily_series
+
+        today = timezone.localdate()
+        try:
+            days = min(max(int(request.query_params.get('days', 30)), 1), 366)
+            meter_id = int(request.query_params['meter']) if request.query_params.get('meter') else None
+            end = parse_date(request.query_params.get('date_to') or '') or today
+            start = parse_date(request.query_params.get('date_from') or '') or end - timedelta(days=days - 1)
+        except ValueError:
+            return Response({'detail': 'Invalid days, meter or date'}, status=status.HTTP_400_BAD_REQUEST)
+        if start > end or (end - start).days >= 366:
+            return Response({'detail': 'date range must be at most 366 days'}, status=status.HTTP_400_BAD_REQUEST)
+
+        series, by_type = daily_series(request.user, start, end, meter_id=meter_id)
+        return Response({
+            'from': start,
+            'to': end,
+            'days': [{**d, 'amount': float(d['amount']), 'units': float(d['units'])} for d in series],
+            'by_type': {t: {**v, 'amount': float(v['amount']), 'units': float(v['units'])} for t, v in by_type.items()},
+        })
+
     @action(detail=False, methods=['get'])
     def activity(self, request):
         """Get recent user activity."""